@@ -0,0 +1,230 @@
+import argparse
+import gc
+import json
+import logging
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from src.utils.config import load_config
+from src.utils.logging_config import setup_logging
+from src.data_processing.mock_data_generator import generate_mock_data
+from src.data_processing.preprocessing import preprocess_sprints, preprocess_issues, calculate_actual_velocity
+from src.feature_engineering.features import (
+    generate_historical_velocity_features,
+    generate_planned_features,
+    combine_features
+)
+from src.feature_engineering.scope import calculate_sprint_scope
+from src.feature_engineering.burndown import calculate_daily_sprint_series
+from src.training.train_velocity import train_velocity_model
+from src.modeling.registry import save_model, configured_backend, model_name_for
+from src.modeling.flat_trees import FlatTreeEnsemble
+from src.inference import predict
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+BENCHMARKS_DIR = Path(__file__).parent
+DEFAULT_BASELINE = BENCHMARKS_DIR / "baseline.json"
+
+# Synthetic dataset sizes: issues = num_projects * num_sprints * issues_per_sprint.
+# Larger scales add projects rather than sprints so that all sprints are in the past (closed).
+SCALES = {
+    "1k": dict(num_projects=1, num_sprints=50, issues_per_sprint=20, start_date="2022-01-03"),
+    "100k": dict(num_projects=50, num_sprints=100, issues_per_sprint=20, start_date="2020-01-06"),
+    "1m": dict(num_projects=500, num_sprints=100, issues_per_sprint=20, start_date="2020-01-06"),
+}
+
+# Measurements below these are too noisy to compare against a threshold
+MIN_COMPARABLE_TIME_S = 0.05
+MIN_COMPARABLE_MEMORY_MIB = 1.0
+
+
+def _measure(func, repeat, trace_memory):
+    """
+    Runs func() `repeat` times and returns (result, best wall time in s, peak traced MiB).
+
+    Wall times come from untraced runs; peak memory from one extra run under tracemalloc,
+    whose overhead would distort the timings.
+    """
+    times, result = [], None
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - started)
+    peak_mib = None
+    if trace_memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            peak_mib = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    return result, min(times), peak_mib
+
+
+def run_scale(scale, config, repeat=3, trace_memory=True, seed=42):
+    """
+    Benchmarks the pipeline stages on one synthetic dataset.
+
+    Each stage consumes the previous stages' outputs, as in the scripts.
+
+    Returns:
+        dict: {stage: {'wall_time_s': float, 'peak_memory_mib': float | None}}
+    """
+    logger.info(f"Generating the {scale} dataset...")
+    sprints_df, issues_df, transitions_df = generate_mock_data(**SCALES[scale], seed=seed)
+    logger.info(f"Dataset {scale}: {len(issues_df)} issues, {len(sprints_df)} sprints, {len(transitions_df)} transitions.")
+
+    results = {}
+
+    def bench(stage, func):
+        value, wall_time, peak = _measure(func, repeat, trace_memory)
+        results[stage] = {'wall_time_s': round(wall_time, 4),
+                          'peak_memory_mib': round(peak, 2) if peak is not None else None}
+        logger.info(f"[{scale}] {stage}: {wall_time:.3f}s" + (f", peak {peak:.1f} MiB" if peak is not None else ""))
+        return value
+
+    processed_sprints_df = preprocess_sprints(sprints_df)
+    closed_sprints_df = processed_sprints_df[processed_sprints_df['state'] == 'closed']
+    processed_issues_df = bench("preprocess_issues", lambda: preprocess_issues(issues_df, transitions_df, config))
+    velocity_df = bench("calculate_actual_velocity",
+                        lambda: calculate_actual_velocity(processed_issues_df, closed_sprints_df, config))
+    velocity_df = velocity_df.sort_values('start_date')
+    hist_feat_df = bench("generate_historical_velocity_features",
+                         lambda: generate_historical_velocity_features(velocity_df))
+    scope_df = bench("calculate_sprint_scope",
+                     lambda: calculate_sprint_scope(processed_sprints_df, processed_issues_df, transitions_df,
+                                                    config['status_mapping']))
+    bench("calculate_daily_sprint_series",
+          lambda: calculate_daily_sprint_series(processed_sprints_df, processed_issues_df, transitions_df,
+                                                config['status_mapping']))
+    plan_feat_df = bench("generate_planned_features",
+                         lambda: generate_planned_features(processed_sprints_df, processed_issues_df, scope_df))
+    features_df = combine_features(hist_feat_df, plan_feat_df).merge(
+        hist_feat_df[['sprint_id', 'actual_velocity']], on='sprint_id', how='left'
+    )
+    model, features_used, _ = bench("train_velocity_model", lambda: train_velocity_model(features_df, config))
+
+    # Small-batch latency of the trained model: sklearn's predict vs the flat-array evaluator
+    small_batch = features_df[features_used].fillna(0).head(10)
+    bench("sklearn_predict_10_rows", lambda: model.predict(small_batch))
+    flat_model = FlatTreeEnsemble.from_model(model)
+    if flat_model is not None:
+        bench("flat_trees_predict_10_rows", lambda: flat_model.predict(small_batch))
+
+    # predict_velocity reads the model and history from disk: point it at a temporary directory
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        bench_config = {**config, 'paths': {**config['paths'], 'models_dir': tmp_dir, 'processed_data_dir': tmp_dir,
+                                            'features_dir': tmp_dir}}
+        save_model(tmp_dir, model_name_for(config), model, features_used, configured_backend(config))
+        velocity_df.to_parquet(Path(tmp_dir) / "closed_sprints_with_velocity.parquet", index=False)
+        next_start = velocity_df['start_date'].max() + pd.Timedelta(days=14)
+        sprint_input = {"start_date": next_start.strftime("%Y-%m-%d"), "planned_story_points": 55.0,
+                        "planned_issue_count": 18}
+        predict.clear_caches()
+        predict.predict_velocity(sprint_input, config=bench_config) # Warm the model and history caches
+        # Without the memoized forecast: times the feature preparation and the model call
+        forecasts = predict._get_caches()['forecasts']
+        bench("predict_velocity", lambda: (forecasts.clear(), predict.predict_velocity(sprint_input, config=bench_config)))
+        # Every historical sprint re-forecast in one call
+        batch_input = velocity_df[['start_date']].assign(planned_story_points=55.0, planned_issue_count=18)
+        bench("predict_velocity_batch", lambda: predict.predict_velocity_batch(batch_input, config=bench_config))
+        predict.clear_caches()
+    return results
+
+
+def compare_to_baseline(results, baseline, time_threshold, memory_threshold):
+    """
+    Lists the stages that regressed past the thresholds (relative increases, e.g. 0.25 = +25%).
+
+    Returns:
+        list[str]: One message per regression.
+    """
+    regressions = []
+    for scale, stages in results.items():
+        for stage, current in stages.items():
+            reference = baseline.get('results', {}).get(scale, {}).get(stage)
+            if not reference:
+                continue
+            ref_time, cur_time = reference['wall_time_s'], current['wall_time_s']
+            if max(ref_time, cur_time) >= MIN_COMPARABLE_TIME_S and cur_time > ref_time * (1 + time_threshold):
+                regressions.append(f"{scale}/{stage}: wall time {cur_time:.3f}s vs baseline {ref_time:.3f}s "
+                                   f"(+{cur_time / ref_time - 1:.0%}, threshold +{time_threshold:.0%})")
+            ref_mem, cur_mem = reference.get('peak_memory_mib'), current.get('peak_memory_mib')
+            if (ref_mem and cur_mem and max(ref_mem, cur_mem) >= MIN_COMPARABLE_MEMORY_MIB
+                    and cur_mem > ref_mem * (1 + memory_threshold)):
+                regressions.append(f"{scale}/{stage}: peak memory {cur_mem:.1f} MiB vs baseline {ref_mem:.1f} MiB "
+                                   f"(+{cur_mem / ref_mem - 1:.0%}, threshold +{memory_threshold:.0%})")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the analytics pipeline stages on synthetic datasets.")
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=["1k", "100k"],
+                        help="Dataset sizes to run (1m needs several GB of memory)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage; the fastest one is kept")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc run (peak memory)")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--output", type=Path, default=None, help="Also write the results to this JSON file")
+    parser.add_argument("--time-threshold", type=float, default=0.25, help="Allowed relative wall time increase")
+    parser.add_argument("--memory-threshold", type=float, default=0.25, help="Allowed relative peak memory increase")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    cfg = load_config()
+    if not cfg:
+        logger.error("Failed to load configuration. Exiting.")
+        return 2
+
+    # Keep the stages' own logging out of the way of the benchmark output
+    for name in ("src.data_processing", "src.feature_engineering", "src.training", "src.inference", "src.evaluation"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    results = {scale: run_scale(scale, cfg, repeat=args.repeat, trace_memory=not args.no_memory)
+               for scale in args.scales}
+    report = {
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'results': results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+    if args.update_baseline:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {'results': {}}
+        baseline.update({k: v for k, v in report.items() if k != 'results'})
+        baseline['results'].update(results) # Scales that were not run keep their previous numbers
+        args.baseline.write_text(json.dumps(baseline, indent=2))
+        logger.info(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        logger.error(f"No baseline at {args.baseline}; run with --update-baseline to create one.")
+        return 1
+    regressions = compare_to_baseline(results, json.loads(args.baseline.read_text()),
+                                      args.time_threshold, args.memory_threshold)
+    for message in regressions:
+        logger.error(f"Regression: {message}")
+    if regressions:
+        return 1
+    logger.info("No regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
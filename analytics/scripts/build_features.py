@@ -3,11 +3,11 @@ import pandas as pd
 from pathlib import Path
 from src.utils.config import load_config
 from src.utils.logging_config import setup_logging
-from src.feature_engineering.features import (
-    generate_historical_velocity_features,
-    generate_planned_features,
-    combine_features
-)
+from src.data_processing.schema import ISSUE_SCHEMA, read_compact_parquet
+from src.feature_engineering.features import build_model_features, feature_windows
+from src.feature_engineering.rolling_state import update_historical_features, fill_open_sprint_features, ROLLING_STATE_FILE
+from src.feature_engineering.feature_store import FeatureStore
+from src.feature_engineering.scope import SCOPE_FILE
 
 # Setup logging
 setup_logging()
@@ -40,32 +40,34 @@ def main():
     logger.info("Loading processed data...")
     closed_sprints_df = pd.read_parquet(closed_sprints_path)
     all_sprints_df = pd.read_parquet(all_sprints_path)
-    issues_df = pd.read_parquet(issues_path)
+    issues_df = read_compact_parquet(issues_path, ISSUE_SCHEMA)
+    scope_path = processed_dir / SCOPE_FILE
+    if scope_path.exists():
+        scope_df = pd.read_parquet(scope_path)
+    else:
+        logger.warning(f"No sprint scope at {scope_path}; planned features count issues in their current sprint.")
+        scope_df = None
 
-    # 2. Generate Historical Features (using closed sprints with velocity)
-    # Ensure sorted by date for rolling calculations
-    closed_sprints_df = closed_sprints_df.sort_values(by='start_date')
-    hist_feat_df = generate_historical_velocity_features(closed_sprints_df, windows=[1, 3, 5])
+    # 2. Generate Historical (closed sprints with velocity) and Planned (all sprints and issues) Features
+    # 3. Combine them, keeping the target variable (actual_velocity) which only exists for closed sprints
+    #    The per-team rolling state computes the historical features of the newly closed sprints only;
+    #    the other sprints keep the ones of the previous output
+    previous_features_df = pd.read_parquet(output_path) if output_path.exists() else None
+    hist_feat_df, rolling_state = update_historical_features(features_dir / ROLLING_STATE_FILE, closed_sprints_df,
+                                                             previous_features_df, windows=feature_windows(cfg))
+    final_features_df = build_model_features(closed_sprints_df, all_sprints_df, issues_df, scope_df=scope_df,
+                                             hist_feat_df=hist_feat_df)
 
-    # 3. Generate Planned Features (using all sprints and issues)
-    plan_feat_df = generate_planned_features(all_sprints_df, issues_df)
+    # 3b. Use the rolling state for the open sprints
+    final_features_df = fill_open_sprint_features(final_features_df, rolling_state)
 
-    # 4. Combine Features
-    # We need to combine based on all sprints but keep the target variable (actual_velocity)
-    # which only exists for closed sprints.
-    final_features_df = combine_features(hist_feat_df, plan_feat_df)
-
-    # Make sure 'actual_velocity' is present for the rows corresponding to closed sprints
-    # It might get lost if combine_features doesn't explicitly merge it back. Let's ensure it's there.
-    if 'actual_velocity' not in final_features_df.columns and 'actual_velocity' in hist_feat_df.columns:
-         final_features_df = final_features_df.merge(
-             hist_feat_df[['sprint_id', 'actual_velocity']], on='sprint_id', how='left'
-         )
-
-    # 5. Save Features
+    # 4. Save Features
     logger.info(f"Saving final features to {output_path}")
     final_features_df.to_parquet(output_path, index=False)
 
+    # 5. Materialize into the feature store, which training and inference read point-in-time
+    FeatureStore.from_config(cfg).materialize(final_features_df)
+
     logger.info(f"Feature engineering script finished. Output shape: {final_features_df.shape}")
     logger.info(f"Columns: {final_features_df.columns.tolist()}")
 
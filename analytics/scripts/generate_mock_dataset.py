@@ -0,0 +1,46 @@
+import argparse
+import logging
+from pathlib import Path
+from src.utils.config import load_config
+from src.utils.logging_config import setup_logging
+from src.data_processing.mock_data_generator import write_mock_dataset
+
+# Setup logging
+setup_logging()
+logger = logging.getLogger(__name__)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Write a partitioned Parquet mock dataset for load and scale testing.")
+    parser.add_argument("--output-dir", default=None, help="Dataset root (defaults to paths.raw_data_dir)")
+    parser.add_argument("--num-projects", type=int, default=1)
+    parser.add_argument("--boards-per-project", type=int, default=1)
+    parser.add_argument("--num-sprints", type=int, default=30, help="Sprints per board")
+    parser.add_argument("--issues-per-sprint", type=int, default=15)
+    parser.add_argument("--sprints-per-chunk", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=None)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    logger.info("Starting mock dataset generation script...")
+    cfg = load_config()
+    if not cfg:
+        logger.error("Failed to load configuration. Exiting.")
+        return
+
+    output_dir = Path(args.output_dir or cfg['paths']['raw_data_dir'])
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    counts = write_mock_dataset(
+        output_dir,
+        num_projects=args.num_projects,
+        boards_per_project=args.boards_per_project,
+        num_sprints=args.num_sprints,
+        issues_per_sprint=args.issues_per_sprint,
+        sprints_per_chunk=args.sprints_per_chunk,
+        seed=args.seed,
+    )
+    logger.info(f"Mock dataset generation script finished: {counts}")
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,40 @@
+import argparse
 import logging
 from pathlib import Path
 from src.utils.config import load_config
 from src.utils.logging_config import setup_logging
+from src.utils.parquet import write_partitioned_dataset
+from src.data_processing.schema import ISSUE_PARTITION_COLS, PROCESSED_ISSUES_FILE
 from src.data_processing.preprocessing import (
     load_data,
     preprocess_sprints,
     preprocess_issues,
     calculate_actual_velocity
 )
+from src.data_processing.streaming import preprocess_streaming
+from src.data_processing.incremental import preprocess_incremental
+from src.feature_engineering.scope import calculate_sprint_scope, SCOPE_FILE
+from src.feature_engineering.burndown import calculate_daily_sprint_series, write_daily_sprint_series, DAILY_SERIES_FILE
 
 # Setup logging
 setup_logging()
 logger = logging.getLogger(__name__)
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Preprocess sprints and issues into the processed Parquet files.")
+    parser.add_argument("--mode", choices=["full", "streaming", "incremental"], default="full",
+                        help="'full' generates mock data in memory; 'streaming' reads the raw Parquet dataset in batches; "
+                             "'incremental' only reprocesses what changed in the raw dataset since the last run")
+    parser.add_argument("--raw-dir", default=None, help="Raw dataset directory (defaults to paths.raw_data_dir)")
+    parser.add_argument("--batch-size", type=int, default=None, help="Issues per batch (defaults to preprocessing.batch_size)")
+    parser.add_argument("--source", choices=["mock", "jira", "replay"], default="mock",
+                        help="Data source for 'full' mode: mock data, a Jira extraction (through the raw cache) "
+                             "or a replay of the raw cache without network access")
+    parser.add_argument("--project", default=None, help="Project key for the 'jira' and 'replay' sources")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
     logger.info("Starting data preprocessing script...")
     cfg = load_config()
     if not cfg:
@@ -24,12 +45,25 @@ def main():
     output_dir = Path(cfg['paths']['processed_data_dir'])
     output_dir.mkdir(parents=True, exist_ok=True)
     sprints_out_path = output_dir / "processed_sprints.parquet"
-    issues_out_path = output_dir / "processed_issues.parquet"
+    issues_out_path = output_dir / PROCESSED_ISSUES_FILE
     closed_sprints_out_path = output_dir / "closed_sprints_with_velocity.parquet"
 
+    if args.mode in ("streaming", "incremental"):
+        raw_dir = Path(args.raw_dir or cfg['paths']['raw_data_dir'])
+        batch_size = args.batch_size or cfg.get('preprocessing', {}).get('batch_size', 100000)
+        if args.mode == "streaming":
+            preprocess_streaming(raw_dir, output_dir, cfg, batch_size=batch_size)
+        else:
+            preprocess_incremental(raw_dir, output_dir, cfg, batch_size=batch_size)
+        logger.info("Data preprocessing script finished.")
+        return
 
     # 1. Load Data
-    s_df, i_df, st_df = load_data(use_mock=True, num_sprints=30, issues_per_sprint=15) # Use mock data
+    if args.source == "mock":
+        s_df, i_df, st_df = load_data(use_mock=True, num_sprints=30, issues_per_sprint=15) # Use mock data
+    else:
+        s_df, i_df, st_df = load_data(use_mock=False, project_key=args.project, config=cfg,
+                                      replay=args.source == "replay")
     if s_df.empty or i_df.empty:
          logger.error("Failed to load data. Exiting.")
          return
@@ -52,12 +86,22 @@ def main():
         logger.warning("No closed sprints found. Skipping velocity calculation and saving.")
         # Create an empty file maybe? Or handle downstream. For now, just warn.
 
+    # 4b. Sprint scope as of each sprint's start, from the sprint field transitions
+    scope_df = calculate_sprint_scope(processed_sprints_df, processed_issues_df, st_df, cfg.get('status_mapping', {}))
+    logger.info(f"Saving sprint scope to {output_dir / SCOPE_FILE}")
+    scope_df.to_parquet(output_dir / SCOPE_FILE, index=False)
+
+    # 4c. Daily remaining points / WIP / done / throughput of each sprint, for the sprint charts
+    daily_series_df = calculate_daily_sprint_series(processed_sprints_df, processed_issues_df, st_df,
+                                                    cfg.get('status_mapping', {}))
+    write_daily_sprint_series(daily_series_df, output_dir / DAILY_SERIES_FILE)
+
     # 5. Save Processed Dataframes
     logger.info(f"Saving processed sprints to {sprints_out_path}")
     processed_sprints_df.to_parquet(sprints_out_path, index=False)
 
     logger.info(f"Saving processed issues to {issues_out_path}")
-    processed_issues_df.to_parquet(issues_out_path, index=False)
+    write_partitioned_dataset(processed_issues_df, issues_out_path, ISSUE_PARTITION_COLS)
 
 
     logger.info("Data preprocessing script finished.")
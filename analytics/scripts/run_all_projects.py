@@ -0,0 +1,44 @@
+import argparse
+import logging
+from pathlib import Path
+from src.utils.config import load_config
+from src.utils.logging_config import setup_logging
+from src.utils.projects import load_projects
+from src.pipeline.multi_project import run_all_projects, save_summary
+
+# Setup logging
+setup_logging()
+logger = logging.getLogger(__name__)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run preprocessing, feature building and training for every project in parallel.")
+    parser.add_argument("--projects", nargs="*", default=None, help="Project keys (defaults to the configured projects)")
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (defaults to projects.max_workers)")
+    parser.add_argument("--raw-dir", default=None, help="Raw dataset directory (defaults to paths.raw_data_dir)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    logger.info("Starting multi-project pipeline script...")
+    cfg = load_config()
+    if not cfg:
+        logger.error("Failed to load configuration. Exiting.")
+        return
+
+    project_keys = args.projects or [p['project_key'] for p in load_projects(cfg)]
+    if not project_keys:
+        logger.error("No projects configured or found. Exiting.")
+        return
+
+    summaries = run_all_projects(project_keys, cfg, raw_dir=args.raw_dir, max_workers=args.workers)
+    save_summary(summaries, Path(cfg['paths']['models_dir']) / "projects_summary.json")
+
+    logger.info("-" * 30)
+    for summary in summaries:
+        details = f"MAE {summary['validation_mae']:.4f}" if summary['status'] == 'succeeded' else summary['error']
+        logger.info(f"  {summary['project_key']}: {summary['status']} in {summary.get('duration_s', 0):.1f}s ({details})")
+    logger.info("-" * 30)
+    logger.info("Multi-project pipeline script finished.")
+
+if __name__ == "__main__":
+    main()
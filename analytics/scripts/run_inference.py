@@ -2,10 +2,12 @@
 import logging
 import pandas as pd
 from datetime import datetime, timedelta
+from pathlib import Path
 
 from src.utils.config import load_config
 from src.utils.logging_config import setup_logging
-from src.inference.predict import predict_velocity, load_historical_data
+from src.inference.predict import predict_velocity, predict_velocity_batch, load_historical_data
+from src.feature_engineering.feature_store import PLANNED_FEATURES
 
 # Setup logging
 setup_logging()
@@ -42,7 +44,7 @@ def main():
 
 
     # --- Run Prediction ---
-    predicted_value = predict_velocity(sprint_input, model_name="velocity_gbr")
+    predicted_value = predict_velocity(sprint_input) # The configured backend's model
 
 
     # --- Display Result ---
@@ -55,6 +57,20 @@ def main():
     else:
         logger.error("Inference failed.")
 
+    # --- Forecast every upcoming sprint (not closed yet) of the processed data in one batch ---
+    features_path = Path(cfg['paths']['features_dir']) / "model_input_features.parquet"
+    if features_path.exists():
+        all_sprints = pd.read_parquet(features_path)
+        upcoming = all_sprints[all_sprints['state'] != 'closed']
+        upcoming = upcoming[[c for c in ['project_key', 'board_id', 'sprint_id', 'name', 'start_date'] + PLANNED_FEATURES
+                             if c in upcoming.columns]]
+        if not upcoming.empty:
+            predictions = predict_velocity_batch(upcoming, config=cfg)
+            if predictions is not None:
+                logger.info(f"Upcoming sprint forecasts:\n{upcoming.assign(predicted_velocity=predictions).to_string(index=False)}")
+            else:
+                logger.error("Batch inference of the upcoming sprints failed.")
+
     logger.info("Inference script finished.")
 
 if __name__ == "__main__":
@@ -0,0 +1,38 @@
+import argparse
+import logging
+from src.utils.config import load_config
+from src.utils.logging_config import setup_logging
+from src.pipeline.stages import build_pipeline
+
+# Setup logging
+setup_logging()
+logger = logging.getLogger(__name__)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the pipeline (preprocess, scope and burndown, build_features, "
+                                                 "train, inference), skipping stages whose outputs are up to date.")
+    parser.add_argument("--stages", nargs="*", default=None,
+                        help="Stages to bring up to date, with their dependencies (defaults to all)")
+    parser.add_argument("--force", nargs="*", default=[], help="Stages to rerun even if they are up to date")
+    parser.add_argument("--workers", type=int, default=None, help="Threads for independent stages (defaults to pipeline.max_workers)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    logger.info("Starting pipeline script...")
+    cfg = load_config()
+    if not cfg:
+        logger.error("Failed to load configuration. Exiting.")
+        return
+
+    pipeline = build_pipeline(cfg, max_workers=args.workers)
+    results = pipeline.run(targets=args.stages, force=args.force)
+
+    logger.info("-" * 30)
+    for name, status in results.items():
+        logger.info(f"  {name}: {status}")
+    logger.info("-" * 30)
+    logger.info("Pipeline script finished.")
+
+if __name__ == "__main__":
+    main()
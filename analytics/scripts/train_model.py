@@ -1,16 +1,26 @@
+import argparse
 import logging
 from pathlib import Path
 import pandas as pd
-import joblib
 
 from src.utils.config import load_config
 from src.utils.logging_config import setup_logging
-from src.training.train_velocity import train_velocity_model
+from src.training.train_velocity import train_and_save
+from src.feature_engineering.feature_store import FeatureStore
+from src.modeling.registry import model_name_for, model_paths
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
 def main():
+    parser = argparse.ArgumentParser(description="Train the velocity model and save it as a new version.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--incremental", dest="incremental", action="store_true", default=None,
+                      help="Grow the current model on the newly closed sprints (warm_start)")
+    mode.add_argument("--full", dest="incremental", action="store_false",
+                      help="Train from scratch (default unless velocity_model.incremental.enabled)")
+    args = parser.parse_args()
+
     logger.info("Starting model training script...")
     cfg = load_config()
     if not cfg:
@@ -20,39 +30,38 @@ def main():
     # --- Paths ---
     features_path = Path(cfg['paths']['features_dir']) / "model_input_features.parquet"
     models_dir = Path(cfg['paths']['models_dir'])
-    models_dir.mkdir(parents=True, exist_ok=True)
-    # Specific model path naming convention
-    model_output_path = models_dir / "velocity_gbr_model.joblib"
-    features_list_path = models_dir / "velocity_gbr_features.joblib"
+    # Specific model path naming convention: velocity_<backend>/<version>/, with velocity_<backend>/CURRENT
+    versions_dir = model_paths(models_dir, model_name_for(cfg))['versions']
 
 
     # --- Load Features ---
-    if not features_path.exists():
+    # Point-in-time training set from the feature store: each sprint's features as of its start
+    feature_store = FeatureStore.from_config(cfg)
+    closed_sprints_path = Path(cfg['paths']['processed_data_dir']) / "closed_sprints_with_velocity.parquet"
+    if feature_store.exists() and closed_sprints_path.exists():
+        logger.info(f"Loading the training set from the feature store at {feature_store.root}")
+        features_data = feature_store.training_set(pd.read_parquet(closed_sprints_path))
+    elif features_path.exists():
+        logger.info(f"Loading features from {features_path}")
+        features_data = pd.read_parquet(features_path)
+    else:
         logger.error(f"Features file not found at {features_path}. Please run feature engineering first. Exiting.")
         return
-    logger.info(f"Loading features from {features_path}")
-    features_data = pd.read_parquet(features_path)
 
     # --- Train Model ---
     # Currently hardcoded to velocity model, expand later if needed
     logger.info("Training Velocity Model...")
-    trained_model, features_used, validation_mae = train_velocity_model(features_data, cfg)
-
-    # --- Save Model ---
-    if trained_model and features_used:
-        logger.info(f"Saving trained model to {model_output_path}")
-        joblib.dump(trained_model, model_output_path)
-
-        logger.info(f"Saving feature list used for training to {features_list_path}")
-        joblib.dump(features_used, features_list_path)
+    # --- Train and Save Model (as a new version in versions_dir) ---
+    result = train_and_save(features_data, cfg, models_dir=models_dir, incremental=args.incremental)
 
+    if result:
         logger.info("-" * 30)
         logger.info(f"Training Summary:")
-        logger.info(f"  Model Type: Gradient Boosting Regressor (Scikit-learn)")
-        logger.info(f"  Features Used: {features_used}")
-        logger.info(f"  Avg Validation MAE: {validation_mae:.4f}")
-        logger.info(f"  Model saved to: {model_output_path}")
-        logger.info(f"  Features list saved to: {features_list_path}")
+        logger.info(f"  Model Type: {type(result['model']).__name__} (backend '{result['backend'].name}')")
+        logger.info(f"  Mode: {result['mode']}")
+        logger.info(f"  Features Used: {result['features']}")
+        logger.info(f"  Avg Validation MAE: {result['cv_mae']:.4f}")
+        logger.info(f"  Current version: {result['version']} in {versions_dir}")
         logger.info("-" * 30)
         logger.info("Model training script finished successfully.")
     else:
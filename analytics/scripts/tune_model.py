@@ -0,0 +1,45 @@
+import argparse
+import logging
+from pathlib import Path
+import pandas as pd
+
+from src.utils.config import load_config
+from src.utils.logging_config import setup_logging
+from src.training.tune_velocity import tune_and_save
+from src.feature_engineering.feature_store import FeatureStore
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the velocity model and save the best parameters as a new version.")
+    parser.add_argument("--n-jobs", type=int, default=None, help="Worker processes (default: velocity_model.n_jobs)")
+    args = parser.parse_args()
+
+    logger.info("Starting model tuning script...")
+    cfg = load_config()
+    if not cfg:
+        logger.error("Failed to load configuration. Exiting.")
+        return
+
+    # Same training set as scripts/train_model.py
+    features_path = Path(cfg['paths']['features_dir']) / "model_input_features.parquet"
+    feature_store = FeatureStore.from_config(cfg)
+    closed_sprints_path = Path(cfg['paths']['processed_data_dir']) / "closed_sprints_with_velocity.parquet"
+    if feature_store.exists() and closed_sprints_path.exists():
+        features_data = feature_store.training_set(pd.read_parquet(closed_sprints_path))
+    elif features_path.exists():
+        features_data = pd.read_parquet(features_path)
+    else:
+        logger.error(f"Features file not found at {features_path}. Please run feature engineering first. Exiting.")
+        return
+
+    version_path = tune_and_save(features_data, cfg, n_jobs=args.n_jobs)
+    if version_path is None:
+        logger.error("Model tuning failed.")
+        return
+    logger.info(f"Model tuning script finished. Parameters saved to {version_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+import json
+import numpy as np
+import pandas as pd
+import logging
+import pyarrow.dataset as ds
+from pathlib import Path
+
+from src.data_processing.preprocessing import (
+    preprocess_sprints,
+    preprocess_issues,
+    sum_done_story_points,
+    attach_actual_velocity
+)
+from src.data_processing.schema import (
+    ISSUE_SCHEMA,
+    ISSUE_PARTITION_COLS,
+    PROCESSED_ISSUES_FILE,
+    read_compact_parquet,
+    compact_issues
+)
+from src.data_processing.streaming import (
+    open_raw_table,
+    read_raw_table,
+    load_transitions_for_issues,
+    preprocess_streaming
+)
+from src.utils.parquet import write_partitions
+from src.feature_engineering.scope import calculate_sprint_scope, parse_sprint_lists, SCOPE_FILE
+from src.feature_engineering.burndown import (
+    calculate_daily_sprint_series,
+    read_daily_sprint_series,
+    write_daily_sprint_series,
+    DAILY_SERIES_FILE
+)
+
+logger = logging.getLogger(__name__)
+
+WATERMARKS_FILE = "watermarks.json"
+ISSUE_HASHES_FILE = "issue_hashes.parquet"
+PROCESSED_FILES = ("processed_sprints.parquet", PROCESSED_ISSUES_FILE, "closed_sprints_with_velocity.parquet",
+                   SCOPE_FILE, DAILY_SERIES_FILE, ISSUE_HASHES_FILE)
+
+
+def load_watermarks(output_dir):
+    """
+    Loads per-project watermarks ({project_key: {'last_transition_ts': iso timestamp,
+    'last_status_ts': iso timestamp}}): the latest transition of any field, and of the status.
+    """
+    path = Path(output_dir) / WATERMARKS_FILE
+    if not path.exists():
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_watermarks(output_dir, watermarks):
+    """Saves per-project watermarks next to the processed files."""
+    path = Path(output_dir) / WATERMARKS_FILE
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(watermarks, f, indent=2, sort_keys=True)
+    tmp_path.replace(path) # Atomic, so a crash never leaves a half-written watermark file
+
+
+def _watermarks(transitions_df, watermarks=None):
+    """The watermarks advanced to the latest transitions (and status transitions) of each project in the frame."""
+    watermarks = dict(watermarks or {})
+    status = transitions_df[transitions_df['field'] == 'status'] if 'field' in transitions_df.columns else transitions_df
+    last_status = status.groupby('project_key')['timestamp'].max()
+    for key, ts in transitions_df.groupby('project_key')['timestamp'].max().items():
+        mark = dict(watermarks.get(key, {}), last_transition_ts=ts.isoformat())
+        if key in last_status.index:
+            mark['last_status_ts'] = last_status[key].isoformat()
+        watermarks[key] = mark
+    return watermarks
+
+
+def _file_fingerprint(path):
+    """Size and modification time of a raw file: a rewritten file changes at least one of them."""
+    stat = Path(path).stat()
+    return stat.st_size, stat.st_mtime_ns
+
+
+def issue_content_hashes(raw_dir, batch_size=100_000, previous_hashes_df=None):
+    """
+    Hash of every raw issue row, computed file by file.
+
+    Field edits that come with no transition (story points, summary, a new issue without
+    transitions yet) change the hash of the issue's row. Each row is recorded with the raw
+    file it was read from and that file's size and modification time: the hashes of files
+    whose size and modification time match `previous_hashes_df` are reused without reading
+    them, so only new or rewritten partitions are hashed again.
+
+    Returns:
+        pd.DataFrame: 'issue_id', 'row_hash' (uint64), 'file' (relative to the issues table),
+                      'file_size' and 'file_mtime_ns' columns.
+    """
+    dataset = open_raw_table(raw_dir, "issues")
+    root = Path(raw_dir) / "issues"
+    previous = {}
+    if previous_hashes_df is not None and 'file' in previous_hashes_df.columns:
+        previous = dict(tuple(previous_hashes_df.groupby('file', sort=False)))
+    hashes = []
+    rehashed = 0
+    for fragment in dataset.get_fragments():
+        file = Path(fragment.path).relative_to(root).as_posix() if root.is_dir() else Path(fragment.path).name
+        size, mtime_ns = _file_fingerprint(fragment.path)
+        old = previous.get(file)
+        if old is not None and old['file_size'].iloc[0] == size and old['file_mtime_ns'].iloc[0] == mtime_ns:
+            hashes.append(old)
+            continue
+        rehashed += 1
+        # The dataset schema adds the hive partition columns, as when reading the whole dataset
+        for record_batch in fragment.to_batches(schema=dataset.schema, batch_size=batch_size):
+            if not record_batch.num_rows:
+                continue
+            issues_batch = record_batch.to_pandas()
+            row_hash = pd.util.hash_pandas_object(issues_batch[sorted(issues_batch.columns)], index=False)
+            hashes.append(pd.DataFrame({'issue_id': issues_batch['issue_id'].to_numpy(), 'row_hash': row_hash.to_numpy(),
+                                        'file': file, 'file_size': size, 'file_mtime_ns': mtime_ns}))
+    logger.info(f"Hashed the issues of {rehashed} new or changed raw files.")
+    if not hashes:
+        return pd.DataFrame({'issue_id': pd.Series(dtype='int64'), 'row_hash': pd.Series(dtype='uint64'),
+                             'file': pd.Series(dtype=object), 'file_size': pd.Series(dtype='int64'),
+                             'file_mtime_ns': pd.Series(dtype='int64')})
+    return pd.concat(hashes, ignore_index=True)
+
+
+def save_issue_hashes(output_dir, hashes_df):
+    """Saves the issue row hashes next to the processed files."""
+    path = Path(output_dir) / ISSUE_HASHES_FILE
+    tmp_path = path.with_suffix(".tmp")
+    hashes_df.to_parquet(tmp_path, index=False)
+    tmp_path.replace(path)
+
+
+def _edited_issue_ids(hashes_df, old_hashes_df):
+    """Ids of the issues that are new or whose row hash changed."""
+    unchanged = pd.MultiIndex.from_frame(hashes_df[['issue_id', 'row_hash']]).isin(
+        pd.MultiIndex.from_frame(old_hashes_df[['issue_id', 'row_hash']]))
+    return hashes_df.loc[~unchanged, 'issue_id'].unique()
+
+
+def _transitions_with_project(transitions_df, raw_dir):
+    """Ensures transitions carry 'project_key', looking it up from the raw issues if needed."""
+    if 'project_key' in transitions_df.columns:
+        transitions_df['project_key'] = transitions_df['project_key'].astype(str)
+        return transitions_df
+    issue_ids = transitions_df['issue_id'].unique()
+    issues = read_raw_table(raw_dir, "issues", columns=["issue_id", "project_key"],
+                            filter=ds.field("issue_id").isin(issue_ids))
+    projects = pd.Series(issues['project_key'].astype(str).to_numpy(), index=issues['issue_id'])
+    transitions_df['project_key'] = transitions_df['issue_id'].map(projects)
+    return transitions_df
+
+
+def read_new_transitions(raw_dir, watermarks):
+    """
+    Reads transitions newer than each project's watermark.
+
+    The timestamp predicate is pushed down to the Parquet reader, so row groups that end
+    before the watermark are not read. Projects without a watermark are read in full.
+    """
+    dataset = open_raw_table(raw_dir, "status_transitions")
+    timestamp = ds.field("timestamp")
+    if 'project_key' in dataset.schema.names and watermarks:
+        project_key = ds.field("project_key")
+        predicate = ~project_key.isin(list(watermarks))
+        for key, mark in watermarks.items():
+            predicate = predicate | ((project_key == key) & (timestamp > pd.Timestamp(mark['last_transition_ts'])))
+    elif watermarks:
+        # No project column to tell projects apart: use the oldest watermark for everyone
+        oldest = min(pd.Timestamp(mark['last_transition_ts']) for mark in watermarks.values())
+        predicate = timestamp > oldest
+    else:
+        predicate = None
+    new_transitions = _transitions_with_project(dataset.to_table(filter=predicate).to_pandas(), raw_dir)
+    if watermarks:
+        # The pushed down predicate compares at microsecond precision; apply the exact watermarks
+        marks = new_transitions['project_key'].map({key: pd.Timestamp(mark['last_transition_ts'])
+                                                    for key, mark in watermarks.items()})
+        new_transitions = new_transitions[marks.isna() | (new_transitions['timestamp'] > marks)]
+    return new_transitions
+
+
+def _upsert(existing_df, updates_df, key):
+    """Replaces rows of `existing_df` whose `key` appears in `updates_df` and appends new ones."""
+    kept = existing_df[~existing_df[key].isin(updates_df[key])]
+    if updates_df.empty:
+        return kept
+    return pd.concat([kept, updates_df], ignore_index=True).sort_values(key, kind='mergesort', ignore_index=True)
+
+
+def _project_filter(raw_dir, name, projects):
+    """A predicate keeping the given projects of a raw table, or None when it has no project column."""
+    if projects is None or 'project_key' not in open_raw_table(raw_dir, name).schema.names:
+        return None
+    return ds.field("project_key").isin(sorted(projects))
+
+
+def _sprint_event_ids(transitions_df):
+    """Sprint ids named in the sprint field transitions of a frame."""
+    events = transitions_df[transitions_df['field'] == 'sprint']
+    return set(parse_sprint_lists(events['from_status'])[1]) | set(parse_sprint_lists(events['to_status'])[1])
+
+
+def _issues_of_sprints(raw_dir, processed_issues_df, sprint_ids, projects=None):
+    """
+    The processed issues that are or ever were in one of `sprint_ids`, with all their transitions.
+
+    Only the sprint field transitions of the sprints' `projects` are scanned to find those
+    issues (the predicates are pushed down to the Parquet reader, which skips the other
+    projects' partitions); all transitions are then loaded for them alone.
+    """
+    sprint_ids = list(sprint_ids)
+    if not sprint_ids:
+        return processed_issues_df.iloc[0:0], load_transitions_for_issues(raw_dir, [])
+    in_projects = _project_filter(raw_dir, "status_transitions", projects)
+    is_sprint_event = ds.field("field") == "sprint"
+    events = read_raw_table(raw_dir, "status_transitions", columns=["issue_id", "from_status", "to_status"],
+                            filter=is_sprint_event if in_projects is None else is_sprint_event & in_projects)
+    issue_ids = set(processed_issues_df.loc[processed_issues_df['sprint_id'].isin(sprint_ids), 'issue_id'])
+    for column in ("from_status", "to_status"):
+        rows, ids = parse_sprint_lists(events[column])
+        issue_ids |= set(events['issue_id'].to_numpy()[rows[np.isin(ids, sprint_ids)]])
+    # Issues deleted from the raw dataset can still have transitions there: leave them out
+    sprint_issues_df = processed_issues_df[processed_issues_df['issue_id'].isin(issue_ids)]
+    return sprint_issues_df, load_transitions_for_issues(raw_dir, sprint_issues_df['issue_id'].unique(),
+                                                         filter=in_projects)
+
+
+def preprocess_incremental(raw_dir, output_dir, config, batch_size=100_000):
+    """
+    Updates the processed files with the changes since the last run.
+
+    A per-project watermark (the latest transition timestamp already processed) selects the
+    new transitions, and a hash of every raw issue row finds the issues edited without a
+    transition (e.g. story points), new issues and deleted ones; only the raw files changed
+    since the last run are hashed again. Only those issues are re-preprocessed (deleted ones
+    are dropped), and only the partitions (projects) of the processed issues dataset they
+    belong to are rewritten. Velocity, sprint scope and daily series are recomputed only for the sprints
+    those issues belong (or belonged) to plus sprints whose own state changed, reading the
+    partitions of their projects; the daily series of active sprints are recomputed on every
+    run, as they run until `as_of`. Without previous output, falls back to a full streaming run
+    and records the initial watermarks and issue hashes.
+
+    Note: open status intervals of issues that did not change keep the `as_of` (the latest
+    status transition) of the run that last processed them.
+
+    Args:
+        raw_dir (str | Path): Raw dataset with 'sprints', 'issues' and 'status_transitions' tables.
+        output_dir (str | Path): Directory of the processed Parquet files and the watermarks.
+        config (dict): Loaded configuration.
+        batch_size (int): Batch size for the initial full run and the issue hashing.
+
+    Returns:
+        dict: Counts of changed issues and affected sprints.
+    """
+    output_dir = Path(output_dir)
+    watermarks = load_watermarks(output_dir)
+    issues_path = output_dir / PROCESSED_ISSUES_FILE
+    # Processed issues written as a single file (before partitioning) need a full run as well
+    have_outputs = all((output_dir / name).exists() for name in PROCESSED_FILES) and issues_path.is_dir()
+
+    if not watermarks or not have_outputs:
+        logger.info("No previous watermarks or processed files found. Running full preprocessing...")
+        counts = preprocess_streaming(raw_dir, output_dir, config, batch_size=batch_size)
+        columns = [c for c in ("issue_id", "project_key", "field", "timestamp")
+                   if c in open_raw_table(raw_dir, "status_transitions").schema.names]
+        transitions = _transitions_with_project(read_raw_table(raw_dir, "status_transitions", columns=columns), raw_dir)
+        save_watermarks(output_dir, _watermarks(transitions))
+        save_issue_hashes(output_dir, issue_content_hashes(raw_dir, batch_size))
+        return counts
+
+    # 1. Changes since the last run: issues with new transitions, issues whose raw row changed
+    # and issues no longer in the raw dataset
+    new_transitions = read_new_transitions(raw_dir, watermarks)
+    old_hashes_df = pd.read_parquet(output_dir / ISSUE_HASHES_FILE)
+    hashes_df = issue_content_hashes(raw_dir, batch_size, previous_hashes_df=old_hashes_df)
+    edited_issue_ids = _edited_issue_ids(hashes_df, old_hashes_df)
+    deleted_issue_ids = np.setdiff1d(old_hashes_df['issue_id'].unique(), hashes_df['issue_id'].unique())
+    changed_issue_ids = np.union1d(np.union1d(new_transitions['issue_id'].unique(), edited_issue_ids),
+                                   deleted_issue_ids)
+    reprocessed_issue_ids = np.setdiff1d(changed_issue_ids, deleted_issue_ids)
+    logger.info(f"Found {len(new_transitions)} new transitions, {len(edited_issue_ids)} new or edited issues and "
+                f"{len(deleted_issue_ids)} deleted issues: {len(changed_issue_ids)} issues to update.")
+
+    # Only the few columns needed to locate the changed issues are read for the whole dataset
+    issue_index_df = read_compact_parquet(
+        issues_path, ISSUE_SCHEMA,
+        columns=['issue_id', 'project_key', 'sprint_id', 'story_points', 'story_points_imputed']
+    )
+    old_sprints_df = pd.read_parquet(output_dir / "processed_sprints.parquet")
+    old_velocity_df = pd.read_parquet(output_dir / "closed_sprints_with_velocity.parquet")
+    old_scope_df = pd.read_parquet(output_dir / SCOPE_FILE)
+    old_daily_series_df = read_daily_sprint_series(output_dir / DAILY_SERIES_FILE)
+
+    # 2. Sprints are small: reprocess them and diff to find the ones whose state changed
+    processed_sprints_df = preprocess_sprints(read_raw_table(raw_dir, "sprints"))
+    compare_cols = ['sprint_id', 'state', 'start_date', 'end_date', 'completed_date']
+    sprint_diff = processed_sprints_df[compare_cols].merge(
+        old_sprints_df[compare_cols], on='sprint_id', how='left', suffixes=('', '_old'), indicator=True
+    )
+    changed = sprint_diff['_merge'] == 'left_only'
+    for col in compare_cols[1:]:
+        changed |= ~((sprint_diff[col] == sprint_diff[f"{col}_old"]) |
+                     (sprint_diff[col].isna() & sprint_diff[f"{col}_old"].isna()))
+    changed_sprint_ids = set(sprint_diff.loc[changed, 'sprint_id'])
+
+    # Open status intervals run until the latest status transition, as in a full run
+    # (watermarks saved before 'last_status_ts' existed only have the latest transition)
+    status_marks = [mark['last_status_ts'] for mark in watermarks.values() if 'last_status_ts' in mark]
+    as_of = max(pd.Timestamp(ts) for ts in status_marks or [mark['last_transition_ts'] for mark in watermarks.values()])
+    new_status_ts = new_transitions.loc[new_transitions['field'] == 'status', 'timestamp'].max()
+    if pd.notna(new_status_ts):
+        as_of = max(as_of, new_status_ts)
+
+    # 3. Re-preprocess only the changed issues, with all of their transitions
+    if len(reprocessed_issue_ids):
+        issues_df = read_raw_table(raw_dir, "issues", filter=ds.field("issue_id").isin(reprocessed_issue_ids))
+        transitions_df = load_transitions_for_issues(raw_dir, reprocessed_issue_ids)
+        # Impute with the mean of the already processed (non-imputed) story points
+        known_points = issue_index_df.loc[~issue_index_df['story_points_imputed'].astype(bool), 'story_points']
+        fill_value = known_points.mean() if not known_points.empty else None
+        updated_issues_df = preprocess_issues(issues_df, transitions_df, config,
+                                              story_points_fill_value=fill_value, as_of=as_of)
+        event_sprint_ids = _sprint_event_ids(transitions_df)
+    else:
+        updated_issues_df = None
+        event_sprint_ids = set()
+
+    # Sprints an updated issue belongs to now or belonged to before need new velocity and scope
+    previous_issues = issue_index_df[issue_index_df['issue_id'].isin(changed_issue_ids)]
+    updated_sprint_ids = set(updated_issues_df['sprint_id'].dropna()) if updated_issues_df is not None else set()
+    affected_sprint_ids = (changed_sprint_ids | set(previous_issues['sprint_id'].dropna()) | updated_sprint_ids
+                           | event_sprint_ids)
+    # The daily series of active sprints run until as_of, so they grow even when nothing touched them
+    active_sprint_ids = set(processed_sprints_df.loc[processed_sprints_df['state'] == 'active', 'sprint_id'])
+    series_sprint_ids = affected_sprint_ids | active_sprint_ids
+
+    # 4. Upsert the changed issues into the partitions of their projects. The partitions of the
+    # projects of the recomputed sprints are read as well: they hold every issue of those sprints
+    changed_projects = set(previous_issues['project_key'].astype(str))
+    if updated_issues_df is not None:
+        changed_projects |= set(updated_issues_df['project_key'].astype(str))
+    projects = changed_projects | set(
+        processed_sprints_df.loc[processed_sprints_df['sprint_id'].isin(series_sprint_ids), 'project_key'].astype(str))
+    if projects:
+        processed_issues_df = read_compact_parquet(issues_path, ISSUE_SCHEMA,
+                                                   filters=[('project_key', 'in', sorted(projects))])
+    else:
+        processed_issues_df = ds.dataset(issues_path, format="parquet", partitioning="hive").schema.empty_table().to_pandas()
+    if len(deleted_issue_ids):
+        processed_issues_df = processed_issues_df[~processed_issues_df['issue_id'].isin(deleted_issue_ids)]
+    if updated_issues_df is not None:
+        # Concatenating categoricals with different categories gives object columns; compact again
+        processed_issues_df = compact_issues(_upsert(processed_issues_df, updated_issues_df, 'issue_id'))
+
+    # Then recompute velocity, scope and daily series for the affected sprints only
+    affected_closed_df = processed_sprints_df[
+        processed_sprints_df['sprint_id'].isin(affected_sprint_ids) & (processed_sprints_df['state'] == 'closed')
+    ]
+    affected_issues_df = processed_issues_df[processed_issues_df['sprint_id'].isin(affected_sprint_ids)]
+    updated_velocity_df = attach_actual_velocity(affected_closed_df, sum_done_story_points(affected_issues_df))
+    velocity_df = _upsert(
+        old_velocity_df[~old_velocity_df['sprint_id'].isin(affected_sprint_ids)], updated_velocity_df, 'sprint_id'
+    )
+
+    # Scope of the affected sprints and daily series of those and the active ones, from every
+    # issue that was ever in one of them
+    series_sprints_df = processed_sprints_df[processed_sprints_df['sprint_id'].isin(series_sprint_ids)]
+    sprint_issues_df, sprint_transitions_df = _issues_of_sprints(
+        raw_dir, processed_issues_df, series_sprint_ids, projects=set(series_sprints_df['project_key'].astype(str)))
+    status_mapping = config.get('status_mapping', {})
+    scope_df = _upsert(
+        old_scope_df[~old_scope_df['sprint_id'].isin(affected_sprint_ids)],
+        # All sprints: an issue's carried over points depend on its earlier, unaffected sprints
+        calculate_sprint_scope(processed_sprints_df, sprint_issues_df, sprint_transitions_df, status_mapping,
+                               as_of=as_of, sprint_ids=affected_sprint_ids),
+        'sprint_id'
+    )
+    daily_series_df = pd.concat([
+        old_daily_series_df[~old_daily_series_df['sprint_id'].isin(series_sprint_ids)],
+        calculate_daily_sprint_series(series_sprints_df, sprint_issues_df, sprint_transitions_df, status_mapping,
+                                      as_of=as_of),
+    ], ignore_index=True)
+
+    processed_sprints_df.to_parquet(output_dir / "processed_sprints.parquet", index=False)
+    if changed_projects:
+        changed_partitions = processed_issues_df['project_key'].astype(str).isin(changed_projects)
+        write_partitions(processed_issues_df[changed_partitions], issues_path, ISSUE_PARTITION_COLS, replace=True)
+    velocity_df.to_parquet(output_dir / "closed_sprints_with_velocity.parquet", index=False)
+    scope_df.to_parquet(output_dir / SCOPE_FILE, index=False)
+    write_daily_sprint_series(daily_series_df, output_dir / DAILY_SERIES_FILE)
+
+    # 5. Advance the watermarks and issue hashes only after the outputs are written
+    if not new_transitions.empty:
+        save_watermarks(output_dir, _watermarks(new_transitions, watermarks))
+    # Also when only the file fingerprints changed (e.g. a partition rewritten with the same rows)
+    if not hashes_df[['issue_id', 'row_hash', 'file', 'file_size', 'file_mtime_ns']].equals(
+            old_hashes_df.reindex(columns=hashes_df.columns)):
+        save_issue_hashes(output_dir, hashes_df)
+
+    counts = {
+        "changed_issues": int(len(changed_issue_ids)),
+        "edited_issues": int(len(edited_issue_ids)),
+        "deleted_issues": int(len(deleted_issue_ids)),
+        "rewritten_partitions": len(changed_projects),
+        "affected_sprints": len(affected_sprint_ids),
+        "recomputed_daily_series": len(series_sprint_ids),
+        "recomputed_velocities": len(updated_velocity_df),
+    }
+    logger.info(f"Incremental preprocessing complete: {counts}")
+    return counts
@@ -0,0 +1,346 @@
+import asyncio
+import random
+import logging
+import httpx
+import pandas as pd
+
+from src.data_processing.schema import compact_issues, compact_transitions, compact_sprints
+from src.data_processing.raw_cache import RawCache
+
+logger = logging.getLogger(__name__)
+
+SEARCH_PATH = "/rest/api/2/search"
+BOARDS_PATH = "/rest/agile/1.0/board"
+MYSELF_PATH = "/rest/api/2/myself"
+RETRY_STATUSES = {429, 502, 503, 504}
+# JQL dates are read in the user's profile time zone. When it is unknown, the revalidation
+# mark moves back by the largest offset west of UTC (refetched issues are deduplicated)
+JQL_UNKNOWN_TZ_MARGIN = pd.Timedelta(hours=12)
+
+SPRINT_COLUMNS = ["sprint_id", "project_key", "board_id", "name", "start_date", "end_date",
+                  "completed_date", "state", "goal"]
+ISSUE_COLUMNS = ["issue_id", "issue_key", "project_key", "issuetype", "status", "resolution", "summary",
+                 "assignee", "reporter", "created_date", "resolved_date", "story_points", "sprint_id"]
+TRANSITION_COLUMNS = ["issue_id", "field", "from_status", "to_status", "timestamp"]
+
+
+def _to_utc_naive(values):
+    """Parses Jira timestamps (with offsets) into naive UTC datetimes, like the rest of the pipeline."""
+    return pd.to_datetime(pd.Series(values, dtype=object), errors='coerce', utc=True).dt.tz_convert(None)
+
+
+def _name(obj, key='name'):
+    """Returns obj[key] for Jira's nested {name: ...} objects, None for missing ones."""
+    return obj.get(key) if isinstance(obj, dict) else None
+
+
+class JiraExtractor:
+    """
+    Extracts sprints, issues and status transitions of one Jira project.
+
+    Requests go through one pooled async HTTP client with at most `jira.max_concurrency`
+    requests in flight. Paginated endpoints fetch their first page to learn the total and
+    then request the remaining pages concurrently. 429 (and transient 5xx) responses,
+    timeouts and connection errors are retried with exponential backoff, honouring
+    Retry-After. Issues are searched with `expand=changelog`, so the changelog endpoint is
+    only called for issues whose history does not fit in the search response.
+
+    With a RawCache, responses are written through to the cache and later runs only search
+    issues updated since the latest `updated` timestamp already cached. With replay=True the
+    frames are built from the cache alone, without any network access.
+
+    Usage:
+        extractor = JiraExtractor(config, project_key="PROJ", api_token="...")
+        sprints_df, issues_df, status_transitions_df = extractor.extract()
+    """
+
+    def __init__(self, config, project_key, api_token=None, base_url=None, transport=None, cache=None, replay=False):
+        jira_cfg = config.get('jira', {})
+        self.project_key = project_key
+        self.cache = cache
+        self.replay = replay
+        self.base_url = (base_url or jira_cfg.get('base_url', '')).rstrip('/')
+        self.story_points_field = config.get('jira_field_names', {}).get('story_points')
+        self.sprint_field = config.get('jira_field_names', {}).get('sprint')
+        self.page_size = jira_cfg.get('page_size', 100)
+        self.max_concurrency = jira_cfg.get('max_concurrency', 8)
+        self.max_retries = jira_cfg.get('max_retries', 5)
+        self.backoff_s = jira_cfg.get('backoff_s', 1.0)
+        self.timeout_s = jira_cfg.get('timeout_s', 30)
+        self._transport = transport # For tests: e.g. httpx.MockTransport
+        if jira_cfg.get('email'):
+            # Jira Cloud: basic auth with the account email and the API token
+            self._auth, self._headers = httpx.BasicAuth(jira_cfg['email'], api_token), {}
+        else:
+            # Jira Data Center / Server: personal access token
+            self._auth, self._headers = None, {"Authorization": f"Bearer {api_token}"}
+        self._client = None
+        self._semaphore = None
+
+    # --- HTTP ---
+
+    async def _get(self, path, params=None):
+        """GET with bounded concurrency and retries with backoff on 429/5xx, timeouts and connection errors."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._semaphore:
+                    response = await self._client.get(path, params=params)
+            except httpx.TransportError as e: # Includes httpx.TimeoutException
+                if attempt == self.max_retries:
+                    raise
+                reason, delay = type(e).__name__, self.backoff_s * 2 ** attempt
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    response.raise_for_status()
+                    return response.json()
+                retry_after = response.headers.get("Retry-After")
+                reason = response.status_code
+                delay = float(retry_after) if retry_after and retry_after.isdigit() else self.backoff_s * 2 ** attempt
+            delay += random.uniform(0, self.backoff_s) # Jitter, so throttled requests do not retry in lockstep
+            logger.warning(f"{reason} from {path}; retrying in {delay:.1f}s "
+                           f"(attempt {attempt + 1}/{self.max_retries}).")
+            await asyncio.sleep(delay)
+
+    async def _get_paginated(self, path, items_key, params=None, page_size=None):
+        """
+        Fetches all pages of a startAt/maxResults endpoint.
+
+        If the first page reports a total, the remaining pages are requested concurrently;
+        otherwise pages are followed one by one until 'isLast'.
+        """
+        page_size = page_size or self.page_size
+        params = dict(params or {})
+        first = await self._get(path, {**params, "startAt": 0, "maxResults": page_size})
+        items = list(first.get(items_key, []))
+        total = first.get("total")
+        # The server may cap maxResults below what was asked for
+        step = first.get("maxResults") or page_size
+
+        if total is not None:
+            pages = await asyncio.gather(*[
+                self._get(path, {**params, "startAt": start, "maxResults": step})
+                for start in range(len(items), total, step)
+            ])
+            for page in pages:
+                items.extend(page.get(items_key, []))
+            return items
+
+        page = first
+        while not page.get("isLast", True) and page.get(items_key):
+            page = await self._get(path, {**params, "startAt": len(items), "maxResults": step})
+            items.extend(page.get(items_key, []))
+        return items
+
+    # --- Endpoints ---
+
+    async def fetch_boards(self):
+        """Lists the boards of the project."""
+        return await self._get_paginated(BOARDS_PATH, "values", {"projectKeyOrId": self.project_key}, page_size=50)
+
+    async def fetch_sprints(self, boards=None):
+        """Lists the sprints of all boards of the project (boards are fetched concurrently)."""
+        boards = boards if boards is not None else await self.fetch_boards()
+        per_board = await asyncio.gather(*[
+            self._get_paginated(f"{BOARDS_PATH}/{board['id']}/sprint", "values", page_size=50)
+            for board in boards if board.get("type", "scrum") == "scrum" # Kanban boards have no sprints
+        ])
+        sprints = {}
+        for board_sprints in per_board:
+            for sprint in board_sprints:
+                sprints[sprint["id"]] = sprint # A sprint can show up on several boards
+        return list(sprints.values())
+
+    async def fetch_user_timezone(self):
+        """The time zone of the API user's Jira profile (e.g. 'Europe/Berlin'), or None if unavailable."""
+        try:
+            return (await self._get(MYSELF_PATH)).get("timeZone")
+        except (httpx.HTTPError, ValueError) as e:
+            logger.warning(f"Could not read the Jira profile time zone ({e}).")
+            return None
+
+    def jql_datetime(self, timestamp, timezone=None):
+        """
+        Formats a timestamp for JQL, which reads dates in the user's profile time zone.
+
+        Naive timestamps are taken as UTC. Without a `timezone` (or with an unknown one) the
+        result is JQL_UNKNOWN_TZ_MARGIN earlier than `timestamp`, so no update is missed.
+        """
+        ts = pd.Timestamp(timestamp)
+        ts = ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+        try:
+            local = ts.tz_convert(timezone) if timezone else None
+        except Exception: # Unknown zone name
+            logger.warning(f"Unknown Jira time zone {timezone!r}.")
+            local = None
+        if local is None:
+            local = ts - JQL_UNKNOWN_TZ_MARGIN
+        return local.strftime('%Y/%m/%d %H:%M')
+
+    async def fetch_issues(self, jql=None, updated_since=None, timezone=None):
+        """
+        Searches the issues of the project, including (the first page of) their changelogs.
+
+        `updated_since` (a Jira timestamp string) restricts the search to issues updated in or
+        after that minute, written in the user's `timezone` (see jql_datetime); JQL dates have
+        minute precision, so the boundary minute is refetched.
+        """
+        fields = ["issuetype", "status", "resolution", "summary", "assignee", "reporter",
+                  "created", "updated", "resolutiondate", self.story_points_field, self.sprint_field]
+        if jql is None:
+            jql = f"project = {self.project_key}"
+            if updated_since:
+                jql += f" AND updated >= \"{self.jql_datetime(updated_since, timezone)}\""
+            jql += " ORDER BY id ASC"
+        params = {
+            "jql": jql,
+            "fields": ",".join(f for f in fields if f),
+            "expand": "changelog",
+        }
+        return await self._get_paginated(SEARCH_PATH, "issues", params)
+
+    async def fetch_changelog(self, issue_id):
+        """Fetches the full changelog of one issue."""
+        return await self._get_paginated(f"/rest/api/2/issue/{issue_id}/changelog", "values")
+
+    async def _complete_changelogs(self, issues):
+        """Replaces truncated inline changelogs with the full ones, fetched concurrently."""
+        truncated = [issue for issue in issues
+                     if issue.get("changelog", {}).get("total", 0) > len(issue.get("changelog", {}).get("histories", []))]
+        if truncated:
+            logger.info(f"Fetching full changelogs for {len(truncated)} issues...")
+            histories = await asyncio.gather(*[self.fetch_changelog(issue["id"]) for issue in truncated])
+            for issue, issue_histories in zip(truncated, histories):
+                issue["changelog"] = {"histories": issue_histories, "total": len(issue_histories)}
+        return issues
+
+    async def extract_async(self):
+        """Fetches sprints, issues and changelogs concurrently and builds the three DataFrames."""
+        if self.replay:
+            return self.build_frames(*self._replay_from_cache())
+
+        index = self.cache.load_index(self.project_key) if self.cache else None
+        updated_since = index.get('updated_since') if index else None
+        limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+        async with httpx.AsyncClient(base_url=self.base_url, auth=self._auth, headers=self._headers,
+                                     limits=limits, timeout=self.timeout_s, transport=self._transport) as client:
+            self._client = client
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            timezone = await self.fetch_user_timezone() if updated_since else None
+            sprints, issues = await asyncio.gather(self.fetch_sprints(),
+                                                   self.fetch_issues(updated_since=updated_since, timezone=timezone))
+            issues = await self._complete_changelogs(issues)
+        self._client = None
+        logger.info(f"Extracted {len(sprints)} sprints and {len(issues)} "
+                    f"{'updated ' if updated_since else ''}issues for project {self.project_key}.")
+
+        if self.cache:
+            sprints, issues = self._write_to_cache(index, sprints, issues, append=updated_since is not None)
+        return self.build_frames(sprints, issues)
+
+    def extract(self):
+        """Synchronous wrapper around extract_async."""
+        return asyncio.run(self.extract_async())
+
+    # --- Raw cache ---
+
+    def _write_to_cache(self, index, sprints, issues, append):
+        """
+        Stores the fetched responses and returns the full cached sprints and issues.
+
+        Sprints are always refetched (their state changes) and replace the cached ones; the
+        updated issues are appended and win over their older cached versions, then the issue
+        pages are compacted so the index does not grow with every sync. The revalidation mark
+        only moves forward once everything is stored.
+        """
+        self.cache.write_pages(index, "sprints", sprints, self.page_size)
+        self.cache.write_pages(index, "issues", issues, self.page_size, append=append)
+        updated = [issue["fields"]["updated"] for issue in issues if issue.get("fields", {}).get("updated")]
+        if updated:
+            latest = max(updated, key=lambda ts: pd.Timestamp(ts))
+            previous = index.get('updated_since')
+            if previous is None or pd.Timestamp(latest) > pd.Timestamp(previous):
+                index['updated_since'] = latest
+        self.cache.save_index(self.project_key, index)
+        if append:
+            return sprints, self.cache.compact(self.project_key, "issues", self.page_size)
+        return sprints, self.cache.read_items(index, "issues")
+
+    def _replay_from_cache(self):
+        """Loads the cached sprints and issues of the project."""
+        if self.cache is None or not self.cache.has_project(self.project_key):
+            raise FileNotFoundError(f"No cached extraction for project {self.project_key}; run an online extraction first.")
+        index = self.cache.load_index(self.project_key)
+        sprints, issues = self.cache.read_items(index, "sprints"), self.cache.read_items(index, "issues")
+        logger.info(f"Replaying {len(sprints)} sprints and {len(issues)} issues of project {self.project_key} from the cache.")
+        return sprints, issues
+
+    # --- DataFrame construction (one bulk constructor call per frame) ---
+
+    def build_frames(self, sprints, issues):
+        """Builds the sprints, issues and status transitions frames."""
+        return self.build_sprints_df(sprints), self.build_issues_df(issues), self.build_transitions_df(issues)
+
+    def build_sprints_df(self, sprints):
+        """Builds the sprints frame from Jira sprint objects."""
+        df = pd.DataFrame.from_records([
+            (s["id"], self.project_key, s.get("originBoardId"), s.get("name"), s.get("startDate"),
+             s.get("endDate"), s.get("completeDate"), s.get("state"), s.get("goal"))
+            for s in sprints
+        ], columns=SPRINT_COLUMNS)
+        for col in ["start_date", "end_date", "completed_date"]:
+            df[col] = _to_utc_naive(df[col])
+        return compact_sprints(df.sort_values("sprint_id", ignore_index=True))
+
+    def _current_sprint_id(self, sprint_value):
+        """The issue's most recent sprint from the sprint custom field (a list of sprint objects)."""
+        if isinstance(sprint_value, list) and sprint_value:
+            last = sprint_value[-1]
+            return last.get("id") if isinstance(last, dict) else None
+        return None
+
+    def build_issues_df(self, issues):
+        """Builds the issues frame from Jira search results."""
+        records = []
+        for issue in issues:
+            f = issue.get("fields", {})
+            records.append((
+                int(issue["id"]), issue["key"], self.project_key, _name(f.get("issuetype")),
+                _name(f.get("status")), _name(f.get("resolution")), f.get("summary"),
+                _name(f.get("assignee"), 'displayName'), _name(f.get("reporter"), 'displayName'),
+                f.get("created"), f.get("resolutiondate"),
+                f.get(self.story_points_field) if self.story_points_field else None,
+                self._current_sprint_id(f.get(self.sprint_field)) if self.sprint_field else None,
+            ))
+        df = pd.DataFrame.from_records(records, columns=ISSUE_COLUMNS)
+        df["created_date"] = _to_utc_naive(df["created_date"])
+        df["resolved_date"] = _to_utc_naive(df["resolved_date"])
+        df["story_points"] = pd.to_numeric(df["story_points"], errors='coerce')
+        return compact_issues(df.sort_values("issue_id", ignore_index=True))
+
+    def build_transitions_df(self, issues):
+        """
+        Builds the transitions frame from the issues' changelogs.
+
+        Each issue gets a creation row (into its initial status) followed by its status changes.
+        Sprint field changes are kept as field 'sprint' rows holding comma-separated sprint ids.
+        """
+        records = []
+        for issue in issues:
+            issue_id = int(issue["id"])
+            histories = sorted(issue.get("changelog", {}).get("histories", []), key=lambda h: h["created"])
+            # Field names compared case-insensitively, in one place
+            changes = [(history["created"], (item.get("field") or "").lower(), item)
+                       for history in histories for item in history.get("items", [])]
+            status_changes = [item for _, field, item in changes if field == "status"]
+            # The initial status is where the first status change came from (or the current status)
+            initial_status = (status_changes[0].get("fromString") if status_changes
+                              else _name(issue.get("fields", {}).get("status")))
+            records.append((issue_id, "status", None, initial_status, issue.get("fields", {}).get("created")))
+            for ts, field, item in changes:
+                if field == "status":
+                    records.append((issue_id, "status", item.get("fromString"), item.get("toString"), ts))
+                elif field == "sprint":
+                    records.append((issue_id, "sprint", item.get("from") or None, item.get("to") or None, ts))
+        df = pd.DataFrame.from_records(records, columns=TRANSITION_COLUMNS)
+        df["timestamp"] = _to_utc_naive(df["timestamp"])
+        return compact_transitions(df)
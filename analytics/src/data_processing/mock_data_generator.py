@@ -1,112 +1,310 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+import logging
+from datetime import datetime
+from pathlib import Path
+from src.utils.parquet import arrow_schema
 
-def generate_mock_data(num_sprints=30, issues_per_sprint=15, start_date="2023-01-09"):
+logger = logging.getLogger(__name__)
+
+ISSUE_TYPES = np.array(["Story", "Task", "Bug"], dtype=object)
+ISSUE_TYPE_P = [0.6, 0.3, 0.1]
+STORY_POINTS = np.array([1, 2, 3, 5, 8, 13, np.nan])
+STORY_POINTS_P = [0.1, 0.2, 0.3, 0.2, 0.1, 0.05, 0.05]
+DONE_STATUSES = np.array(["Done", "Resolved", "Closed"], dtype=object)
+DONE_STATUSES_P = [0.8, 0.1, 0.1]
+
+DAY = np.timedelta64(1, 'D')
+HOUR = np.timedelta64(1, 'h')
+
+
+def _project_key(project_idx, num_projects):
+    """Project key for the given project index ('PROJ' when only one project is generated)."""
+    return "PROJ" if num_projects == 1 else f"PROJ{project_idx + 1}"
+
+
+def _random_offsets(spans, u):
+    """Offsets within the given timedelta64 spans, at the fractions `u` (uniform in [0, 1)) of them."""
+    return (spans.astype(np.int64) * u).astype('timedelta64[ns]')
+
+
+def _sprint_generators(seed_sequence, sprint_ids):
+    """One random generator per sprint, keyed by the sprint id, so a sprint's data does not depend on the chunking."""
+    return [np.random.default_rng(np.random.SeedSequence(seed_sequence.entropy, spawn_key=(int(sprint_id),)))
+            for sprint_id in sprint_ids]
+
+
+def _per_sprint(rngs, draw):
+    """One value per sprint, each drawn from the sprint's generator."""
+    return np.array([draw(rng) for rng in rngs])
+
+
+def _per_issue(rngs, counts, draw):
+    """`count` values per sprint, each sprint's drawn from its generator, concatenated in sprint order."""
+    return np.concatenate([draw(rng, int(n)) for rng, n in zip(rngs, counts)])
+
+
+def _generate_sprint_block(seed_sequence, project_key, board_id, first_sprint_id, first_issue_id,
+                           sprint_starts, issues_per_sprint, now, last_sprint_id):
+    """
+    Generates sprints, issues and status transitions for consecutive sprints of one board.
+
+    All issues of the block are drawn at once as NumPy arrays; there is no per-issue Python loop.
+    Each sprint draws its values from its own generator (see _sprint_generators) and full-size
+    arrays are drawn even where only some issues use them, so the data of a sprint is the same
+    whatever block it is generated in.
+
+    Returns:
+        tuple: (sprints_df, issues_df, status_transitions_df)
+    """
+    num_sprints = len(sprint_starts)
+    sprint_ids = np.arange(first_sprint_id, first_sprint_id + num_sprints)
+    rngs = _sprint_generators(seed_sequence, sprint_ids)
+    sprint_ends = sprint_starts + 13 * DAY # 2 week sprints
+    is_closed = sprint_ends < now
+    is_active = (sprint_starts <= now) & (now <= sprint_ends)
+    sprint_state = np.where(is_closed, 'closed', np.where(is_active, 'active', 'future')).astype(object)
+    completed_date = np.where(is_closed, sprint_ends + _per_sprint(rngs, lambda r: r.integers(0, 2)) * DAY,
+                              np.datetime64('NaT'))
+
+    sprints_df = pd.DataFrame({
+        "sprint_id": sprint_ids,
+        "project_key": project_key,
+        "board_id": board_id,
+        "name": [f"Sprint {i}" for i in sprint_ids],
+        "start_date": sprint_starts,
+        "end_date": sprint_ends,
+        "completed_date": completed_date,
+        "state": sprint_state,
+        "goal": [f"Goal for Sprint {i}" for i in sprint_ids],
+    })
+
+    # --- Issues: one row per issue, sprint attributes broadcast with np.repeat ---
+    issue_counts = _per_sprint(rngs, lambda r: r.integers(int(issues_per_sprint * 0.8), int(issues_per_sprint * 1.2)))
+    num_issues = int(issue_counts.sum())
+    issue_ids = np.arange(first_issue_id, first_issue_id + num_issues)
+    issue_sprint_ids = np.repeat(sprint_ids, issue_counts)
+    start = np.repeat(sprint_starts, issue_counts)
+    end = np.repeat(sprint_ends, issue_counts)
+    closed = np.repeat(is_closed, issue_counts)
+    active = np.repeat(is_active, issue_counts)
+
+    def draw(sample):
+        return _per_issue(rngs, issue_counts, sample)
+
+    def uniform():
+        return draw(lambda r, n: r.random(n))
+
+    def integers(low, high):
+        return draw(lambda r, n: r.integers(low, high, n))
+
+    def choice(values, p=None):
+        return draw(lambda r, n: r.choice(values, n, p=p))
+
+    issue_type = choice(ISSUE_TYPES, ISSUE_TYPE_P)
+    created_date = start - integers(1, 20) * DAY # Created before sprint start
+    story_points = np.where(issue_type != "Bug", choice(STORY_POINTS, STORY_POINTS_P), np.nan)
+
+    # Simulate status and resolution based on whether sprint is closed
+    done = closed & (uniform() < 0.9) # 90% chance issues in closed sprints are done
+    closed_not_done = closed & ~done
+    active_started = active & (uniform() < 0.5)
+
+    final_status = np.full(num_issues, "To Do", dtype=object)
+    final_status[done] = choice(DONE_STATUSES, DONE_STATUSES_P)[done]
+    final_status[closed_not_done] = choice(np.array(["To Do", "In Progress"], dtype=object))[closed_not_done]
+    final_status[active_started] = choice(np.array(["In Progress", "In Review"], dtype=object))[active_started]
+
+    inprogress_start = np.full(num_issues, np.datetime64('NaT'), dtype='datetime64[ns]')
+    hours = integers(0, 8) * HOUR
+    inprogress_start[done] = (start + integers(0, 5) * DAY + hours)[done]
+    started_not_done = closed_not_done & (final_status == "In Progress")
+    inprogress_start[started_not_done] = (start + integers(0, 10) * DAY + hours)[started_not_done]
+    # Active sprints: started on one of the days since the sprint start
+    days_since_start = np.maximum(((now - start) // DAY).astype(np.int64) + 1, 1)
+    active_day = (uniform() * days_since_start).astype(np.int64)
+    inprogress_start[active_started] = (start + active_day * DAY + hours)[active_started]
+
+    resolved_date = np.full(num_issues, np.datetime64('NaT'), dtype='datetime64[ns]')
+    resolved = inprogress_start + integers(1, 10) * DAY + integers(0, 8) * HOUR
+    # Ensure resolved date is within reasonable bounds
+    resolved = np.minimum(resolved, end + 2 * DAY)
+    resolved = np.maximum(resolved, inprogress_start + HOUR)
+    resolved_date[done] = resolved[done]
+
+    # --- Sprint field: planned before the start, added mid-sprint, removed or carried over ---
+    started = ~np.isnat(inprogress_start)
+    added = np.repeat(sprint_starts <= now, issue_counts) & (uniform() < 0.1)
+    # Added issues join the sprint before work on them starts (and not in the future)
+    join_by = np.minimum(np.where(started, inprogress_start, end), now)
+    join_offsets = uniform()
+    join_date = np.where(added, start + _random_offsets(join_by - start, join_offsets),
+                         created_date + _random_offsets(start - created_date, join_offsets))
+    removed = closed_not_done & (final_status == "To Do") & ~added & (uniform() < 0.5)
+    removed_date = start + _random_offsets(end - start, uniform())
+    # Unfinished issues move to the board's next sprint when the sprint is completed (the
+    # board's last sprint, not the block's: the next one may be in the next block)
+    carried = closed_not_done & ~removed & (issue_sprint_ids < last_sprint_id)
+    carry_date = np.repeat(completed_date, issue_counts)
+    final_sprint_ids = pd.array(np.where(carried, issue_sprint_ids + 1, issue_sprint_ids), dtype="Int64")
+    final_sprint_ids[removed] = pd.NA
+    assignees = integers(1, 6) + (board_id - 1) * 5
+    reporters = integers(1, 6) + (board_id - 1) * 5
+
+    issues_df = pd.DataFrame({
+        "issue_id": issue_ids,
+        "issue_key": [f"{project_key}-{i}" for i in issue_ids],
+        "project_key": project_key,
+        "board_id": board_id,
+        "issuetype": issue_type,
+        "status": final_status,
+        "resolution": np.where(done, "Done", None),
+        "summary": [f"Summary for issue {i}" for i in issue_ids],
+        "assignee": [f"user_{i}" for i in assignees],
+        "reporter": [f"user_{i}" for i in reporters],
+        "created_date": created_date,
+        "resolved_date": resolved_date,
+        "story_points": story_points,
+        "sprint_id": final_sprint_ids, # The sprint the issue is in now
+    })
+
+    # --- Simplified status and sprint transitions, built per kind and interleaved by a stable sort ---
+    sprint_names = issue_sprint_ids.astype(str)
+    next_sprint_names = (issue_sprint_ids + 1).astype(str)
+    status_transitions_df = pd.concat([
+        pd.DataFrame({"issue_id": issue_ids, "field": "status", "from_status": None,
+                      "to_status": "To Do", "timestamp": created_date}),
+        pd.DataFrame({"issue_id": issue_ids[started], "field": "status", "from_status": "To Do",
+                      "to_status": "In Progress", "timestamp": inprogress_start[started]}),
+        pd.DataFrame({"issue_id": issue_ids[done], "field": "status", "from_status": "In Progress",
+                      "to_status": final_status[done], "timestamp": resolved_date[done]}),
+        # Sprint field values are comma-separated sprint ids; Jira keeps closed sprints in the list
+        pd.DataFrame({"issue_id": issue_ids, "field": "sprint", "from_status": None,
+                      "to_status": sprint_names, "timestamp": join_date}),
+        pd.DataFrame({"issue_id": issue_ids[removed], "field": "sprint", "from_status": sprint_names[removed],
+                      "to_status": None, "timestamp": removed_date[removed]}),
+        pd.DataFrame({"issue_id": issue_ids[carried], "field": "sprint", "from_status": sprint_names[carried],
+                      "to_status": np.char.add(np.char.add(sprint_names[carried], ", "), next_sprint_names[carried]),
+                      "timestamp": carry_date[carried]}),
+    ], ignore_index=True)
+    status_transitions_df = status_transitions_df.sort_values('issue_id', kind='mergesort', ignore_index=True)
+
+    return sprints_df, issues_df, status_transitions_df
+
+
+def iter_mock_data_chunks(num_sprints=30, issues_per_sprint=15, start_date="2023-01-09",
+                          num_projects=1, boards_per_project=1, sprints_per_chunk=100,
+                          seed=None, now=None):
+    """
+    Yields mock data in chunks of at most `sprints_per_chunk` sprints of a single board.
+
+    Sprint and issue ids are unique across all projects and boards, so the chunks can be
+    concatenated or written out independently.
+
+    Args:
+        num_sprints (int): Sprints per board.
+        issues_per_sprint (int): Average number of issues per sprint (+-20%).
+        start_date (str): Start date of the first sprint of every board.
+        num_projects (int): Number of projects ('PROJ1', 'PROJ2', ... or 'PROJ' for a single one).
+        boards_per_project (int): Number of boards (teams) per project, each with its own sprints.
+        sprints_per_chunk (int): Upper bound on sprints generated per chunk; bounds memory use.
+        seed (int, optional): Seed for the random generator. Same seed and `now` give the same data,
+            whatever `sprints_per_chunk`.
+        now (datetime, optional): Reference time deciding closed/active/future sprints. Defaults to now.
+
+    Yields:
+        tuple: (sprints_df, issues_df, status_transitions_df) for each chunk.
+    """
+    seed_sequence = np.random.SeedSequence(seed)
+    now = np.datetime64(now if now is not None else datetime.now(), 'ns')
+    first_start = np.datetime64(datetime.strptime(start_date, "%Y-%m-%d"), 'ns')
+    # Next sprint starts the day after the previous one ends
+    all_sprint_starts = first_start + np.arange(num_sprints) * 14 * DAY
+
+    next_sprint_id = 1
+    next_issue_id = 1
+    for project_idx in range(num_projects):
+        project_key = _project_key(project_idx, num_projects)
+        for board_id in range(1, boards_per_project + 1):
+            last_sprint_id = next_sprint_id + num_sprints - 1
+            for chunk_start in range(0, num_sprints, sprints_per_chunk):
+                sprint_starts = all_sprint_starts[chunk_start:chunk_start + sprints_per_chunk]
+                chunk = _generate_sprint_block(
+                    seed_sequence, project_key, board_id, next_sprint_id, next_issue_id,
+                    sprint_starts, issues_per_sprint, now, last_sprint_id
+                )
+                next_sprint_id += len(chunk[0])
+                next_issue_id += len(chunk[1])
+                yield chunk
+
+
+def generate_mock_data(num_sprints=30, issues_per_sprint=15, start_date="2023-01-09",
+                       num_projects=1, boards_per_project=1, seed=None, now=None):
     """Generates mock Jira-like sprint and issue data."""
     print(f"Generating mock data for {num_sprints} sprints...")
-    sprints = []
-    issues = []
-    status_transitions = []
-    current_sprint_id = 1
-    current_issue_id = 1
-    sprint_start_date = datetime.strptime(start_date, "%Y-%m-%d")
-
-    # Define status progression times (simplistic)
-    time_to_inprogress = timedelta(days=1, hours=4)
-    time_to_done = timedelta(days=5, hours=2) # Relative to 'In Progress' start
-
-    for i in range(num_sprints):
-        sprint_end_date = sprint_start_date + timedelta(days=13) # 2 week sprints
-        is_closed = (sprint_end_date < datetime.now())
-        sprint_state = 'closed' if is_closed else ('active' if sprint_start_date <= datetime.now() <= sprint_end_date else 'future')
-        completion_date = sprint_end_date + timedelta(days=np.random.randint(0,2)) if is_closed else pd.NaT # Add slight variance
-
-        sprints.append({
-            "sprint_id": current_sprint_id,
-            "name": f"Sprint {current_sprint_id}",
-            "start_date": sprint_start_date,
-            "end_date": sprint_end_date,
-            "completed_date": completion_date,
-            "state": sprint_state,
-            "goal": f"Goal for Sprint {current_sprint_id}"
-        })
-
-        num_actual_issues = np.random.randint(int(issues_per_sprint * 0.8), int(issues_per_sprint * 1.2))
-        for j in range(num_actual_issues):
-            issue_type = np.random.choice(["Story", "Task", "Bug"], p=[0.6, 0.3, 0.1])
-            created_date = sprint_start_date - timedelta(days=np.random.randint(1, 20)) # Created before sprint start
-            story_points = np.random.choice([1, 2, 3, 5, 8, 13, None], p=[0.1, 0.2, 0.3, 0.2, 0.1, 0.05, 0.05]) if issue_type != "Bug" else None
-
-            # Simulate status and resolution based on whether sprint is closed
-            final_status = "To Do"
-            resolved_date = pd.NaT
-            status_times = {"created": created_date}
-
-            if is_closed and np.random.rand() < 0.9: # 90% chance issues in closed sprints are done
-                final_status = np.random.choice(["Done", "Resolved", "Closed"], p=[0.8, 0.1, 0.1])
-                in_progress_start = sprint_start_date + timedelta(days=np.random.randint(0, 5), hours=np.random.randint(0, 8))
-                resolved_date = in_progress_start + timedelta(days=np.random.randint(1, 10), hours=np.random.randint(0, 8))
-                # Ensure resolved date is within reasonable bounds
-                resolved_date = min(resolved_date, sprint_end_date + timedelta(days=2))
-                resolved_date = max(resolved_date, in_progress_start + timedelta(hours=1))
-
-                status_times["inprogress_start"] = in_progress_start
-                status_times["done_start"] = resolved_date
-
-            elif is_closed: # 10% chance issues in closed sprints are not done
-                final_status = np.random.choice(["To Do", "In Progress"])
-                if final_status == "In Progress":
-                     status_times["inprogress_start"] = sprint_start_date + timedelta(days=np.random.randint(0, 10), hours=np.random.randint(0, 8))
-
-            elif sprint_state == 'active' and np.random.rand() < 0.5: # Issues in active sprint
-                 final_status = np.random.choice(["In Progress", "In Review"])
-                 status_times["inprogress_start"] = sprint_start_date + timedelta(days=np.random.randint(0, (datetime.now() - sprint_start_date).days + 1 ), hours=np.random.randint(0, 8))
-
-            issues.append({
-                "issue_id": current_issue_id,
-                "issue_key": f"PROJ-{current_issue_id}",
-                "project_key": "PROJ",
-                "issuetype": issue_type,
-                "status": final_status,
-                "resolution": "Done" if final_status in ["Done", "Resolved", "Closed"] else None,
-                "summary": f"Summary for issue {current_issue_id}",
-                "assignee": f"user_{np.random.randint(1, 6)}",
-                "reporter": f"user_{np.random.randint(1, 6)}",
-                "created_date": created_date,
-                "resolved_date": resolved_date,
-                "story_points": story_points,
-                "sprint_id": current_sprint_id, # Simple association for mock data
-            })
-
-            # Generate simplified status transitions
-            status_transitions.append({"issue_id": current_issue_id, "field": "status", "from_status": None, "to_status": "To Do", "timestamp": created_date})
-            if "inprogress_start" in status_times:
-                status_transitions.append({"issue_id": current_issue_id, "field": "status", "from_status": "To Do", "to_status": "In Progress", "timestamp": status_times["inprogress_start"]})
-            if "done_start" in status_times:
-                 status_transitions.append({"issue_id": current_issue_id, "field": "status", "from_status": "In Progress", "to_status": final_status, "timestamp": status_times["done_start"]})
-
-            current_issue_id += 1
-
-        # Move to next sprint
-        sprint_start_date = sprint_end_date + timedelta(days=1) # Start next day
-        current_sprint_id += 1
-
-    sprints_df = pd.DataFrame(sprints)
-    issues_df = pd.DataFrame(issues)
-    status_transitions_df = pd.DataFrame(status_transitions)
-
-    # Convert types
-    for df in [sprints_df, issues_df, status_transitions_df]:
-        for col in df.columns:
-            if 'date' in col or 'timestamp' in col:
-                df[col] = pd.to_datetime(df[col], errors='coerce')
+    chunks = list(iter_mock_data_chunks(
+        num_sprints=num_sprints, issues_per_sprint=issues_per_sprint, start_date=start_date,
+        num_projects=num_projects, boards_per_project=boards_per_project,
+        sprints_per_chunk=max(num_sprints, 1), seed=seed, now=now
+    ))
+    sprints_df, issues_df, status_transitions_df = (
+        pd.concat([chunk[i] for chunk in chunks], ignore_index=True) for i in range(3)
+    )
 
     print(f"Generated {len(sprints_df)} sprints and {len(issues_df)} issues.")
     return sprints_df, issues_df, status_transitions_df
 
+
+def write_mock_dataset(output_dir, partition_cols=('project_key',), **kwargs):
+    """
+    Generates mock data chunk by chunk and writes it to partitioned Parquet datasets.
+
+    Writes `sprints/`, `issues/` and `status_transitions/` under `output_dir`, partitioned by
+    `partition_cols` (transitions are partitioned by project as well). Only one chunk is held
+    in memory at a time, so memory use is bounded by `sprints_per_chunk`. Partitions written
+    by an earlier run are replaced, so running it again does not duplicate the data.
+
+    Args:
+        output_dir (str | Path): Root directory of the dataset.
+        partition_cols (tuple): Columns to partition the sprints and issues datasets by.
+        **kwargs: Passed on to iter_mock_data_chunks (num_projects, num_sprints, seed, ...).
+
+    Returns:
+        dict: Row counts written per table.
+    """
+    output_dir = Path(output_dir)
+    partition_cols = list(partition_cols)
+    counts = {"sprints": 0, "issues": 0, "status_transitions": 0}
+    schemas = {}
+    written = {"sprints": set(), "issues": set(), "status_transitions": set()} # Partitions written by this run
+    for sprints_df, issues_df, status_transitions_df in iter_mock_data_chunks(**kwargs):
+        # Transitions carry no project column in the source schema; add it for partitioning
+        issue_projects = pd.Series(issues_df['project_key'].to_numpy(), index=issues_df['issue_id'])
+        status_transitions_df['project_key'] = status_transitions_df['issue_id'].map(issue_projects)
+
+        for name, df, cols in [("sprints", sprints_df, partition_cols),
+                               ("issues", issues_df, partition_cols),
+                               ("status_transitions", status_transitions_df, ['project_key'])]:
+            # Fix the schema on the first chunk; a later chunk may have e.g. no resolutions at all
+            schema = schemas.setdefault(name, arrow_schema(df))
+            # Partitions left by an earlier run are replaced, not appended to (which would
+            # duplicate their ids); the ones already written by this run are appended to
+            partitions = pd.Series(list(zip(*(df[c] for c in cols))), index=df.index)
+            is_new = ~partitions.isin(written[name])
+            for part, behavior in [(df[is_new], 'delete_matching'), (df[~is_new], 'overwrite_or_ignore')]:
+                if not part.empty:
+                    part.to_parquet(output_dir / name, partition_cols=cols, index=False, schema=schema,
+                                    existing_data_behavior=behavior)
+            written[name].update(partitions[is_new])
+            counts[name] += len(df)
+        logger.info(f"Wrote chunk: {len(sprints_df)} sprints, {len(issues_df)} issues to {output_dir}")
+
+    logger.info(f"Mock dataset written to {output_dir}: {counts}")
+    return counts
+
+
 if __name__ == '__main__':
-    s_df, i_df, st_df = generate_mock_data()
+    s_df, i_df, st_df = generate_mock_data(seed=42)
     print("\nSprints DataFrame Head:")
     print(s_df.head())
     print("\nIssues DataFrame Head:")
@@ -4,71 +4,171 @@ import logging
 from pathlib import Path
 from src.utils.config import load_config
 from src.data_processing.mock_data_generator import generate_mock_data # Use mock data
+from src.data_processing.schema import compact_issues, compact_transitions, compact_sprints
+from src.data_processing.jira_extractor import JiraExtractor
+from src.data_processing.raw_cache import RawCache
 
 logger = logging.getLogger(__name__)
 
-def load_data(use_mock=True, **kwargs):
-    """Loads data, currently using mock generator."""
+def load_data(use_mock=True, project_key=None, api_token=None, config=None, replay=False, **kwargs):
+    """Loads data from the mock generator, or from Jira when use_mock=False.
+
+    For Jira, `project_key` selects the project; a missing `api_token` is looked up in the
+    backend's project configurations (projects.database_url). With `jira.use_cache` the raw
+    responses are cached under paths.raw_data_dir and only updated issues are refetched;
+    replay=True builds the frames from that cache without network access.
+    """
     if use_mock:
         logger.info("Loading data using mock data generator...")
         sprints_df, issues_df, status_transitions_df = generate_mock_data(**kwargs)
-        return sprints_df, issues_df, status_transitions_df
+        return compact_sprints(sprints_df), compact_issues(issues_df), compact_transitions(status_transitions_df)
     else:
-        # Placeholder for real data extraction logic from DB
-        logger.error("Real data extraction not implemented yet.")
-        # Example:
-        ###
-        # config = load_config()
-        # extractor = JiraExtractor(config) # Assume JiraExtractor class exists
-        # sprints_df = extractor.get_sprints()
-        # issues_df = extractor.get_issues()
-        # status_transitions_df = extractor.get_status_transitions()
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+        config = config or load_config()
+        if not config or not project_key:
+            logger.error("Real data extraction needs the configuration and a project_key.")
+            return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+        cache = RawCache.from_config(config) if (replay or config.get('jira', {}).get('use_cache')) else None
+        if replay:
+            return JiraExtractor(config, project_key, cache=cache, replay=True).extract()
+        if api_token is None:
+            from src.utils.projects import load_projects
+            tokens = {p['project_key']: p.get('api_token') for p in load_projects(config)}
+            api_token = tokens.get(project_key)
+        if not api_token:
+            logger.error(f"No API token configured for project {project_key}.")
+            return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+        logger.info(f"Extracting data for project {project_key} from Jira...")
+        extractor = JiraExtractor(config, project_key, api_token, cache=cache, **kwargs)
+        return extractor.extract()
+
+def status_categories(status_mapping):
+    """The categories of map_statuses: the mapping's keys, then 'other' (unless it is one of them)."""
+    return list(dict.fromkeys([*status_mapping, 'other']))
 
 def map_statuses(status_series, status_mapping):
-    """Maps detailed statuses to broader categories (todo, inprogress, done)."""
+    """Maps detailed statuses to broader categories (todo, inprogress, done).
+
+    The mapping is applied to the distinct statuses (the categories) only and the result is
+    a categorical with the categories of status_categories.
+    """
     reverse_map = {}
-    for key, values in status_mapping.items():
+    for category, values in status_mapping.items():
         for value in values:
-            reverse_map[value.lower()] = key # Use lowercase for robust matching
-    # Apply mapping, keep original if not found (or map to 'other')
-    return status_series.str.lower().map(reverse_map).fillna('other')
-
-def calculate_cycle_time(issue_id, transitions_df):
-    """Calculates cycle time (In Progress -> Done) for a single issue."""
-    issue_transitions = transitions_df[transitions_df['issue_id'] == issue_id].sort_values('timestamp')
-    # Find first entry into an 'inprogress' state
-    inprogress_entry = issue_transitions[issue_transitions['to_status'].str.lower().isin(['in progress', 'in development', 'in review'])].iloc[0] if not issue_transitions[issue_transitions['to_status'].str.lower().isin(['in progress', 'in development', 'in review'])].empty else None
-    # Find first entry into a 'done' state *after* entering inprogress
-    done_entry = None
-    if inprogress_entry is not None:
-       done_transitions = issue_transitions[
-           (issue_transitions['timestamp'] >= inprogress_entry['timestamp']) &
-           (issue_transitions['to_status'].str.lower().isin(['done', 'resolved', 'closed']))
-       ]
-       if not done_transitions.empty:
-           done_entry = done_transitions.iloc[0]
-
-    if inprogress_entry is not None and done_entry is not None:
-        cycle_time = done_entry['timestamp'] - inprogress_entry['timestamp']
-        return cycle_time.total_seconds() / (60 * 60 * 24) # Return in days
-    return np.nan
-
-def preprocess_issues(issues_df, status_transitions_df, config):
-    """Preprocesses the issues DataFrame."""
+            reverse_map[value.lower()] = category # Use lowercase for robust matching
+    categories = status_categories(status_mapping)
+    category_codes = {category: code for code, category in enumerate(categories)}
+    statuses = status_series.astype('category')
+    # Category code of each distinct status; unknown statuses map to 'other' (kept if not found)
+    lookup = np.array(
+        [category_codes[reverse_map.get(str(s).lower(), 'other')] for s in statuses.cat.categories]
+        + [category_codes['other']], # Code -1 (missing status) also maps to 'other'
+        dtype=np.int8
+    )
+    codes = lookup[statuses.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codes, categories=categories), index=status_series.index,
+                     name=status_series.name)
+
+def issue_timing_columns(status_mapping):
+    """Columns added by calculate_issue_timings (besides 'issue_id'), in order."""
+    return (['inprogress_start', 'done_date', 'cycle_time_days', 'lead_time_days']
+            + [f"time_in_{c}_days" for c in status_categories(status_mapping)])
+
+def calculate_issue_timings(status_transitions_df, status_mapping, as_of=None, created_dates=None):
+    """
+    Calculates cycle time, lead time and time spent in each status category for all issues at once.
+
+    Transitions are sorted once; the first entry into an 'inprogress' status and the first
+    'done' entry after it are found with grouped reductions over boolean masks, so the cost is
+    linear in the number of transitions instead of issues x transitions.
+
+    Cycle time runs from the first 'inprogress' entry to the first 'done' entry after it. Lead
+    time runs from the issue's creation to the same 'done' entry (the first 'done' entry for
+    issues never in progress); the first transition stands in for a missing creation date.
+
+    Args:
+        status_transitions_df (pd.DataFrame): Transitions with 'issue_id', 'to_status' and 'timestamp'.
+                                              Rows with a 'field' other than 'status' are ignored.
+        status_mapping (dict): Category -> list of statuses (config['status_mapping']).
+        as_of (datetime, optional): End of the interval for each issue's current (non-done) status.
+                                    Defaults to the latest transition timestamp.
+        created_dates (pd.Series, optional): Creation date of each issue, indexed by issue_id.
+
+    Returns:
+        pd.DataFrame: One row per issue_id with 'inprogress_start', 'done_date', 'cycle_time_days',
+                      'lead_time_days' and 'time_in_<category>_days' columns (all durations in days).
+    """
+    transitions = status_transitions_df
+    if 'field' in transitions.columns:
+        transitions = transitions[transitions['field'] == 'status']
+    transitions = compact_transitions(transitions[['issue_id', 'to_status', 'timestamp']])
+    transitions['timestamp'] = pd.to_datetime(transitions['timestamp'], errors='coerce')
+    transitions = transitions.dropna(subset=['timestamp'])
+    # Stable sort keeps the original order of transitions sharing a timestamp
+    transitions = transitions.sort_values(['issue_id', 'timestamp'], kind='mergesort', ignore_index=True)
+
+    category = map_statuses(transitions['to_status'], status_mapping).to_numpy()
+    is_inprogress = category == 'inprogress'
+    is_done = category == 'done'
+    by_issue = transitions.groupby('issue_id', sort=True)['timestamp']
+
+    first_seen = by_issue.min()
+    inprogress_start = transitions.loc[is_inprogress].groupby('issue_id')['timestamp'].min()
+    # First 'done' entry at or after the first 'inprogress' entry of the same issue
+    inprogress_start_per_row = transitions['issue_id'].map(inprogress_start)
+    done_after_start = is_done & (transitions['timestamp'] >= inprogress_start_per_row).to_numpy()
+    done_date = transitions.loc[done_after_start].groupby('issue_id')['timestamp'].min()
+    first_done = transitions.loc[is_done].groupby('issue_id')['timestamp'].min()
+
+    timings = pd.DataFrame(index=first_seen.index)
+    timings['inprogress_start'] = inprogress_start
+    timings['done_date'] = done_date
+    timings['cycle_time_days'] = (timings['done_date'] - timings['inprogress_start']).dt.total_seconds() / (60 * 60 * 24)
+    created = first_seen
+    if created_dates is not None:
+        created = pd.to_datetime(created_dates).groupby(level=0).first().reindex(timings.index).fillna(first_seen)
+    lead_time_end = timings['done_date'].where(timings['inprogress_start'].notna(), first_done.reindex(timings.index))
+    timings['lead_time_days'] = (lead_time_end - created).dt.total_seconds() / (60 * 60 * 24)
+
+    # Time in status: each transition lasts until the next one of the same issue.
+    # The current status runs until as_of, except 'done' which is terminal.
+    if as_of is None:
+        as_of = transitions['timestamp'].max()
+    next_timestamp = by_issue.shift(-1)
+    next_timestamp = next_timestamp.mask(next_timestamp.isna() & ~is_done, pd.Timestamp(as_of))
+    durations = ((next_timestamp - transitions['timestamp']).dt.total_seconds() / (60 * 60 * 24)).clip(lower=0)
+    categories = status_categories(status_mapping)
+    time_in_status = (
+        durations.groupby([transitions['issue_id'], category]).sum()
+        .unstack(fill_value=0.0)
+        .reindex(index=timings.index, columns=categories, fill_value=0.0)
+        .fillna(0.0)
+    )
+    time_in_status.columns = [f"time_in_{c}_days" for c in categories]
+    timings = timings.join(time_in_status)
+
+    return timings.reset_index()
+
+def preprocess_issues(issues_df, status_transitions_df, config, story_points_fill_value=None, as_of=None):
+    """Preprocesses the issues DataFrame.
+
+    `story_points_fill_value` overrides the mean used to impute missing story points and `as_of`
+    the end of open status intervals; batch-wise callers pass values for the whole dataset so
+    every batch is processed the same way.
+    """
     logger.info(f"Preprocessing {len(issues_df)} issues...")
-    df = issues_df.copy()
+    # Compact dtypes (categoricals, downcast ids, float32 story points); returns a new frame
+    df = compact_issues(issues_df)
 
     # Type Conversion (already done in mock data gen, but good practice)
     df['created_date'] = pd.to_datetime(df['created_date'], errors='coerce')
     df['resolved_date'] = pd.to_datetime(df['resolved_date'], errors='coerce')
-    df['story_points'] = pd.to_numeric(df['story_points'], errors='coerce') # Coerce errors to NaN
 
     # Handle missing story points (simple mean imputation for now)
     # A better approach might be per issue type or using a simple model
-    mean_sp = df['story_points'].mean()
+    mean_sp = df['story_points'].mean() if story_points_fill_value is None else story_points_fill_value
     df['story_points_imputed'] = df['story_points'].isnull() # Flag imputed values
-    df['story_points'].fillna(mean_sp, inplace=True)
+    # Cast the fill value so the column stays float32
+    df['story_points'] = df['story_points'].fillna(df['story_points'].dtype.type(mean_sp))
     logger.info(f"Imputed story points for {df['story_points_imputed'].sum()} issues with mean {mean_sp:.2f}")
 
     # Map Statuses
@@ -76,22 +176,19 @@ def preprocess_issues(issues_df, status_transitions_df, config):
     df['status_category'] = map_statuses(df['status'], status_mapping)
     logger.info(f"Status categories mapped: {df['status_category'].value_counts().to_dict()}")
 
-    # Calculate Cycle Time (This can be slow on large datasets)
-    # Optimize if necessary (e.g., pre-grouping transitions)
-    # Temporarily disable/simplify if too slow during initial dev
+    # Calculate Cycle Time, Lead Time and time in status in a single grouped pass
     logger.info("Calculating cycle times...")
     if status_transitions_df is not None and not status_transitions_df.empty:
-         # Ensure transitions 'to_status' is string type before applying .str accessor
-         status_transitions_df['to_status'] = status_transitions_df['to_status'].astype(str)
-         # Group transitions by issue_id for faster lookup if needed
-         ### 
-         # grouped_transitions = status_transitions_df.groupby('issue_id')
-         # df['cycle_time_days'] = df['issue_id'].apply(lambda x: calculate_cycle_time(x, grouped_transitions.get_group(x) if x in grouped_transitions.groups else pd.DataFrame()))
-         df['cycle_time_days'] = df['issue_id'].apply(lambda x: calculate_cycle_time(x, status_transitions_df))
+         timings = calculate_issue_timings(status_transitions_df, status_mapping, as_of=as_of,
+                                           created_dates=df.set_index('issue_id')['created_date'])
+         # join() keeps the index of the issues frame, unlike merge()
+         df = df.join(timings.set_index('issue_id'), on='issue_id')
          logger.info(f"Calculated cycle time for {df['cycle_time_days'].notna().sum()} issues.")
     else:
          logger.warning("Status transitions data is missing, cannot calculate cycle time.")
-         df['cycle_time_days'] = np.nan
+         # Same columns as with transitions, so the schema does not depend on the input
+         for column in issue_timing_columns(status_mapping):
+             df[column] = pd.NaT if column in ('inprogress_start', 'done_date') else np.nan
 
 
     # Add more cleaning steps as needed (e.g., outlier handling)
@@ -102,7 +199,7 @@ def preprocess_issues(issues_df, status_transitions_df, config):
 def preprocess_sprints(sprints_df):
     """Preprocesses the sprints DataFrame."""
     logger.info(f"Preprocessing {len(sprints_df)} sprints...")
-    df = sprints_df.copy()
+    df = compact_sprints(sprints_df)
     df['start_date'] = pd.to_datetime(df['start_date'], errors='coerce')
     df['end_date'] = pd.to_datetime(df['end_date'], errors='coerce')
     df['completed_date'] = pd.to_datetime(df['completed_date'], errors='coerce')
@@ -110,27 +207,45 @@ def preprocess_sprints(sprints_df):
     logger.info("Sprint preprocessing complete.")
     return df
 
-def calculate_actual_velocity(processed_issues_df, closed_sprints_df, config):
-    """Calculates actual velocity for closed sprints."""
-    logger.info("Calculating actual velocity for closed sprints...")
-    done_statuses = config.get('status_mapping', {}).get('done', [])
-    done_statuses_lower = [s.lower() for s in done_statuses]
+def sum_done_story_points(processed_issues_df):
+    """
+    Sums story points of done issues per sprint.
+
+    The result is additive: sums computed on disjoint batches of issues can be merged with
+    merge_done_story_points.
 
+    Returns:
+        pd.Series: Done story points indexed by sprint_id.
+    """
     # Filter issues that are considered 'Done' and belong to a sprint
     # Using status_category ensures consistency
     done_issues = processed_issues_df[
         (processed_issues_df['status_category'] == 'done') &
         (processed_issues_df['sprint_id'].notna()) # Make sure issue is associated with a sprint
     ]
+    return done_issues.groupby('sprint_id')['story_points'].sum()
 
-    # Group by sprint_id and sum story points
-    velocity = done_issues.groupby('sprint_id')['story_points'].sum().reset_index()
-    velocity.rename(columns={'story_points': 'actual_velocity'}, inplace=True)
+def merge_done_story_points(partials):
+    """Merges per-batch results of sum_done_story_points into one per-sprint Series."""
+    partials = [p for p in partials if not p.empty]
+    if not partials:
+        return pd.Series(dtype=float, name='story_points').rename_axis('sprint_id')
+    return pd.concat(partials).groupby(level=0).sum()
+
+def attach_actual_velocity(closed_sprints_df, done_story_points):
+    """Merges per-sprint done story points into the closed sprints as 'actual_velocity'."""
+    velocity = done_story_points.rename('actual_velocity').reset_index()
 
     # Merge with closed sprints data
     # We only care about velocity for sprints that actually finished
     sprints_with_velocity = closed_sprints_df.merge(velocity, on='sprint_id', how='left')
     sprints_with_velocity['actual_velocity'].fillna(0, inplace=True) # Sprints with 0 completed points
+    return sprints_with_velocity
+
+def calculate_actual_velocity(processed_issues_df, closed_sprints_df, config):
+    """Calculates actual velocity for closed sprints."""
+    logger.info("Calculating actual velocity for closed sprints...")
+    sprints_with_velocity = attach_actual_velocity(closed_sprints_df, sum_done_story_points(processed_issues_df))
 
     logger.info(f"Actual velocity calculated for {len(sprints_with_velocity)} closed sprints.")
     return sprints_with_velocity
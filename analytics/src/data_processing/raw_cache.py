@@ -0,0 +1,124 @@
+import gzip
+import json
+import hashlib
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR_NAME = "jira_cache"
+INDEX_FILE = "index.json"
+
+
+def _atomic_write(path, data):
+    """Writes bytes to `path` through a temporary file, so readers never see a partial file."""
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    tmp_path.replace(path)
+
+
+class RawCache:
+    """
+    Content-addressed, gzip-compressed store of raw Jira responses.
+
+    Payloads are stored once under `objects/<hash[:2]>/<hash>.json.gz`, named by the SHA-256
+    of their canonical JSON, so a page that did not change between syncs takes no extra
+    space. A per-project index maps each endpoint to its ordered page hashes and keeps the
+    revalidation mark (the latest `updated` timestamp seen) for the issues.
+
+    Layout:
+        <cache_dir>/objects/ab/abcdef....json.gz
+        <cache_dir>/projects/<project_key>/index.json
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.objects_dir = self.cache_dir / "objects"
+
+    @classmethod
+    def from_config(cls, config):
+        """Cache under `paths.raw_data_dir`."""
+        return cls(Path(config['paths']['raw_data_dir']) / CACHE_DIR_NAME)
+
+    # --- Objects ---
+
+    def _object_path(self, digest):
+        return self.objects_dir / digest[:2] / f"{digest}.json.gz"
+
+    def put_object(self, payload):
+        """Stores a JSON-serializable payload and returns its content hash."""
+        data = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            _atomic_write(path, gzip.compress(data, compresslevel=6))
+        return digest
+
+    def get_object(self, digest):
+        """Loads the payload stored under `digest`."""
+        with gzip.open(self._object_path(digest), 'rb') as f:
+            return json.loads(f.read())
+
+    # --- Per-project index ---
+
+    def _index_path(self, project_key):
+        return self.cache_dir / "projects" / project_key / INDEX_FILE
+
+    def load_index(self, project_key):
+        """Loads the project's index ({'endpoints': {endpoint: [hash, ...]}, 'updated_since': str | None})."""
+        path = self._index_path(project_key)
+        if not path.exists():
+            return {'endpoints': {}, 'updated_since': None}
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def save_index(self, project_key, index):
+        path = self._index_path(project_key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _atomic_write(path, json.dumps(index, indent=2, sort_keys=True).encode('utf-8'))
+
+    def has_project(self, project_key):
+        return self._index_path(project_key).exists()
+
+    def write_pages(self, index, endpoint, items, page_size, append=False):
+        """
+        Stores `items` as pages of `page_size` items under `endpoint` of `index`.
+
+        With append=True the pages are added after the existing ones (newer pages win
+        when the items are read back by id); otherwise they replace them.
+        """
+        hashes = [self.put_object(items[start:start + page_size]) for start in range(0, len(items), page_size)]
+        existing = index['endpoints'].get(endpoint, []) if append else []
+        index['endpoints'][endpoint] = existing + hashes
+        return hashes
+
+    def read_items(self, index, endpoint, id_key='id'):
+        """
+        Reads all items of an endpoint, keeping the latest version of each `id_key`.
+
+        Returns:
+            list[dict]: Items in order of first appearance.
+        """
+        items = {}
+        for digest in index['endpoints'].get(endpoint, []):
+            for item in self.get_object(digest):
+                items[item[id_key]] = item
+        return list(items.values())
+
+    def compact(self, project_key, endpoint, page_size, id_key='id'):
+        """
+        Rewrites an appended endpoint as one deduplicated set of pages.
+
+        Pages whose items did not change keep their content hash, so only the pages holding
+        updated items are stored again.
+
+        Returns:
+            list[dict]: The deduplicated items, as read_items returns them.
+        """
+        index = self.load_index(project_key)
+        items = self.read_items(index, endpoint, id_key)
+        self.write_pages(index, endpoint, items, page_size)
+        self.save_index(project_key, index)
+        return items
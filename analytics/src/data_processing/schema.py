@@ -0,0 +1,101 @@
+import pandas as pd
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Compact dtypes for the frames passed between pipeline stages.
+# Low-cardinality strings are dictionary-encoded ('category'), ids are downcast and
+# story points are stored as float32. Categoricals map to Parquet dictionary columns and
+# pandas restores them on read, so the types survive the Parquet round-trip.
+# Unique per-row strings (keys, summaries) gain nothing from a dictionary and use Arrow-backed
+# strings; pandas reads those back as Python-backed strings, so use read_compact_parquet.
+ISSUE_SCHEMA = {
+    'issue_id': 'int32',
+    'issue_key': 'string[pyarrow]',
+    'project_key': 'category',
+    'board_id': 'int32',
+    'issuetype': 'category',
+    'status': 'category',
+    'status_category': 'category',
+    'resolution': 'category',
+    'summary': 'string[pyarrow]',
+    'assignee': 'category',
+    'reporter': 'category',
+    'story_points': 'float32',
+    'sprint_id': 'Int32', # Nullable: an issue may not belong to a sprint
+}
+
+# Processed issues are a dataset partitioned by project, so a run that changes some projects
+# rewrites their partitions only
+PROCESSED_ISSUES_FILE = "processed_issues.parquet"
+ISSUE_PARTITION_COLS = ('project_key',)
+
+TRANSITION_SCHEMA = {
+    'issue_id': 'int32',
+    'project_key': 'category',
+    'field': 'category',
+    'from_status': 'category',
+    'to_status': 'category',
+}
+
+SPRINT_SCHEMA = {
+    'sprint_id': 'int32',
+    'project_key': 'category',
+    'board_id': 'int32',
+    'state': 'category',
+}
+
+
+def _fits(series, dtype):
+    """True if the integer values of `series` fit into the (possibly nullable) integer `dtype`."""
+    info = np.iinfo(pd.api.types.pandas_dtype(dtype.lower()).type)
+    values = series.dropna()
+    return values.empty or (values.min() >= info.min and values.max() <= info.max)
+
+
+def enforce_schema(df, schema):
+    """
+    Casts the columns of `df` that appear in `schema` to their compact dtypes.
+
+    Columns missing from `df` are skipped and columns already in the target dtype are not copied.
+    Integer columns whose values do not fit the downcast type keep their current dtype.
+
+    Returns:
+        pd.DataFrame: Frame with compact dtypes (a new frame; `df` is not modified).
+    """
+    result = df.copy(deep=False)
+    for col, dtype in schema.items():
+        if col not in result.columns or result[col].dtype == pd.api.types.pandas_dtype(dtype):
+            continue
+        series = result[col]
+        if dtype.lower().startswith(('int', 'float')):
+            series = pd.to_numeric(series, errors='coerce') # Coerce errors to NaN
+        if dtype.lower().startswith('int'):
+            if not _fits(series, dtype):
+                logger.warning(f"Column '{col}' does not fit into {dtype}; keeping {df[col].dtype}.")
+                continue
+            if dtype.islower() and series.isna().any():
+                dtype = dtype.capitalize() # Missing values need the nullable integer type
+        result[col] = series.astype(dtype)
+    return result
+
+
+def compact_issues(issues_df):
+    """Casts an issues frame to ISSUE_SCHEMA."""
+    return enforce_schema(issues_df, ISSUE_SCHEMA)
+
+
+def compact_transitions(status_transitions_df):
+    """Casts a status transitions frame to TRANSITION_SCHEMA."""
+    return enforce_schema(status_transitions_df, TRANSITION_SCHEMA)
+
+
+def compact_sprints(sprints_df):
+    """Casts a sprints frame to SPRINT_SCHEMA."""
+    return enforce_schema(sprints_df, SPRINT_SCHEMA)
+
+
+def read_compact_parquet(path, schema, **kwargs):
+    """Reads a Parquet file or dataset and enforces `schema` on the result (see enforce_schema)."""
+    return enforce_schema(pd.read_parquet(path, **kwargs), schema)
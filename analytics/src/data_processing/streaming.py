@@ -0,0 +1,256 @@
+import pandas as pd
+import numpy as np
+import logging
+import pyarrow.dataset as ds
+from pathlib import Path
+
+from src.utils.parquet import arrow_schema, remove_path, write_partitions
+from src.data_processing.schema import ISSUE_SCHEMA, ISSUE_PARTITION_COLS, PROCESSED_ISSUES_FILE, enforce_schema
+from src.data_processing.preprocessing import (
+    preprocess_sprints,
+    preprocess_issues,
+    sum_done_story_points,
+    merge_done_story_points,
+    attach_actual_velocity
+)
+from src.feature_engineering.scope import calculate_sprint_scope, merge_sprint_scope, SCOPE_FILE
+from src.feature_engineering.burndown import (
+    calculate_daily_sprint_series,
+    merge_daily_sprint_series,
+    write_daily_sprint_series,
+    DAILY_SERIES_FILE
+)
+
+logger = logging.getLogger(__name__)
+
+def open_raw_table(raw_dir, name):
+    """
+    Opens one table of a raw dataset as a pyarrow Dataset.
+
+    A raw dataset (as written by write_mock_dataset) holds 'sprints', 'issues' and
+    'status_transitions' tables, each a hive-partitioned directory or a single Parquet file.
+    """
+    path = Path(raw_dir) / name
+    if not path.exists():
+        path = Path(raw_dir) / f"{name}.parquet"
+    if not path.exists():
+        raise FileNotFoundError(f"Raw table '{name}' not found in {raw_dir}")
+    return ds.dataset(path, format="parquet", partitioning="hive")
+
+
+def read_raw_table(raw_dir, name, columns=None, filter=None):
+    """Reads (a filtered subset of) a raw table into a DataFrame."""
+    return open_raw_table(raw_dir, name).to_table(columns=columns, filter=filter).to_pandas()
+
+
+def iter_issue_batches(raw_dir, batch_size, filter=None):
+    """Yields DataFrames of at most `batch_size` raw issues, reading one record batch at a time."""
+    dataset = open_raw_table(raw_dir, "issues")
+    for record_batch in dataset.to_batches(batch_size=batch_size, filter=filter):
+        if record_batch.num_rows:
+            yield record_batch.to_pandas()
+
+
+def load_transitions_for_issues(raw_dir, issue_ids, filter=None):
+    """
+    Loads the status transitions of the given issues.
+
+    The id range (and `filter`, e.g. on the partitions to read) is pushed down to the Parquet
+    reader so row groups outside it are skipped; the exact id set is applied afterwards.
+    """
+    issue_ids = np.asarray(issue_ids)
+    if len(issue_ids) == 0:
+        # Typed, so the as-of merges downstream accept it
+        return pd.DataFrame({"issue_id": pd.Series(dtype="int64"), "field": pd.Series(dtype=object),
+                             "from_status": pd.Series(dtype=object), "to_status": pd.Series(dtype=object),
+                             "timestamp": pd.Series(dtype="datetime64[ns]")})
+    issue_id = ds.field("issue_id")
+    id_range = (issue_id >= int(issue_ids.min())) & (issue_id <= int(issue_ids.max()))
+    transitions = read_raw_table(raw_dir, "status_transitions", filter=id_range if filter is None else id_range & filter)
+    return transitions[transitions["issue_id"].isin(issue_ids)]
+
+
+def iter_column_batches(raw_dir, name, column, batch_size=1_000_000, filter=None):
+    """Yields one column of a raw table as Series of at most `batch_size` values."""
+    dataset = open_raw_table(raw_dir, name)
+    for record_batch in dataset.to_batches(columns=[column], batch_size=batch_size, filter=filter):
+        if record_batch.num_rows:
+            yield record_batch.column(0).to_pandas()
+
+
+def story_points_mean(raw_dir, batch_size=1_000_000):
+    """Mean story points over the whole raw issues table, as a running sum and count over batches."""
+    total, count = 0.0, 0
+    for story_points in iter_column_batches(raw_dir, "issues", "story_points", batch_size):
+        story_points = pd.to_numeric(story_points, errors='coerce')
+        total += float(story_points.sum())
+        count += int(story_points.count())
+    return total / count if count else np.nan
+
+
+def latest_transition_timestamp(raw_dir, batch_size=1_000_000):
+    """
+    Latest status transition timestamp of the raw transitions table, as a running max over batches.
+
+    Only 'status' rows count (when the table has a 'field' column), as for calculate_issue_timings'
+    default as_of.
+    """
+    status_only = None
+    if "field" in open_raw_table(raw_dir, "status_transitions").schema.names:
+        status_only = ds.field("field") == "status"
+    latest = None
+    for timestamps in iter_column_batches(raw_dir, "status_transitions", "timestamp", batch_size,
+                                          filter=status_only):
+        batch_max = timestamps.max()
+        if pd.notna(batch_max) and (latest is None or batch_max > latest):
+            latest = batch_max
+    return latest
+
+
+class _PartitionedDatasetWriter:
+    """
+    Writes DataFrames to a hive-partitioned Parquet dataset, one new file per batch and partition.
+
+    Whatever was at `path` is removed first; the first batch fixes the schema of all batches.
+    """
+
+    def __init__(self, path, partition_cols):
+        self.path = Path(path)
+        self.partition_cols = list(partition_cols)
+        self._schema = None
+        self.rows = 0
+        remove_path(self.path)
+
+    def write(self, df):
+        if self._schema is None:
+            self._schema = arrow_schema(df)
+        write_partitions(df, self.path, self.partition_cols, schema=self._schema)
+        self.rows += len(df)
+
+
+def preprocess_streaming(raw_dir, output_dir, config, batch_size=100_000, sprint_aggregates=True):
+    """
+    Preprocesses a raw Parquet dataset in bounded-size batches of issues.
+
+    Each batch of issues is preprocessed together with its own transitions and appended to
+    the `processed_issues.parquet` dataset (partitioned by project); its per-sprint done story
+    points, sprint scope and daily sprint series are merged into the running aggregates. Peak
+    memory depends on `batch_size`, not on the length of the history.
+
+    Args:
+        raw_dir (str | Path): Raw dataset with 'sprints', 'issues' and 'status_transitions' tables.
+        output_dir (str | Path): Directory for the processed Parquet files.
+        config (dict): Loaded configuration.
+        batch_size (int): Maximum number of issues per batch.
+        sprint_aggregates (bool): Also write the sprint scope and daily sprint series; without
+                                  them, see sprint_aggregates_streaming.
+
+    Returns:
+        dict: Row counts of the written outputs.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    logger.info(f"Streaming preprocessing of {raw_dir} in batches of {batch_size} issues...")
+
+    # Sprints are small compared to issues and are processed in one go
+    processed_sprints_df = preprocess_sprints(read_raw_table(raw_dir, "sprints"))
+    processed_sprints_df.to_parquet(output_dir / "processed_sprints.parquet", index=False)
+
+    # Impute every batch with the mean of the whole dataset and close open status intervals
+    # at the same point in time, as the in-memory path does
+    fill_value = story_points_mean(raw_dir, batch_size)
+    as_of = latest_transition_timestamp(raw_dir, batch_size)
+
+    issues_writer = _PartitionedDatasetWriter(output_dir / PROCESSED_ISSUES_FILE, ISSUE_PARTITION_COLS)
+    velocity_partials = []
+    scope_partials = []
+    series_partials = []
+    status_mapping = config.get('status_mapping', {})
+    for batch_num, issues_batch in enumerate(iter_issue_batches(raw_dir, batch_size), start=1):
+        transitions_batch = load_transitions_for_issues(raw_dir, issues_batch["issue_id"].to_numpy())
+        processed_batch = preprocess_issues(issues_batch, transitions_batch, config,
+                                            story_points_fill_value=fill_value, as_of=as_of)
+        issues_writer.write(processed_batch)
+        velocity_partials.append(sum_done_story_points(processed_batch))
+        # Keep the running aggregate compact: one row per sprint seen so far
+        velocity_partials = [merge_done_story_points(velocity_partials)]
+        if sprint_aggregates:
+            scope_partials.append(calculate_sprint_scope(processed_sprints_df, processed_batch, transitions_batch,
+                                                         status_mapping, as_of=as_of))
+            scope_partials = [merge_sprint_scope(scope_partials)]
+            series_partials.append(calculate_daily_sprint_series(processed_sprints_df, processed_batch,
+                                                                 transitions_batch, status_mapping, as_of=as_of))
+            series_partials = [merge_daily_sprint_series(series_partials)]
+        logger.info(f"Batch {batch_num}: {len(processed_batch)} issues, {len(transitions_batch)} transitions.")
+
+    closed_sprints_df = processed_sprints_df[processed_sprints_df['state'] == 'closed']
+    sprints_with_velocity_df = attach_actual_velocity(closed_sprints_df, merge_done_story_points(velocity_partials))
+    sprints_with_velocity_df.to_parquet(output_dir / "closed_sprints_with_velocity.parquet", index=False)
+    counts = {
+        "processed_sprints": len(processed_sprints_df),
+        "processed_issues": issues_writer.rows,
+        "closed_sprints_with_velocity": len(sprints_with_velocity_df),
+    }
+    if sprint_aggregates:
+        counts.update(_write_sprint_aggregates(output_dir, scope_partials, series_partials))
+    logger.info(f"Streaming preprocessing complete: {counts}")
+    return counts
+
+
+def _write_sprint_aggregates(output_dir, scope_partials=None, series_partials=None):
+    """Merges and writes the sprint scope and/or daily series partials (None: not computed)."""
+    counts = {}
+    if scope_partials is not None:
+        scope_df = merge_sprint_scope(scope_partials)
+        scope_df.to_parquet(output_dir / SCOPE_FILE, index=False)
+        counts["sprint_scope"] = len(scope_df)
+    if series_partials is not None:
+        daily_series_df = merge_daily_sprint_series(series_partials)
+        write_daily_sprint_series(daily_series_df, output_dir / DAILY_SERIES_FILE)
+        counts["sprint_daily_series"] = len(daily_series_df)
+    return counts
+
+
+def sprint_aggregates_streaming(raw_dir, output_dir, config, batch_size=100_000, scope=True, daily_series=True):
+    """
+    Computes the sprint scope and/or the daily sprint series of an earlier preprocessing run.
+
+    The processed issues written by preprocess_streaming(..., sprint_aggregates=False) are read
+    back in batches, each with its raw transitions, and the per-batch partials are merged as
+    preprocess_streaming merges them, so the results are the same. The scope and the series
+    can thus be computed apart from the issues, and from each other.
+
+    Args:
+        raw_dir (str | Path): Raw dataset the processed files were computed from.
+        output_dir (str | Path): Directory of the processed Parquet files.
+        config (dict): Loaded configuration.
+        batch_size (int): Maximum number of issues per batch.
+        scope (bool): Write the sprint scope.
+        daily_series (bool): Write the daily sprint series.
+
+    Returns:
+        dict: Row counts of the written outputs.
+    """
+    output_dir = Path(output_dir)
+    processed_sprints_df = pd.read_parquet(output_dir / "processed_sprints.parquet")
+    as_of = latest_transition_timestamp(raw_dir, batch_size)
+    status_mapping = config.get('status_mapping', {})
+    scope_partials = [] if scope else None
+    series_partials = [] if daily_series else None
+    issues = ds.dataset(output_dir / PROCESSED_ISSUES_FILE, format="parquet", partitioning="hive")
+    for record_batch in issues.to_batches(batch_size=batch_size):
+        if not record_batch.num_rows:
+            continue
+        issues_batch = enforce_schema(record_batch.to_pandas(), ISSUE_SCHEMA)
+        transitions_batch = load_transitions_for_issues(raw_dir, issues_batch["issue_id"].to_numpy())
+        if scope:
+            scope_partials.append(calculate_sprint_scope(processed_sprints_df, issues_batch, transitions_batch,
+                                                         status_mapping, as_of=as_of))
+            scope_partials = [merge_sprint_scope(scope_partials)]
+        if daily_series:
+            series_partials.append(calculate_daily_sprint_series(processed_sprints_df, issues_batch,
+                                                                 transitions_batch, status_mapping, as_of=as_of))
+            series_partials = [merge_daily_sprint_series(series_partials)]
+    counts = _write_sprint_aggregates(output_dir, scope_partials, series_partials)
+    logger.info(f"Streaming sprint aggregates complete: {counts}")
+    return counts
@@ -1,42 +1,183 @@
+import logging
 import numpy as np
-from sklearn.metrics import mean_absolute_error, mean_squared_error
+import pandas as pd
 
-def calculate_regression_metrics(y_true, y_pred):
-    """Calculates standard regression metrics."""
-    y_true = np.array(y_true).flatten()
-    y_pred = np.array(y_pred).flatten()
+logger = logging.getLogger(__name__)
+
+# Sufficient statistics of the metrics: every metric is a ratio of sums, so batches and
+# workers combine by adding them
+_SUM_COLUMNS = ['n', 'abs_error', 'squared_error', 'error', 'n_nonzero', 'abs_pct_error']
+
+
+def _quantile_columns(q):
+    return f"n_q{q:g}", f"below_q{q:g}"
+
+
+def _add_group_sums(current, batch):
+    """Adds per-group sums (indexed by the group keys), keeping groups that only one of them has."""
+    if current is None:
+        return batch
+    # concat + groupby instead of DataFrame.add: no sorting of keys mixing strings and NaN
+    combined = pd.concat([current, batch])
+    return combined.groupby(level=list(range(combined.index.nlevels)), dropna=False, sort=False).sum()
+
+
+class RegressionMetricsAccumulator:
+    """
+    Accumulates regression metrics over batches, overall and per group.
+
+    MAE, RMSE, MAPE (over non-zero targets), bias (mean of prediction - target) and the
+    coverage of quantile predictions (share of targets at or below the predicted quantile,
+    ideally q) are kept as sums, so `update` is one vectorized pass over a batch and
+    accumulators of parallel workers `merge` exactly. Non-finite pairs are skipped.
+
+    Args:
+        breakdowns (dict, optional): Breakdown name -> group columns, e.g.
+            {'project': ['project_key'], 'team': ['project_key', 'board_id'],
+             'sprint_length': ['sprint_length_days']}.
+        quantiles (iterable, optional): Quantile levels whose predictions `update` receives.
+    """
+
+    def __init__(self, breakdowns=None, quantiles=()):
+        self.breakdowns = {name: list(cols) for name, cols in (breakdowns or {}).items()}
+        self.quantiles = tuple(quantiles)
+        self.columns = _SUM_COLUMNS + [c for q in self.quantiles for c in _quantile_columns(q)]
+        self.totals = pd.Series(0.0, index=self.columns)
+        self.groups = {name: None for name in self.breakdowns}
+        self.n_invalid = 0
+
+    def update(self, y_true, y_pred, groups=None, quantile_preds=None):
+        """
+        Adds a batch.
 
-    # Handle potential NaNs or infinite values if necessary
-    valid_indices = np.isfinite(y_true) & np.isfinite(y_pred)
-    if not np.all(valid_indices):
-        print(f"Warning: Found {len(y_true) - valid_indices.sum()} non-finite values. Excluding them from metrics calculation.")
-        y_true = y_true[valid_indices]
-        y_pred = y_pred[valid_indices]
+        Args:
+            y_true, y_pred (array-like): Targets and point predictions.
+            groups (pd.DataFrame | dict, optional): The breakdowns' group columns, aligned with y_true.
+            quantile_preds (dict, optional): Quantile level -> predictions of that quantile.
 
-    if len(y_true) == 0:
-        print("Warning: No valid samples to calculate metrics.")
-        return {'mae': np.nan, 'rmse': np.nan, 'mape': np.nan}
+        Returns:
+            RegressionMetricsAccumulator: self.
+        """
+        y_true = np.asarray(y_true, dtype=np.float64).ravel() # No copy for float64 arrays
+        y_pred = np.asarray(y_pred, dtype=np.float64).ravel()
+        valid = np.isfinite(y_true) & np.isfinite(y_pred)
+        n_invalid = len(valid) - int(valid.sum())
+        if n_invalid:
+            logger.debug(f"Skipping {n_invalid} non-finite target/prediction pairs.")
+            self.n_invalid += n_invalid
 
-    mae = mean_absolute_error(y_true, y_pred)
-    rmse = np.sqrt(mean_squared_error(y_true, y_pred))
+        error = np.where(valid, y_pred - y_true, 0.0)
+        nonzero = valid & (y_true != 0)
+        stats = {
+            'n': valid.astype(np.float64),
+            'abs_error': np.abs(error),
+            'squared_error': error * error,
+            'error': error,
+            'n_nonzero': nonzero.astype(np.float64),
+            'abs_pct_error': np.divide(np.abs(error), np.abs(y_true), out=np.zeros_like(error), where=nonzero),
+        }
+        for q in self.quantiles:
+            q_pred = np.asarray((quantile_preds or {})[q], dtype=np.float64).ravel()
+            q_valid = valid & np.isfinite(q_pred)
+            n_col, below_col = _quantile_columns(q)
+            stats[n_col] = q_valid.astype(np.float64)
+            stats[below_col] = (q_valid & (y_true <= q_pred)).astype(np.float64)
+        stats = pd.DataFrame(stats, columns=self.columns)
 
-    # Calculate carefully to avoid division by zero
-    # Replace true zeros with a small epsilon or exclude them
-    mask = y_true != 0
-    if np.any(mask):
-        mape = np.mean(np.abs((y_true[mask] - y_pred[mask]) / y_true[mask])) * 100
-    else:
-        mape = np.nan # Or infinity, depending on convention
+        self.totals = self.totals + stats.sum()
+        if self.breakdowns:
+            groups = pd.DataFrame(groups).reset_index(drop=True)
+            for name, cols in self.breakdowns.items():
+                batch = stats.groupby([groups[c] for c in cols], dropna=False, sort=False).sum()
+                self.groups[name] = _add_group_sums(self.groups[name], batch)
+        return self
+
+    def merge(self, other):
+        """Adds the sums of another accumulator with the same breakdowns and quantiles (e.g. a worker's)."""
+        if other.breakdowns != self.breakdowns or other.quantiles != self.quantiles:
+            raise ValueError("Cannot merge accumulators with different breakdowns or quantiles.")
+        self.totals = self.totals + other.totals
+        self.n_invalid += other.n_invalid
+        for name, batch in other.groups.items():
+            if batch is not None:
+                self.groups[name] = _add_group_sums(self.groups[name], batch)
+        return self
+
+    @classmethod
+    def merged(cls, accumulators):
+        """One accumulator with the sums of all of them."""
+        accumulators = list(accumulators)
+        result = cls(accumulators[0].breakdowns, accumulators[0].quantiles)
+        for accumulator in accumulators:
+            result.merge(accumulator)
+        return result
+
+    def _metrics(self, sums):
+        """Metrics from a Series (one group) or a DataFrame (one row per group) of sums."""
+        def ratio(numerator, denominator): # NaN without samples
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return numerator / np.where(denominator > 0, denominator, np.nan)
+
+        metrics = {
+            'n': sums['n'],
+            'mae': ratio(sums['abs_error'], sums['n']),
+            'rmse': np.sqrt(ratio(sums['squared_error'], sums['n'])),
+            'mape': ratio(sums['abs_pct_error'], sums['n_nonzero']) * 100,
+            'bias': ratio(sums['error'], sums['n']),
+        }
+        for q in self.quantiles:
+            n_col, below_col = _quantile_columns(q)
+            metrics[f"coverage_q{q:g}"] = ratio(sums[below_col], sums[n_col])
+        return metrics
+
+    def result(self):
+        """Overall metrics: dict with 'n', 'mae', 'rmse', 'mape', 'bias' and 'coverage_q<q>' (NaN without samples)."""
+        metrics = self._metrics(self.totals)
+        metrics['n'] = int(metrics['n'])
+        return {k: float(v) if k != 'n' else v for k, v in metrics.items()}
+
+    def breakdown(self, name):
+        """Per-group metrics of a breakdown: DataFrame with its group columns and the metrics, by descending n."""
+        cols = self.breakdowns[name]
+        sums = self.groups[name]
+        if sums is None:
+            return pd.DataFrame(columns=cols + list(self.result()))
+        frame = pd.DataFrame(self._metrics(sums))
+        frame['n'] = frame['n'].astype('int64')
+        frame.index.names = cols
+        return frame.reset_index().sort_values('n', ascending=False, kind='mergesort', ignore_index=True)
+
+
+def calculate_regression_metrics(y_true, y_pred):
+    """Calculates standard regression metrics."""
+    accumulator = RegressionMetricsAccumulator().update(y_true, y_pred)
+    if accumulator.n_invalid:
+        logger.warning(f"Found {accumulator.n_invalid} non-finite values. Excluding them from metrics calculation.")
+    metrics = accumulator.result()
+    if metrics['n'] == 0:
+        logger.warning("No valid samples to calculate metrics.")
+    # MAPE excludes true zeros (NaN if all are zero)
+    return {'mae': metrics['mae'], 'rmse': metrics['rmse'], 'mape': metrics['mape']}
 
-    return {'mae': mae, 'rmse': rmse, 'mape': mape}
 
 if __name__ == '__main__':
+    from src.utils.logging_config import setup_logging
+    setup_logging()
+
     true = [10, 20, 30, 40, 50]
     pred = [12, 18, 33, 38, 55]
     metrics = calculate_regression_metrics(true, pred)
-    print(f"Sample Metrics: {metrics}")
+    logger.info(f"Sample Metrics: {metrics}")
 
     true_with_zero = [0, 10, 20]
     pred_with_zero = [1, 11, 19]
     metrics_zero = calculate_regression_metrics(true_with_zero, pred_with_zero)
-    print(f"Sample Metrics with Zero: {metrics_zero}")
+    logger.info(f"Sample Metrics with Zero: {metrics_zero}")
+
+    # Batches with a per-project breakdown, accumulated by two "workers" and merged
+    workers = [RegressionMetricsAccumulator(breakdowns={'project': ['project_key']}) for _ in range(2)]
+    workers[0].update(true, pred, groups={'project_key': ['A', 'A', 'B', 'B', 'B']})
+    workers[1].update(true_with_zero, pred_with_zero, groups={'project_key': ['A', 'B', 'C']})
+    merged = RegressionMetricsAccumulator.merged(workers)
+    logger.info(f"Merged Metrics: {merged.result()}")
+    logger.info(f"Per Project:\n{merged.breakdown('project')}")
@@ -0,0 +1,246 @@
+import logging
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.data_processing.preprocessing import map_statuses
+from src.data_processing.schema import enforce_schema
+from src.feature_engineering.scope import sprint_membership_changes
+from src.utils.parquet import arrow_schema
+
+logger = logging.getLogger(__name__)
+
+DAILY_SERIES_FILE = "sprint_daily_series.parquet"
+POINT_COLUMNS = ['remaining_story_points', 'completed_story_points']
+COUNT_COLUMNS = ['todo_count', 'wip_count', 'done_count', 'throughput']
+DAILY_SERIES_SCHEMA = {
+    'sprint_id': 'int32',
+    'project_key': 'category',
+    'board_id': 'int32',
+    'day': 'int16',
+    **{col: 'float32' for col in POINT_COLUMNS},
+    **{col: 'int32' for col in COUNT_COLUMNS},
+}
+ROW_GROUP_SIZE = 100_000
+
+DAY_S = 24 * 60 * 60
+
+
+def _seconds(values, epoch, round_up=False):
+    """Whole seconds since `epoch` (rounded down, or up), clipped to uint32 so NaT/far dates stay in range."""
+    ns = (values - epoch).astype('timedelta64[ns]').astype(np.int64)
+    nat = np.isnat(values)
+    seconds = -(-ns // 10**9) if round_up else ns // 10**9
+    seconds = np.where(nat, np.iinfo(np.uint32).max, seconds) # Open intervals end after every snapshot
+    return np.clip(seconds, 0, np.iinfo(np.uint32).max).astype(np.int64)
+
+
+def _shift(values, fill, step):
+    """`values` shifted by `step` (1: previous element, -1: next element), padded with `fill`."""
+    shifted = np.empty_like(values)
+    if step > 0:
+        shifted[:1], shifted[1:] = fill, values[:-1]
+    else:
+        shifted[-1:], shifted[:-1] = fill, values[1:]
+    return shifted
+
+
+def _same_as_next(keys):
+    """True where the next element has the same key."""
+    same = np.zeros(len(keys), dtype=bool)
+    same[:-1] = keys[1:] == keys[:-1]
+    return same
+
+
+def sprint_day_grid(sprints_df, as_of):
+    """
+    The days of every sprint, from its start day to its completion (or `as_of`) day.
+
+    Each day's values are those at its end (midnight of the next day). Sprints that have not
+    started have no days.
+
+    Returns:
+        pd.DataFrame: 'sprint_id', 'date' and 'day' (index within the sprint), grouped by sprint.
+    """
+    end = sprints_df['completed_date'] if 'completed_date' in sprints_df.columns else sprints_df['end_date']
+    first = pd.to_datetime(sprints_df['start_date']).dt.floor('D').to_numpy(dtype='datetime64[ns]')
+    last = np.minimum(pd.to_datetime(end.fillna(sprints_df['end_date'])).dt.floor('D').to_numpy(dtype='datetime64[ns]'),
+                      np.datetime64(as_of.floor('D'), 'ns'))
+    num_days = np.maximum(((last - first) // np.timedelta64(1, 'D')).astype(np.int64) + 1, 0)
+    sprint_pos = np.repeat(np.arange(len(first)), num_days)
+    day = np.arange(int(num_days.sum())) - np.repeat(np.cumsum(num_days) - num_days, num_days)
+    return pd.DataFrame({
+        'sprint_id': sprints_df['sprint_id'].to_numpy()[sprint_pos],
+        'date': first[sprint_pos] + day * np.timedelta64(1, 'D'),
+        'day': day,
+        '_pos': sprint_pos,
+    })
+
+
+def _status_intervals(issues_df, transitions_df, status_mapping):
+    """
+    Status category intervals [start, end) of each issue from its status transitions; issues
+    without any stay in their current status since creation. 'entered_done' marks intervals
+    that start with a completion (done after a status that was not done).
+    """
+    status = transitions_df.loc[transitions_df['field'] == 'status', ['issue_id', 'to_status', 'timestamp']]
+    status = status.assign(issue_id=status['issue_id'].to_numpy(dtype=np.int64))
+    without = issues_df[~issues_df['issue_id'].isin(status['issue_id'])]
+    status = pd.concat([status, pd.DataFrame({'issue_id': without['issue_id'].to_numpy(dtype=np.int64),
+                                              'to_status': without['status'].astype(str).to_numpy(),
+                                              'timestamp': pd.to_datetime(without['created_date']).to_numpy()})],
+                       ignore_index=True)
+    status = status.sort_values(['issue_id', 'timestamp'], kind='mergesort', ignore_index=True)
+
+    issue = status['issue_id'].to_numpy()
+    same_issue_next = _same_as_next(issue)
+    ts = status['timestamp'].to_numpy(dtype='datetime64[ns]')
+    category = map_statuses(status['to_status'], status_mapping).astype(str).to_numpy(dtype=object)
+    is_first = ~_shift(same_issue_next, False, 1)
+    return pd.DataFrame({
+        'issue_id': issue,
+        'status_start': ts,
+        'status_end': np.where(same_issue_next, _shift(ts, np.datetime64('NaT'), -1), np.datetime64('NaT')),
+        'category': category,
+        'entered_done': (category == 'done') & (is_first | (_shift(category, '', 1) != 'done')),
+    })
+
+
+def _membership_intervals(issues_df, transitions_df):
+    """Sprint membership intervals [start, end) of each (issue, sprint) from the membership changes."""
+    changes = sprint_membership_changes(issues_df, transitions_df)
+    changes = changes.sort_values(['issue_id', 'sprint_id', 'timestamp'], kind='mergesort', ignore_index=True)
+    pair = (changes['issue_id'].to_numpy(dtype=np.int64) << 32) | changes['sprint_id'].to_numpy(dtype=np.int64)
+    ts = changes['timestamp'].to_numpy(dtype='datetime64[ns]')
+    joins = (changes['delta'] == 1).to_numpy()
+    member_end = np.where(_same_as_next(pair), _shift(ts, np.datetime64('NaT'), -1), np.datetime64('NaT'))
+    return pd.DataFrame({
+        'issue_id': changes['issue_id'].to_numpy()[joins],
+        'sprint_id': changes['sprint_id'].to_numpy()[joins],
+        'member_start': ts[joins],
+        'member_end': member_end[joins],
+    })
+
+
+def calculate_daily_sprint_series(sprints_df, issues_df, transitions_df, status_mapping, as_of=None):
+    """
+    Daily series of each sprint: remaining and completed story points, to-do / in-progress /
+    done issue counts and throughput (issues completed that day).
+
+    Issues count for a sprint while they are in it (sprint field transitions, see
+    scope.sprint_membership_changes). Each (sprint membership x status) interval adds its
+    value at the first day it covers and removes it after the last: the interval bounds are
+    located on the flattened day grid of all sprints with one searchsorted, and a cumulative
+    sum turns the +/- steps into the daily values. Completions are counted on their day.
+
+    The values are sums over issues, so series of disjoint issue batches add up (see
+    merge_daily_sprint_series).
+
+    Args:
+        sprints_df (pd.DataFrame): Sprints with 'sprint_id', 'start_date', 'end_date'
+            (and 'completed_date', 'project_key', 'board_id').
+        issues_df (pd.DataFrame): Issues with 'issue_id', 'created_date', 'status', 'story_points', 'sprint_id'.
+        transitions_df (pd.DataFrame): Transitions of these issues ('field' 'status' and 'sprint').
+        status_mapping (dict): Status category mapping from the config.
+        as_of (pd.Timestamp, optional): Last day of active sprints; defaults to now.
+
+    Returns:
+        pd.DataFrame: One row per sprint day with 'sprint_id', 'project_key', 'board_id',
+            'date', 'day' and the series columns, in DAILY_SERIES_SCHEMA dtypes.
+    """
+    as_of = pd.Timestamp(as_of) if as_of is not None else pd.Timestamp.now()
+    grid = sprint_day_grid(sprints_df, as_of)
+    num_rows = len(grid)
+
+    # Flattened grid keys: (sprint position, snapshot second) packed into one sorted int64
+    epoch = (grid['date'].min() if num_rows else as_of.floor('D')).to_datetime64()
+    snapshot_s = _seconds(grid['date'].to_numpy(dtype='datetime64[ns]'), epoch) + DAY_S
+    grid_keys = (grid['_pos'].to_numpy(dtype=np.int64) << 32) | snapshot_s
+
+    # Issue x sprint x status intervals: membership intersected with the status intervals
+    intervals = _membership_intervals(issues_df, transitions_df).merge(
+        _status_intervals(issues_df, transitions_df, status_mapping), on='issue_id')
+    sprint_pos = pd.Index(sprints_df['sprint_id'].astype('int64')).get_indexer(intervals['sprint_id'])
+    intervals, sprint_pos = intervals[sprint_pos >= 0], sprint_pos[sprint_pos >= 0].astype(np.int64)
+    far = np.datetime64('2262-01-01', 'ns') # Stands in for open ends in min/max
+    member_end = intervals['member_end'].to_numpy(dtype='datetime64[ns]')
+    status_end = intervals['status_end'].to_numpy(dtype='datetime64[ns]')
+    member_start = intervals['member_start'].to_numpy(dtype='datetime64[ns]')
+    status_start = intervals['status_start'].to_numpy(dtype='datetime64[ns]')
+    lo = np.maximum(member_start, status_start)
+    hi = np.minimum(np.where(np.isnat(member_end), far, member_end), np.where(np.isnat(status_end), far, status_end))
+    overlaps = lo < hi
+
+    # First snapshot at or after each bound; an interval counts on the days [first, last)
+    first = np.searchsorted(grid_keys, (sprint_pos << 32) | _seconds(lo, epoch, round_up=True), side='left')
+    last = np.searchsorted(grid_keys, (sprint_pos << 32) | _seconds(hi, epoch, round_up=True), side='left')
+    category = intervals['category'].to_numpy()
+    points = pd.Series(pd.to_numeric(issues_df['story_points'], errors='coerce').to_numpy(dtype='float64'),
+                       index=issues_df['issue_id'].to_numpy()).reindex(intervals['issue_id'].to_numpy()).fillna(0).to_numpy()
+
+    def daily(mask, weights=None):
+        w = None if weights is None else weights[mask]
+        steps = (np.bincount(first[mask], weights=w, minlength=num_rows + 1)
+                 - np.bincount(last[mask], weights=w, minlength=num_rows + 1))
+        return np.cumsum(steps)[:num_rows]
+
+    is_done = category == 'done'
+    series = grid[['sprint_id', 'date', 'day']].copy()
+    series['remaining_story_points'] = daily(overlaps & ~is_done, points)
+    series['completed_story_points'] = daily(overlaps & is_done, points)
+    series['todo_count'] = daily(overlaps & ~is_done & (category != 'inprogress'))
+    series['wip_count'] = daily(overlaps & (category == 'inprogress'))
+    series['done_count'] = daily(overlaps & is_done)
+
+    # Completions while in the sprint, counted on their day if it is one of the sprint's days
+    completed = (intervals['entered_done'].to_numpy() & (status_start >= member_start)
+                 & (np.isnat(member_end) | (status_start < member_end)))
+    completion_pos, completion_ts = sprint_pos[completed], status_start[completed]
+    day_index = np.searchsorted(grid_keys, (completion_pos << 32) | _seconds(completion_ts, epoch), side='right')
+    sprint_first = np.searchsorted(grid_keys, completion_pos << 32, side='left')
+    sprint_stop = np.searchsorted(grid_keys, (completion_pos + 1) << 32, side='left')
+    on_grid = (day_index < sprint_stop) & (sprint_first < sprint_stop)
+    dates = grid['date'].to_numpy(dtype='datetime64[ns]')
+    on_grid[on_grid] &= completion_ts[on_grid] >= dates[sprint_first[on_grid]]
+    series['throughput'] = np.bincount(day_index[on_grid], minlength=num_rows)[:num_rows]
+
+    for col in ('board_id', 'project_key'):
+        if col in sprints_df.columns:
+            series.insert(1, col, sprints_df[col].to_numpy()[grid['_pos'].to_numpy()])
+    return enforce_schema(series, DAILY_SERIES_SCHEMA)
+
+
+def merge_daily_sprint_series(partials):
+    """Sums daily series computed over disjoint batches of issues."""
+    partials = [p for p in partials if not p.empty]
+    if not partials:
+        return pd.DataFrame(columns=list(DAILY_SERIES_SCHEMA) + ['date'])
+    keys = [c for c in ('sprint_id', 'project_key', 'board_id', 'date', 'day') if c in partials[0].columns]
+    merged = pd.concat(partials, ignore_index=True).groupby(keys, sort=False, observed=True, as_index=False)[
+        POINT_COLUMNS + COUNT_COLUMNS].sum()
+    return enforce_schema(merged, DAILY_SERIES_SCHEMA)
+
+
+def write_daily_sprint_series(series_df, path):
+    """
+    Writes the daily series as one Parquet file sorted by (sprint_id, date), so that a
+    sprint's days are contiguous and readers can skip row groups by sprint_id.
+    """
+    df = enforce_schema(series_df, DAILY_SERIES_SCHEMA).sort_values(['sprint_id', 'date'], kind='mergesort',
+                                                                    ignore_index=True)
+    tmp_path = path.with_suffix(".tmp")
+    pq.write_table(pa.Table.from_pandas(df, schema=arrow_schema(df), preserve_index=False), tmp_path,
+                   row_group_size=ROW_GROUP_SIZE)
+    tmp_path.replace(path)
+    logger.info(f"Wrote {len(df)} sprint days of {df['sprint_id'].nunique()} sprints to {path}")
+
+
+def read_daily_sprint_series(path, sprint_ids=None, project_key=None):
+    """Reads the daily series, optionally of some sprints or of one project only (filters are pushed down)."""
+    filters = []
+    if sprint_ids is not None:
+        filters.append(('sprint_id', 'in', [int(s) for s in sprint_ids]))
+    if project_key is not None:
+        filters.append(('project_key', '==', project_key))
+    return enforce_schema(pd.read_parquet(path, filters=filters or None), DAILY_SERIES_SCHEMA)
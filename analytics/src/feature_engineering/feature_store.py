@@ -0,0 +1,242 @@
+import json
+import logging
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pathlib import Path
+
+from src.feature_engineering.features import HISTORICAL_FEATURE_PATTERN
+from src.utils.parquet import arrow_schema
+
+logger = logging.getLogger(__name__)
+
+STORE_DIR = "feature_store"
+VALUES_FILE = "features.parquet"
+INDEX_FILE = "index.json"
+ENTITY_COLUMNS = ['project_key', 'board_id', 'sprint_id']
+PLANNED_FEATURES = ['planned_story_points', 'planned_issue_count', 'carried_over_story_points']
+ROW_GROUP_SIZE = 50_000
+
+
+def feature_columns_of(features_df):
+    """The feature columns of a model input table (historical and planned features)."""
+    return [c for c in features_df.columns if HISTORICAL_FEATURE_PATTERN.match(c) or c in PLANNED_FEATURES]
+
+
+class FeatureStore:
+    """
+    Point-in-time store of sprint features keyed by (project_key, sprint_id, as_of).
+
+    Each row holds the feature values of a sprint as known from `as_of` on; a sprint gets a
+    new row only when its values change. Lookups return, for each (project_key, sprint_id,
+    as_of) request, the latest row at or before the requested as_of, so training sets and
+    inference vectors are read from the same materialized values.
+
+    Values live in one Parquet file sorted by the key; the index maps each project to its
+    row range so a project's rows are read from its row groups only.
+
+    Usage:
+        store = FeatureStore.from_config(config)
+        store.materialize(model_input_features_df)
+        train_df = store.training_set(closed_sprints_with_velocity_df)
+        vector = store.get_online_features("PROJ", sprint_id=42, features=features_list)
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.values_path = self.root / VALUES_FILE
+        self.index_path = self.root / INDEX_FILE
+        self._values = None
+        self._index = None
+
+    @classmethod
+    def from_config(cls, config):
+        """Store under `paths.features_dir`."""
+        return cls(Path(config['paths']['features_dir']) / STORE_DIR)
+
+    def exists(self):
+        return self.values_path.exists() and self.index_path.exists()
+
+    # --- Reading ---
+
+    def index(self):
+        if self._index is None:
+            with open(self.index_path, 'r') as f:
+                self._index = json.load(f)
+        return self._index
+
+    @property
+    def feature_columns(self):
+        return self.index()['feature_columns']
+
+    def load(self, project_keys=None):
+        """
+        Reads the stored rows, all of them or those of `project_keys` (via the index).
+
+        Returns:
+            pd.DataFrame: Rows sorted by (project_key, sprint_id, as_of).
+        """
+        if not self.exists():
+            return pd.DataFrame(columns=ENTITY_COLUMNS + ['as_of'])
+        if project_keys is None:
+            if self._values is None:
+                self._values = pd.read_parquet(self.values_path)
+            return self._values
+
+        index = self.index()
+        row_group_size = index['row_group_size']
+        parquet_file = pq.ParquetFile(self.values_path)
+        tables = []
+        for key in dict.fromkeys(str(k) for k in project_keys):
+            if key not in index['projects']:
+                continue
+            start, stop = index['projects'][key]
+            groups = list(range(start // row_group_size, (stop - 1) // row_group_size + 1))
+            table = parquet_file.read_row_groups(groups)
+            offset = groups[0] * row_group_size
+            tables.append(table.slice(start - offset, stop - start))
+        if not tables:
+            return self.load().iloc[0:0]
+        return pa.concat_tables(tables).to_pandas()
+
+    # --- Writing ---
+
+    def materialize(self, features_df, as_of=None):
+        """
+        Stores the current feature values of the sprints in `features_df`.
+
+        Sprints not in the store yet are stored as of min(start_date, as_of): their values are
+        computed from the history before the sprint started. Sprints already stored get a new
+        row as of `as_of` only if one of their values changed.
+
+        Args:
+            features_df (pd.DataFrame): Model input table with 'project_key', 'board_id',
+                'sprint_id', 'start_date' and the feature columns.
+            as_of (pd.Timestamp, optional): When these values became known; defaults to now.
+
+        Returns:
+            int: Number of rows added.
+        """
+        as_of = pd.Timestamp(as_of) if as_of is not None else pd.Timestamp.now().floor('s')
+        feature_columns = feature_columns_of(features_df)
+        rows = features_df[[c for c in ENTITY_COLUMNS if c in features_df.columns] + feature_columns].copy()
+        if 'project_key' not in rows.columns:
+            rows['project_key'] = ''
+        rows['project_key'] = rows['project_key'].astype(str)
+        rows[feature_columns] = rows[feature_columns].astype('float64')
+        existing = self.load()
+
+        latest = existing.groupby(['project_key', 'sprint_id'], sort=False).tail(1) if not existing.empty else existing
+        key = ['project_key', 'sprint_id']
+        merged = rows.merge(latest[key + [c for c in feature_columns if c in latest.columns]],
+                            on=key, how='left', suffixes=('', '_stored'), indicator=True)
+        is_new = (merged['_merge'] == 'left_only').to_numpy()
+        changed = np.zeros(len(merged), dtype=bool)
+        for col in feature_columns:
+            stored = merged[f"{col}_stored"] if f"{col}_stored" in merged.columns else pd.Series(np.nan, index=merged.index)
+            same = (merged[col] == stored) | (merged[col].isna() & stored.isna())
+            changed |= ~same.to_numpy()
+        changed &= ~is_new
+
+        start_dates = pd.to_datetime(features_df['start_date']).to_numpy()
+        row_as_of = np.where(is_new & (start_dates < as_of.to_datetime64()), start_dates, as_of.to_datetime64())
+        rows['as_of'] = row_as_of
+        added = rows[is_new | changed]
+        if added.empty:
+            logger.info("Feature store is up to date; no rows added.")
+            return 0
+
+        values = pd.concat([existing, added], ignore_index=True) if not existing.empty else added
+        values = values.sort_values(['project_key', 'sprint_id', 'as_of'], kind='mergesort', ignore_index=True)
+        self._write(values, feature_columns)
+        logger.info(f"Materialized {len(added)} feature rows ({int(is_new.sum())} new sprints, "
+                    f"{int(changed.sum())} changed) into {self.values_path}.")
+        return len(added)
+
+    def _write(self, values, feature_columns):
+        self.root.mkdir(parents=True, exist_ok=True)
+        keys = values['project_key'].to_numpy()
+        # Row range of each project in the sorted file
+        boundaries = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+        starts = np.concatenate([[0], boundaries])
+        stops = np.concatenate([boundaries, [len(values)]])
+        index = {
+            'feature_columns': feature_columns,
+            'row_group_size': ROW_GROUP_SIZE,
+            'num_rows': len(values),
+            'projects': {str(keys[s]): [int(s), int(e)] for s, e in zip(starts, stops)},
+        }
+        tmp_path = self.values_path.with_suffix(".tmp")
+        pq.write_table(pa.Table.from_pandas(values, schema=arrow_schema(values), preserve_index=False),
+                       tmp_path, row_group_size=ROW_GROUP_SIZE)
+        tmp_path.replace(self.values_path)
+        tmp_index = self.index_path.with_suffix(".tmp")
+        with open(tmp_index, 'w') as f:
+            json.dump(index, f, indent=2)
+        tmp_index.replace(self.index_path)
+        self._values, self._index = values, index
+
+    # --- Point-in-time lookups ---
+
+    def lookup(self, requests_df, features=None):
+        """
+        Point-in-time lookup: for each request row (project_key, sprint_id, as_of), the values of
+        the latest stored row of that sprint at or before as_of (NaN if there is none).
+
+        Returns:
+            pd.DataFrame: The request rows (in their order) with the feature columns added.
+        """
+        features = features or self.feature_columns
+        requests = requests_df.reset_index(drop=True).assign(_order=lambda d: np.arange(len(d)))
+        requests['project_key'] = requests['project_key'].astype(str)
+        requests['as_of'] = pd.to_datetime(requests['as_of'])
+        values = self.load(requests['project_key'].unique())
+        if values.empty:
+            return requests.drop(columns='_order').assign(**{f: np.nan for f in features})
+        values = values[['project_key', 'sprint_id', 'as_of'] + features].copy()
+        values['sprint_id'] = values['sprint_id'].astype('int64')
+        requests['sprint_id'] = requests['sprint_id'].astype('int64')
+        # merge_asof needs both sides sorted by the 'on' key
+        result = pd.merge_asof(
+            requests.sort_values('as_of', kind='mergesort'),
+            values.sort_values('as_of', kind='mergesort'),
+            on='as_of', by=['project_key', 'sprint_id'], direction='backward'
+        )
+        return result.sort_values('_order').drop(columns='_order').reset_index(drop=True)
+
+    def training_set(self, sprints_with_target_df, target='actual_velocity', features=None, as_of=None):
+        """
+        Training rows for closed sprints: each sprint's features, plus the target and the columns
+        used for time-series splits.
+
+        The stored values of a sprint are computed from the history before it started, and a
+        correction of the underlying data adds a newer row. `as_of` picks which row is used:
+        None (default) the latest one, so corrections reach training; a timestamp (e.g. a
+        training cutoff) the values known at that time, reproducing an earlier training set;
+        'start_date' the values known when each sprint started (what inference saw then).
+        """
+        columns = [c for c in ['project_key', 'board_id', 'sprint_id', 'start_date', 'state', target]
+                   if c in sprints_with_target_df.columns]
+        requests = sprints_with_target_df[columns].copy()
+        if 'project_key' not in requests.columns:
+            requests['project_key'] = ''
+        if as_of is None:
+            requests['as_of'] = pd.Timestamp.max
+        elif isinstance(as_of, str) and as_of == 'start_date':
+            requests['as_of'] = pd.to_datetime(requests['start_date'])
+        else:
+            requests['as_of'] = pd.Timestamp(as_of)
+        return self.lookup(requests, features=features).drop(columns='as_of')
+
+    def get_online_features(self, project_key, sprint_id, features=None, as_of=None):
+        """Feature vector (one-row DataFrame in `features` order) of one sprint as of now or `as_of`."""
+        return self.get_batch_features(pd.DataFrame({'project_key': [project_key], 'sprint_id': [sprint_id]}),
+                                       features=features, as_of=as_of)
+
+    def get_batch_features(self, sprints_df, features=None, as_of=None):
+        """Feature vectors of several sprints (rows of 'project_key', 'sprint_id') as of now or `as_of`."""
+        features = features or self.feature_columns
+        requests = sprints_df[['project_key', 'sprint_id']].copy()
+        requests['as_of'] = pd.Timestamp(as_of) if as_of is not None else pd.Timestamp.now()
+        return self.lookup(requests, features=features)[features]
@@ -1,47 +1,102 @@
+import re
 import pandas as pd
 import numpy as np
 import logging
 
 logger = logging.getLogger(__name__)
 
-def generate_historical_velocity_features(sprints_with_velocity_df, windows=[1, 3, 5]):
-    """Generates historical velocity features (e.g., avg velocity of last N sprints)."""
-    logger.info(f"Generating historical velocity features for windows: {windows}")
-    df = sprints_with_velocity_df.sort_values('start_date').copy()
+# Sprints of different teams (project, board) form separate velocity series
+GROUP_KEYS = ['project_key', 'board_id']
+HISTORICAL_FEATURE_PATTERN = re.compile(r"^(avg|median|std)_velocity_last_\d+_sprints$|^ewm_velocity_span_\d+_sprints$")
 
-    if 'actual_velocity' not in df.columns:
-         logger.error("Input DataFrame must contain 'actual_velocity' column.")
-         return df # Return original df or raise error
 
-    # Shift by 1 to ensure we use past data only (velocity of sprint k uses data up to k-1)
-    df_shifted = df['actual_velocity'].shift(1)
+def feature_windows(config):
+    """The rolling windows of the historical velocity features (velocity_model.feature_windows)."""
+    return list(config.get('velocity_model', {}).get('feature_windows', [1, 3, 5]))
+
 
+def historical_feature_columns(windows=[1, 3, 5]):
+    """Names of the historical velocity features generated for `windows`."""
+    columns = []
     for w in windows:
-        col_name = f"avg_velocity_last_{w}_sprints"
-        df[col_name] = df_shifted.rolling(window=w, min_periods=1).mean()
-        # Handle potential NaNs at the beginning
-        # df[col_name].fillna(df[col_name].median(), inplace=True) # Or use 0 or ffill
+        columns.append(f"avg_velocity_last_{w}_sprints")
+        if w > 1: # Over one sprint the median and EWMA equal the mean and the std is undefined
+            columns += [f"median_velocity_last_{w}_sprints", f"std_velocity_last_{w}_sprints",
+                        f"ewm_velocity_span_{w}_sprints"]
+    return columns
+
+
+def generate_historical_velocity_features(sprints_with_velocity_df, windows=[1, 3, 5], group_keys=GROUP_KEYS):
+    """
+    Generates historical velocity features per team.
+
+    For each window w: the mean, median and std of the velocity of the team's previous w
+    sprints and its EWMA with span w, all lagged by one sprint. Teams are the `group_keys`
+    present in the frame (a single series if none is); all teams are computed together, one
+    grouped rolling pass per statistic.
+
+    Returns:
+        pd.DataFrame: The input sprints sorted by start_date, with the feature columns added.
+    """
+    logger.info(f"Generating historical velocity features for windows: {windows}")
+    if 'actual_velocity' not in sprints_with_velocity_df.columns:
+         logger.error("Input DataFrame must contain 'actual_velocity' column.")
+         return sprints_with_velocity_df # Return original df or raise error
 
-    logger.info(f"Generated features: {', '.join([f'avg_velocity_last_{w}_sprints' for w in windows])}")
+    keys = [k for k in group_keys if k in sprints_with_velocity_df.columns]
+    df = sprints_with_velocity_df.sort_values(keys + ['start_date'], kind='mergesort')
+    if keys:
+        group_ids = df.groupby(keys, sort=False, observed=True, dropna=False).ngroup().to_numpy()
+    else:
+        group_ids = np.zeros(len(df), dtype=np.int64)
+
+    # Shift by 1 within each team to use past data only (velocity of sprint k uses data up to k-1)
+    shifted = df['actual_velocity'].astype('float64').groupby(group_ids).shift(1)
+    grouped = shifted.groupby(group_ids)
+
+    # Grouped window results are indexed by (group, original index); drop the group level to align
+    features = {}
+    for w in windows:
+        rolling = grouped.rolling(window=w, min_periods=1)
+        features[f"avg_velocity_last_{w}_sprints"] = rolling.mean().droplevel(0)
+        if w > 1:
+            features[f"median_velocity_last_{w}_sprints"] = rolling.median().droplevel(0)
+            features[f"std_velocity_last_{w}_sprints"] = rolling.std().droplevel(0)
+            features[f"ewm_velocity_span_{w}_sprints"] = grouped.ewm(span=w, min_periods=1).mean().droplevel(0)
+    df = df.assign(**features).sort_values('start_date', kind='mergesort')
+
+    logger.info(f"Generated features for {len(np.unique(group_ids))} team(s): "
+                f"{', '.join(historical_feature_columns(windows))}")
     return df
 
 
-def generate_planned_features(sprints_df, processed_issues_df):
-    """Generates features based on issues planned for each sprint."""
+def generate_planned_features(sprints_df, processed_issues_df, scope_df=None):
+    """
+    Generates features based on issues planned for each sprint.
+
+    With `scope_df` (see scope.calculate_sprint_scope) the planned scope is the one at the
+    sprint start, plus the scope carried over, added and removed. Without it, the issues are
+    counted in their current sprint, which includes scope added after the sprint started.
+    """
+    if scope_df is not None:
+        logger.info("Using the point-in-time sprint scope for the planned features...")
+        scope_columns = [c for c in scope_df.columns if c != 'sprint_id']
+        df_sprints = sprints_df.merge(scope_df, on='sprint_id', how='left')
+        df_sprints[scope_columns] = df_sprints[scope_columns].fillna(0)
+        logger.info(f"Generated features: {', '.join(scope_columns)}")
+        return df_sprints
+
     logger.info("Generating planned features (story points, issue count) for sprints...")
     # We need *all* sprints here, not just closed ones, as we might predict for future/active ones
-    df_sprints = sprints_df.copy()
-    df_issues = processed_issues_df.copy()
-
-    # Group issues by their assigned sprint_id
+    # Group issues by their assigned sprint_id (read-only, so no copies of the inputs are needed)
     # Use the non-imputed story points for planning features if desired, or the imputed one
-    planned_agg = df_issues.groupby('sprint_id').agg(
+    planned_agg = processed_issues_df.groupby('sprint_id').agg(
         planned_story_points=('story_points', 'sum'),
         planned_issue_count=('issue_id', 'count')
     ).reset_index()
 
     # Merge planned features into the sprints DataFrame
-    df_sprints = df_sprints.merge(planned_agg, on='sprint_id', how='left')
+    df_sprints = sprints_df.merge(planned_agg, on='sprint_id', how='left')
 
     # Fill NaNs for sprints with potentially no issues planned (or if merge fails)
     df_sprints['planned_story_points'].fillna(0, inplace=True)
@@ -57,17 +112,43 @@ def combine_features(historical_sprint_features_df, planned_sprint_features_df):
     # Both dataframes have 'sprint_id' as a key
     # Use the planned features df as base, merge historical (which only exist for closed sprints + 1 future one potentially)
     combined_df = planned_sprint_features_df.merge(
-        historical_sprint_features_df[['sprint_id'] + [col for col in historical_sprint_features_df.columns if 'avg_velocity' in col]],
+        historical_sprint_features_df[['sprint_id'] + [col for col in historical_sprint_features_df.columns
+                                                        if HISTORICAL_FEATURE_PATTERN.match(col)]],
         on='sprint_id',
         how='left' # Keep all sprints, historical features will be NaN for earliest sprints
     )
     logger.info(f"Combined DataFrame shape: {combined_df.shape}")
     return combined_df
 
+def build_model_features(closed_sprints_df, all_sprints_df, processed_issues_df, windows=[1, 3, 5], scope_df=None,
+                         hist_feat_df=None):
+    """
+    Builds the model input table: planned features for all sprints (from the point-in-time
+    `scope_df` when given), historical velocity features and the 'actual_velocity' target
+    for closed sprints.
+
+    `hist_feat_df` takes already computed historical features (e.g. from
+    rolling_state.update_historical_features) instead of recomputing every window.
+    """
+    if hist_feat_df is None:
+        # Ensure sorted by date for rolling calculations
+        closed_sprints_df = closed_sprints_df.sort_values(by='start_date')
+        hist_feat_df = generate_historical_velocity_features(closed_sprints_df, windows=windows)
+    plan_feat_df = generate_planned_features(all_sprints_df, processed_issues_df, scope_df)
+    final_features_df = combine_features(hist_feat_df, plan_feat_df)
+
+    # Make sure 'actual_velocity' is present for the rows corresponding to closed sprints
+    if 'actual_velocity' not in final_features_df.columns and 'actual_velocity' in hist_feat_df.columns:
+         final_features_df = final_features_df.merge(
+             hist_feat_df[['sprint_id', 'actual_velocity']], on='sprint_id', how='left'
+         )
+    return final_features_df
+
 if __name__ == '__main__':
     # Usage (requires processed data files)
     from src.utils.logging_config import setup_logging
     from src.utils.config import load_config
+    from src.data_processing.schema import ISSUE_SCHEMA, read_compact_parquet
     from pathlib import Path
     setup_logging()
     cfg = load_config()
@@ -80,7 +161,7 @@ if __name__ == '__main__':
     if closed_sprints_path.exists() and all_sprints_path.exists() and issues_path.exists():
         closed_sprints_df = pd.read_parquet(closed_sprints_path)
         all_sprints_df = pd.read_parquet(all_sprints_path)
-        issues_df = pd.read_parquet(issues_path)
+        issues_df = read_compact_parquet(issues_path, ISSUE_SCHEMA)
 
         hist_feat_df = generate_historical_velocity_features(closed_sprints_df, windows=[1, 3])
         plan_feat_df = generate_planned_features(all_sprints_df, issues_df)
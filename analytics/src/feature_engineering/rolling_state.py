@@ -0,0 +1,356 @@
+import json
+import logging
+import numpy as np
+import pandas as pd
+from collections import deque
+from pathlib import Path
+
+from src.feature_engineering.features import generate_historical_velocity_features, historical_feature_columns
+
+logger = logging.getLogger(__name__)
+
+ROLLING_STATE_FILE = "rolling_state.json"
+
+
+def team_key(project_key=None, board_id=None):
+    """Key of a team's velocity series ('PROJ/1'); missing parts are left empty."""
+    return f"{'' if project_key is None else project_key}/{'' if board_id is None else int(board_id)}"
+
+
+def team_keys(df):
+    """team_key of every row of a sprints frame, vectorized; missing parts (e.g. a null board_id) are left empty."""
+    if 'project_key' in df.columns:
+        projects = df['project_key'].astype(object).where(df['project_key'].notna(), '').astype(str)
+    else:
+        projects = pd.Series('', index=df.index)
+    if 'board_id' in df.columns:
+        boards = df['board_id'].astype('Int64').astype(str).replace('<NA>', '')
+    else:
+        boards = pd.Series('', index=df.index)
+    return projects + '/' + boards
+
+
+class RollingVelocityState:
+    """
+    Per-team running state of the historical velocity features.
+
+    Each team keeps a ring buffer of its last max(windows) sprint ids and velocities, the
+    running sum of each window, the running numerator/denominator of each EWMA, and the
+    count and total of all its applied velocities. Closing a sprint updates them in constant
+    time, and the features of the team's next sprint are read off the state without touching
+    the history. The values equal those of generate_historical_velocity_features for a
+    sprint following the team's last closed one.
+
+    Usage:
+        state = RollingVelocityState.from_history(closed_sprints_with_velocity_df)
+        state.update(team_key("PROJ", 1), sprint_id=42, start_date="2024-03-04", velocity=31.0)
+        state.features(team_key("PROJ", 1)) # -> {'avg_velocity_last_1_sprints': 31.0, ...}
+        state.save(path)
+    """
+
+    def __init__(self, windows=[1, 3, 5], teams=None):
+        self.windows = sorted(set(windows))
+        self.teams = teams if teams is not None else {}
+
+    def _new_team(self):
+        return {
+            'last_sprint_id': None,
+            'last_start_date': None,
+            'count': 0,
+            'total': 0.0,
+            'buffer_ids': deque(maxlen=max(self.windows)),
+            'buffer': deque(maxlen=max(self.windows)),
+            'sums': {w: 0.0 for w in self.windows},
+            'ewm': {w: [0.0, 0.0] for w in self.windows if w > 1}, # [numerator, denominator]
+        }
+
+    def update(self, key, sprint_id, start_date, velocity):
+        """
+        Adds the velocity of a team's newly closed sprint.
+
+        Sprints that start before the team's last applied sprint, or that are among its last
+        applied ones, are ignored, so replaying recently applied sprints is harmless. A sprint
+        that closes late (before the team's last applied one) needs the team rebuilt, which
+        apply_closed_sprints does.
+
+        Returns:
+            bool: True if the state changed.
+        """
+        team = self.teams.get(key)
+        if team is None:
+            team = self.teams[key] = self._new_team()
+        start_date = pd.Timestamp(start_date)
+        sprint_id = None if sprint_id is None else int(sprint_id)
+        if team['last_start_date'] is not None and (start_date < team['last_start_date']
+                                                    or sprint_id in team['buffer_ids']):
+            return False
+
+        velocity = float(velocity)
+        buffer = team['buffer']
+        for w in self.windows:
+            if len(buffer) >= w:
+                team['sums'][w] -= buffer[-w] # The value leaving window w
+            team['sums'][w] += velocity
+        for w, running in team['ewm'].items():
+            decay = 1 - 2 / (w + 1)
+            running[0] = velocity + decay * running[0]
+            running[1] = 1 + decay * running[1]
+        buffer.append(velocity)
+        team['buffer_ids'].append(sprint_id)
+        team['count'] += 1
+        team['total'] += velocity
+        team['last_sprint_id'] = sprint_id
+        team['last_start_date'] = start_date
+        return True
+
+    def features(self, key):
+        """Historical velocity features for the next sprint of a team (NaN for unknown teams)."""
+        team = self.teams.get(key)
+        features = dict.fromkeys(historical_feature_columns(self.windows), np.nan)
+        if team is None or team['count'] == 0:
+            return features
+        buffer = list(team['buffer'])
+        for w in self.windows:
+            n = min(w, len(buffer))
+            features[f"avg_velocity_last_{w}_sprints"] = team['sums'][w] / n
+            if w > 1:
+                recent = buffer[-n:]
+                features[f"median_velocity_last_{w}_sprints"] = float(np.median(recent))
+                features[f"std_velocity_last_{w}_sprints"] = float(np.std(recent, ddof=1)) if n > 1 else np.nan
+                numerator, denominator = team['ewm'][w]
+                features[f"ewm_velocity_span_{w}_sprints"] = numerator / denominator
+        return features
+
+    def last_start_date(self, key):
+        team = self.teams.get(key)
+        return team['last_start_date'] if team else None
+
+    def stale_teams(self, sprints_with_velocity_df, keys=None):
+        """
+        Teams whose state no longer matches the history.
+
+        A team is stale if the history's sprints up to its last applied one differ from
+        what was applied: another count (a sprint closed late, or was removed), another
+        velocity total, or other sprint ids or velocities in the buffer (e.g. the data was
+        regenerated). Teams missing from the history are stale too.
+
+        Returns:
+            set[str]: Team keys.
+        """
+        df = sprints_with_velocity_df
+        keys = team_keys(df) if keys is None else keys
+        last_dates = pd.to_datetime(keys.map({key: team['last_start_date'] for key, team in self.teams.items()}))
+        applied = df[last_dates.notna() & (pd.to_datetime(df['start_date']) <= last_dates)].assign(_team=keys)
+        applied = applied.sort_values('start_date', kind='mergesort')
+        grouped = applied.groupby('_team', sort=False)
+        counts, totals = grouped.size(), grouped['actual_velocity'].sum()
+        recent = grouped.tail(max(self.windows)).groupby('_team', sort=False)
+        recent_ids = recent['sprint_id'].agg(list)
+        recent_velocities = recent['actual_velocity'].agg(list)
+
+        stale = set()
+        for key, team in self.teams.items():
+            if team['count'] == 0:
+                continue
+            if (key not in counts.index or counts[key] != team['count']
+                    or not np.isclose(totals[key], team['total'])
+                    or [int(i) for i in recent_ids[key]] != list(team['buffer_ids'])
+                    or not np.allclose(recent_velocities[key], list(team['buffer']))):
+                stale.add(key)
+        return stale
+
+    def advance(self, sprints_with_velocity_df, rebuild=()):
+        """
+        Applies the closed sprints (with 'actual_velocity') not applied yet.
+
+        Stale teams (see stale_teams), and the teams in `rebuild`, are rebuilt from their
+        history first. The sprints after each team's last applied one are applied in order
+        of start date.
+
+        Returns:
+            pd.DataFrame: The historical features of each applied sprint, read off the state
+            just before the sprint was applied, indexed like `sprints_with_velocity_df`.
+        """
+        df = sprints_with_velocity_df
+        keys = team_keys(df)
+        stale = self.stale_teams(df, keys) | set(rebuild)
+        for key in stale:
+            self.teams.pop(key, None)
+        if stale:
+            logger.info(f"Rebuilding the rolling velocity state of {len(stale)} team(s) whose history changed.")
+
+        # Only sprints after their team's last applied one are new; skip the rest without a Python loop
+        last_dates = keys.map({key: team['last_start_date'] for key, team in self.teams.items()})
+        last_dates = pd.to_datetime(last_dates)
+        is_new = last_dates.isna() | (pd.to_datetime(df['start_date']) > last_dates)
+        new = df[is_new].assign(_team=keys[is_new]).sort_values('start_date', kind='mergesort')
+
+        rows, index = [], []
+        for row, key, sprint_id, start_date, velocity in zip(new.index, new['_team'], new['sprint_id'],
+                                                              new['start_date'], new['actual_velocity']):
+            features = self.features(key)
+            if self.update(key, sprint_id, start_date, velocity):
+                rows.append(features)
+                index.append(row)
+        return pd.DataFrame(rows, index=index, columns=historical_feature_columns(self.windows), dtype='float64')
+
+    def apply_closed_sprints(self, sprints_with_velocity_df):
+        """
+        Updates the state with closed sprints (with 'actual_velocity') not applied yet; see advance.
+
+        Returns:
+            int: Number of sprints applied.
+        """
+        return len(self.advance(sprints_with_velocity_df))
+
+    @classmethod
+    def from_history(cls, sprints_with_velocity_df, windows=[1, 3, 5]):
+        """Builds the state by replaying a closed sprints history once."""
+        state = cls(windows)
+        applied = state.apply_closed_sprints(sprints_with_velocity_df)
+        logger.info(f"Built rolling velocity state for {len(state.teams)} team(s) from {applied} closed sprints.")
+        return state
+
+    # --- Persistence ---
+
+    def to_dict(self):
+        return {
+            'windows': self.windows,
+            'teams': {
+                key: {
+                    'last_sprint_id': team['last_sprint_id'],
+                    'last_start_date': team['last_start_date'].isoformat() if team['last_start_date'] is not None else None,
+                    'count': team['count'],
+                    'total': team['total'],
+                    'buffer_ids': list(team['buffer_ids']),
+                    'buffer': list(team['buffer']),
+                    'sums': {str(w): v for w, v in team['sums'].items()},
+                    'ewm': {str(w): v for w, v in team['ewm'].items()},
+                    # Read-only snapshot for serving (the forecast endpoint), which does not recompute features
+                    'next_features': {f: None if pd.isna(v) else float(v) for f, v in self.features(key).items()},
+                }
+                for key, team in self.teams.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls(data['windows'])
+        for key, team in data['teams'].items():
+            state.teams[key] = {
+                'last_sprint_id': team['last_sprint_id'],
+                'last_start_date': pd.Timestamp(team['last_start_date']) if team['last_start_date'] else None,
+                'count': team['count'],
+                # States saved before the totals and ids were kept do not match any history (see stale_teams)
+                'total': team.get('total', np.nan),
+                'buffer_ids': deque(team.get('buffer_ids', [None] * len(team['buffer'])), maxlen=max(state.windows)),
+                'buffer': deque(team['buffer'], maxlen=max(state.windows)),
+                'sums': {int(w): v for w, v in team['sums'].items()},
+                'ewm': {int(w): v for w, v in team['ewm'].items()},
+            }
+        return state
+
+    def save(self, path):
+        """Writes the state as JSON (atomically)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path):
+        """Loads a saved state, or returns None if there is none."""
+        path = Path(path)
+        if not path.exists():
+            return None
+        with open(path, 'r') as f:
+            return cls.from_dict(json.load(f))
+
+
+def update_rolling_state(path, sprints_with_velocity_df, windows=[1, 3, 5]):
+    """
+    Loads the saved state (or builds it from the history), applies the newly closed sprints
+    and saves it.
+
+    A state saved with other windows is rebuilt from the history; so are the teams whose
+    history changed (see RollingVelocityState.stale_teams).
+
+    Returns:
+        RollingVelocityState: The updated state.
+    """
+    state = RollingVelocityState.load(path)
+    if state is None or state.windows != sorted(set(windows)):
+        state = RollingVelocityState.from_history(sprints_with_velocity_df, windows)
+    else:
+        applied = state.apply_closed_sprints(sprints_with_velocity_df)
+        logger.info(f"Applied {applied} newly closed sprints to the rolling velocity state.")
+    state.save(path)
+    return state
+
+
+def update_historical_features(path, sprints_with_velocity_df, previous_features_df=None, windows=[1, 3, 5]):
+    """
+    Historical velocity features of the closed sprints, with the saved state updated.
+
+    The features of the sprints already applied to the state are taken from
+    `previous_features_df` (the last model input table); only the newly closed sprints,
+    and the teams whose history changed, go through the state. Without a saved state for
+    these windows or a previous table, all features are computed by
+    generate_historical_velocity_features and the state is built from the history.
+
+    Returns:
+        tuple[pd.DataFrame, RollingVelocityState]: The closed sprints sorted by start_date
+        with the feature columns (as generate_historical_velocity_features returns them),
+        and the updated state.
+    """
+    columns = historical_feature_columns(windows)
+    state = RollingVelocityState.load(path)
+    if (state is None or state.windows != sorted(set(windows)) or previous_features_df is None
+            or not {'sprint_id', *columns} <= set(previous_features_df.columns)):
+        features_df = generate_historical_velocity_features(sprints_with_velocity_df, windows=windows)
+        state = RollingVelocityState.from_history(sprints_with_velocity_df, windows)
+        state.save(path)
+        return features_df, state
+
+    df = sprints_with_velocity_df.sort_values('start_date', kind='mergesort')
+    previous = previous_features_df.drop_duplicates('sprint_id', keep='last').set_index('sprint_id')[columns]
+    # Applied sprints without previous features (e.g. the table was rebuilt elsewhere): recompute their teams
+    keys = team_keys(df)
+    last_dates = pd.to_datetime(keys.map({key: team['last_start_date'] for key, team in state.teams.items()}))
+    applied = last_dates.notna() & (pd.to_datetime(df['start_date']) <= last_dates)
+    missing = applied & ~df['sprint_id'].isin(previous.index)
+
+    new_features = state.advance(df, rebuild=set(keys[missing]))
+    features = previous.reindex(df['sprint_id']).set_axis(df.index)
+    features.loc[new_features.index, columns] = new_features[columns]
+    logger.info(f"Computed historical features of {len(new_features)} sprint(s) from the rolling state; "
+                f"{len(df) - len(new_features)} kept from the previous table.")
+    state.save(path)
+    return df.assign(**{c: features[c].astype('float64') for c in columns}), state
+
+
+def fill_open_sprint_features(features_df, state):
+    """
+    Fills the historical features of sprints that are not closed yet from the state.
+
+    The batch features only exist for closed sprints; a sprint that starts after its team's
+    last closed sprint gets the team's current state.
+
+    Returns:
+        pd.DataFrame: `features_df` with the open sprints' historical features filled in.
+    """
+    if 'state' not in features_df.columns:
+        return features_df
+    df = features_df.copy()
+    keys = team_keys(df)
+    last_dates = pd.to_datetime(keys.map({key: team['last_start_date'] for key, team in state.teams.items()}))
+    is_open = (df['state'] != 'closed') & last_dates.notna() & (df['start_date'] > last_dates)
+    if not is_open.any():
+        return df
+    team_features = pd.DataFrame({key: state.features(key) for key in keys[is_open].unique()}).T
+    columns = [c for c in team_features.columns if c in df.columns]
+    df.loc[is_open, columns] = team_features.loc[keys[is_open], columns].to_numpy(dtype='float64')
+    logger.info(f"Filled historical features of {int(is_open.sum())} open sprints from the rolling state.")
+    return df
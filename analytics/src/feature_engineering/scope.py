@@ -0,0 +1,186 @@
+import logging
+import numpy as np
+import pandas as pd
+
+from src.data_processing.preprocessing import map_statuses
+
+logger = logging.getLogger(__name__)
+
+SCOPE_FILE = "sprint_scope.parquet"
+SCOPE_COLUMNS = ['planned_story_points', 'planned_issue_count', 'added_story_points', 'added_issue_count',
+                 'removed_story_points', 'removed_issue_count', 'carried_over_story_points']
+# Known when the sprint starts, so usable as model features; scope added/removed later is not
+START_SCOPE_COLUMNS = ['planned_story_points', 'planned_issue_count', 'carried_over_story_points']
+
+
+def parse_sprint_lists(values):
+    """
+    Flattens sprint field values ('12', '12, 13' or missing) into (row position, sprint id) pairs.
+
+    Each distinct value is parsed once, so a categorical column of millions of events costs
+    one split per category; the pairs are expanded with np.repeat.
+
+    Returns:
+        tuple: (rows, sprint_ids) int64 arrays, one entry per sprint of each row.
+    """
+    codes, uniques = pd.factorize(pd.Series(values), sort=False)
+    parsed = [[int(s) for s in str(v).split(',') if s.strip().isdigit()] for v in uniques]
+    lengths = np.array([len(p) for p in parsed] + [0], dtype=np.int64) # Code -1 (missing) has no sprints
+    flat = np.array([s for p in parsed for s in p], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(lengths)])[:-1]
+
+    row_lengths = lengths[codes]
+    rows = np.repeat(np.arange(len(codes), dtype=np.int64), row_lengths)
+    # Position of each pair within its row's list
+    within = np.arange(len(rows), dtype=np.int64) - np.repeat(np.cumsum(row_lengths) - row_lengths, row_lengths)
+    sprint_ids = flat[np.repeat(offsets[codes], row_lengths) + within] if len(rows) else flat[:0]
+    return rows, sprint_ids
+
+
+def sprint_membership_changes(issues_df, transitions_df):
+    """
+    Turns sprint field transitions into membership changes.
+
+    Each 'sprint' event adds the issue to the sprints only in its to-list (+1) and removes it
+    from those only in its from-list (-1). An issue belongs to the sprints of its first
+    event's from-list since its creation; an issue without sprint events belongs to its
+    current 'sprint_id' since its creation.
+
+    Returns:
+        pd.DataFrame: 'issue_id', 'sprint_id', 'timestamp' and 'delta' (+1 / -1), sorted by timestamp.
+    """
+    events = transitions_df[transitions_df['field'] == 'sprint']
+    events = events.sort_values(['issue_id', 'timestamp'], kind='mergesort', ignore_index=True)
+    issue = events['issue_id'].to_numpy(dtype=np.int64)
+    ts = events['timestamp'].to_numpy(dtype='datetime64[ns]')
+
+    from_rows, from_ids = parse_sprint_lists(events['from_status'])
+    to_rows, to_ids = parse_sprint_lists(events['to_status'])
+    # (event, sprint) pairs as single int64 keys to diff the two lists without a join
+    from_keys = (from_rows << 32) | from_ids
+    to_keys = (to_rows << 32) | to_ids
+    joined = ~np.isin(to_keys, from_keys)
+    left = ~np.isin(from_keys, to_keys)
+
+    created = pd.Series(pd.to_datetime(issues_df['created_date']).to_numpy(), index=issues_df['issue_id'].to_numpy())
+    first_event = np.r_[True, issue[1:] != issue[:-1]] if len(issue) else np.zeros(0, dtype=bool)
+    initial = first_event[from_rows]
+    initial_rows = from_rows[initial]
+    initial_ts = created.reindex(issue[initial_rows]).to_numpy(dtype='datetime64[ns]')
+    initial_ts = np.where(np.isnat(initial_ts) | (initial_ts > ts[initial_rows]), ts[initial_rows], initial_ts)
+
+    without_events = issues_df[~issues_df['issue_id'].isin(issue) & issues_df['sprint_id'].notna()]
+
+    changes = pd.DataFrame({
+        'issue_id': np.concatenate([issue[to_rows[joined]], issue[from_rows[left]], issue[initial_rows],
+                                    without_events['issue_id'].to_numpy(dtype=np.int64)]),
+        'sprint_id': np.concatenate([to_ids[joined], from_ids[left], from_ids[initial],
+                                     without_events['sprint_id'].to_numpy(dtype=np.int64)]),
+        'timestamp': np.concatenate([ts[to_rows[joined]], ts[from_rows[left]], initial_ts,
+                                     pd.to_datetime(without_events['created_date']).to_numpy(dtype='datetime64[ns]')]),
+        'delta': np.concatenate([np.ones(int(joined.sum()), dtype=np.int8), -np.ones(int(left.sum()), dtype=np.int8),
+                                 np.ones(len(initial_rows) + len(without_events), dtype=np.int8)]),
+    })
+    return changes.sort_values('timestamp', kind='mergesort', ignore_index=True)
+
+
+def calculate_sprint_scope(sprints_df, issues_df, transitions_df, status_mapping, as_of=None, sprint_ids=None):
+    """
+    Point-in-time scope of each sprint from the sprint field and status transitions.
+
+    Membership and status are read as of the sprint start (or `as_of` for sprints that have
+    not started) with sorted as-of joins, so scope added after the start does not count as
+    planned:
+      - planned: issues in the sprint at its start that were not done yet;
+      - added / removed: issues that joined / left the sprint while it ran (start to completion);
+      - carried over: planned points of issues that were in an earlier sprint before.
+
+    Story points are the issues' current ones. The result is a sum over issues, so the
+    scopes of disjoint issue batches add up (see merge_sprint_scope). Carried over points
+    depend on the other sprints of the issues, so pass all sprints in `sprints_df` and select
+    the ones to compute with `sprint_ids`.
+
+    Args:
+        sprints_df (pd.DataFrame): Sprints with 'sprint_id', 'start_date', 'end_date' (and 'completed_date').
+        issues_df (pd.DataFrame): Issues with 'issue_id', 'created_date', 'story_points', 'sprint_id'.
+        transitions_df (pd.DataFrame): Transitions of these issues ('field' 'status' and 'sprint').
+        status_mapping (dict): Status category mapping from the config.
+        as_of (pd.Timestamp, optional): Point in time of the data; defaults to now.
+        sprint_ids (iterable, optional): Sprints to return; defaults to all of `sprints_df`.
+
+    Returns:
+        pd.DataFrame: 'sprint_id' and SCOPE_COLUMNS, one row per sprint of `sprints_df` (or of `sprint_ids`).
+    """
+    as_of = (pd.Timestamp(as_of) if as_of is not None else pd.Timestamp.now()).to_datetime64()
+    sprints = sprints_df[['sprint_id', 'start_date']].copy()
+    end = sprints_df['completed_date'] if 'completed_date' in sprints_df.columns else sprints_df['end_date']
+    sprints['end'] = pd.to_datetime(end.fillna(sprints_df['end_date']))
+    sprints['sprint_id'] = sprints['sprint_id'].astype('int64')
+
+    # Changes of the given sprints only, with their sprint's dates (keeps the timestamp order)
+    changes = sprint_membership_changes(issues_df, transitions_df)
+    position = pd.Index(sprints['sprint_id']).get_indexer(changes['sprint_id'])
+    changes = changes[position >= 0].reset_index(drop=True)
+    position = position[position >= 0]
+    start = sprints['start_date'].to_numpy(dtype='datetime64[ns]')[position]
+    changes['start_date'] = start
+    ts = changes['timestamp'].to_numpy(dtype='datetime64[ns]')
+    during = (ts > start) & (ts < sprints['end'].to_numpy(dtype='datetime64[ns]')[position])
+
+    # (issue, sprint) as one int64 key: merge_asof is much faster with a single integer 'by' column
+    changes['pair'] = (changes['issue_id'].to_numpy(dtype=np.int64) << 32) | changes['sprint_id'].to_numpy(dtype=np.int64)
+
+    # Membership of every (issue, sprint) pair at the sprint start: the last change at or before it
+    pairs = changes.drop_duplicates('pair')[['pair', 'issue_id', 'sprint_id', 'start_date']].copy()
+    pairs['at'] = np.minimum(pairs['start_date'].to_numpy(dtype='datetime64[ns]'), as_of)
+    pairs = pd.merge_asof(pairs.sort_values('at', kind='mergesort'), changes[['pair', 'timestamp', 'delta']],
+                          left_on='at', right_on='timestamp', by='pair', direction='backward')
+    member = (pairs['delta'] == 1).to_numpy()
+
+    # Status at the same point in time: issues already done at the start are not planned scope
+    status = transitions_df.loc[transitions_df['field'] == 'status', ['issue_id', 'to_status', 'timestamp']]
+    status = status.assign(issue_id=status['issue_id'].astype('int64')).sort_values('timestamp', kind='mergesort')
+    at_start = pd.merge_asof(pairs[['issue_id', 'at']], status, left_on='at', right_on='timestamp',
+                             by='issue_id', direction='backward')
+    done = (map_statuses(at_start['to_status'], status_mapping) == 'done').to_numpy()
+    planned = member & ~done
+
+    # Carried over: the issue had joined a sprint that started earlier
+    first_start = pairs.groupby('issue_id')['start_date'].transform('min')
+    carried = planned & (first_start < pairs['start_date']).to_numpy()
+
+    points = pd.Series(pd.to_numeric(issues_df['story_points'], errors='coerce').to_numpy(dtype='float64'),
+                       index=issues_df['issue_id'].to_numpy())
+    pairs['story_points'] = points.reindex(pairs['issue_id'].to_numpy()).to_numpy()
+
+    def totals(mask, frame):
+        return frame[mask].groupby('sprint_id')['story_points'].agg(['sum', 'size'])
+
+    planned_totals = totals(planned, pairs)
+    carried_totals = totals(carried, pairs)
+    # Joined or left while the sprint ran; joins of issues already planned are not added scope
+    moved = changes.loc[during, ['pair', 'issue_id', 'sprint_id', 'delta']].drop_duplicates(['pair', 'delta'])
+    moved['story_points'] = points.reindex(moved['issue_id'].to_numpy()).to_numpy()
+    added_totals = totals((moved['delta'] == 1) & ~moved['pair'].isin(pairs.loc[planned, 'pair']), moved)
+    removed_totals = totals(moved['delta'] == -1, moved)
+
+    scope = pd.DataFrame({'sprint_id': sprints['sprint_id'].to_numpy()})
+    ids = scope['sprint_id']
+    scope['planned_story_points'] = ids.map(planned_totals['sum']).fillna(0.0)
+    scope['planned_issue_count'] = ids.map(planned_totals['size']).fillna(0).astype('int64')
+    scope['added_story_points'] = ids.map(added_totals['sum']).fillna(0.0)
+    scope['added_issue_count'] = ids.map(added_totals['size']).fillna(0).astype('int64')
+    scope['removed_story_points'] = ids.map(removed_totals['sum']).fillna(0.0)
+    scope['removed_issue_count'] = ids.map(removed_totals['size']).fillna(0).astype('int64')
+    scope['carried_over_story_points'] = ids.map(carried_totals['sum']).fillna(0.0)
+    if sprint_ids is not None:
+        scope = scope[scope['sprint_id'].isin(list(sprint_ids))].reset_index(drop=True)
+    return scope
+
+
+def merge_sprint_scope(partials):
+    """Sums per-sprint scopes computed over disjoint batches of issues."""
+    partials = [p for p in partials if not p.empty]
+    if not partials:
+        return pd.DataFrame(columns=['sprint_id'] + SCOPE_COLUMNS)
+    return pd.concat(partials, ignore_index=True).groupby('sprint_id', as_index=False)[SCOPE_COLUMNS].sum()
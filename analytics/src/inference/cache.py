@@ -0,0 +1,95 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded, thread-safe LRU cache whose entries expire `ttl` seconds after they were stored.
+
+    Beyond `maxsize` entries the least recently used one is evicted. Hits, misses, evictions
+    and expirations are counted for `stats()`.
+
+    Usage:
+        cache = TTLCache(maxsize=8, ttl=3600)
+        model = cache.get_or_set(('velocity_gbr', version), lambda: load(...))
+        cache.invalidate(lambda key: key[0] == 'velocity_gbr')
+    """
+
+    def __init__(self, maxsize=128, ttl=None, name="cache"):
+        self.maxsize = maxsize
+        self.ttl = ttl # None: no expiry
+        self.name = name
+        self._entries = OrderedDict() # key -> (expires_at, value), least recently used first
+        self._lock = threading.RLock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def _expired(self, expires_at):
+        return expires_at is not None and time.monotonic() >= expires_at
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING and self._expired(entry[0]):
+                del self._entries[key]
+                self.expirations += 1
+                entry = _MISSING
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_set(self, key, compute):
+        """The cached value of `key`, or the value of compute() (cached unless it is None)."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            if value is not None:
+                self.set(key, value)
+        return value
+
+    def invalidate(self, predicate=None):
+        """Drops the entries whose key matches `predicate` (all of them without one); returns how many."""
+        with self._lock:
+            keys = [k for k in self._entries if predicate is None or predicate(k)]
+            for key in keys:
+                del self._entries[key]
+        if keys:
+            logger.debug(f"Invalidated {len(keys)} entries of the {self.name} cache.")
+        return len(keys)
+
+    def clear(self):
+        self.invalidate()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Counters and size: {'hits', 'misses', 'hit_rate', 'evictions', 'expirations', 'size', 'maxsize'}."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+            }
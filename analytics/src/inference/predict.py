@@ -1,57 +1,138 @@
 import pandas as pd
 import numpy as np
-import joblib
 import logging
+import pyarrow.parquet as pq
 from pathlib import Path
 
 from src.utils.config import load_config
 # Need feature engineering functions to recreate features for new data
 from src.feature_engineering.features import generate_historical_velocity_features
+from src.feature_engineering.rolling_state import RollingVelocityState, ROLLING_STATE_FILE, team_key, team_keys
+from src.feature_engineering.feature_store import FeatureStore, PLANNED_FEATURES
+from src.inference.cache import TTLCache
+from src.modeling.registry import load_model, load_flat_model, model_name_for, model_paths, current_version
 
 logger = logging.getLogger(__name__)
 
-# Global cache for models/features to avoid reloading repeatedly if running server
-# In a script, this doesn't help much unless called multiple times
-_model_cache = {}
-_features_cache = {}
-_historical_data_cache = None
+DEFAULT_CACHE_SETTINGS = {'models_maxsize': 4, 'data_maxsize': 32, 'forecasts_maxsize': 10_000, 'ttl_seconds': 3600}
+CLOSED_SPRINTS_FILE = "closed_sprints_with_velocity.parquet"
 
-def load_model_and_features(model_name="velocity_gbr", config=None):
-    """Loads a trained model and its corresponding feature list."""
-    if model_name in _model_cache and model_name in _features_cache:
-         return _model_cache[model_name], _features_cache[model_name]
+# Caches for long-running processes (e.g. a server), created from inference.cache on first use:
+# models by version, inputs by project and file version, and predict_velocity results. Their
+# keys change when a new model or new data lands on disk; invalidate_model/invalidate_data drop
+# entries explicitly.
+_caches = None
 
+
+def _get_caches(config=None):
+    global _caches
+    if _caches is None:
+        settings = {**DEFAULT_CACHE_SETTINGS, **(((config or {}).get('inference') or {}).get('cache') or {})}
+        _caches = {name: TTLCache(settings[f"{name}_maxsize"], settings['ttl_seconds'], name)
+                   for name in ('models', 'data', 'forecasts')}
+    return _caches
+
+
+def cache_stats():
+    """Hit/miss statistics and sizes of the inference caches, by cache."""
+    return {name: cache.stats() for name, cache in _get_caches().items()}
+
+
+def clear_caches():
+    for cache in _get_caches().values():
+        cache.clear()
+
+
+def invalidate_model(model_name=None):
+    """Drops a model (or all models) and its forecasts from the caches, e.g. after a new version is saved."""
+    caches = _get_caches()
+    caches['models'].invalidate(lambda key: model_name is None or key[1] == model_name)
+    caches['forecasts'].invalidate(lambda key: model_name is None or key[0][1] == model_name)
+
+
+def invalidate_data(project_key=None):
+    """
+    Drops cached inputs and forecasts after new closed-sprint data lands: those of one project
+    (and the inputs shared by all projects), or everything.
+    """
+    caches = _get_caches()
+    caches['data'].invalidate(lambda key: project_key is None or key[0] != 'history' or key[-1] in (None, project_key))
+    caches['forecasts'].invalidate(lambda key: project_key is None or key[2] in (None, project_key))
+
+
+def _file_version(path):
+    """(path, modification time) of a file, or None if it does not exist: part of the cache keys."""
+    path = Path(path)
+    return (str(path), path.stat().st_mtime_ns) if path.exists() else None
+
+
+def _model_key(model_name, config):
+    """Cache key of the model's current version ((models_dir, model_name, version))."""
+    models_dir = config['paths']['models_dir']
+    version = current_version(models_dir, model_name)
+    if version is None: # Flat files saved before versioning
+        version = _file_version(model_paths(models_dir, model_name)['legacy_model'])
+    return (str(models_dir), model_name, version)
+
+
+def _data_version(config):
+    """File versions of the inputs forecasts are computed from."""
+    features_dir = Path(config['paths']['features_dir'])
+    store = FeatureStore.from_config(config)
+    return (_file_version(Path(config['paths']['processed_data_dir']) / CLOSED_SPRINTS_FILE),
+            _file_version(features_dir / ROLLING_STATE_FILE), _file_version(store.index_path))
+
+
+def _load_model_entry(model_key, config):
+    """
+    (model, feature list, manifest) of a model version, loaded once; None if it cannot be loaded.
+    With inference.flat_trees, tree ensembles are opened from their memory-mapped flat arrays
+    instead of being unpickled.
+    """
+    models_dir, model_name, version = model_key
+    use_flat_trees = (config.get('inference') or {}).get('flat_trees', True) and isinstance(version, str)
+
+    def load():
+        try:
+            if use_flat_trees:
+                try:
+                    model, features_list, meta = load_flat_model(models_dir, model_name, version)
+                    logger.info(f"Opened flat {meta['backend']} trees of model '{model_name}' "
+                                f"({meta['flat_trees']['n_trees']} trees, {len(features_list)} features).")
+                    return model, features_list, meta
+                except FileNotFoundError:
+                    pass # Not a tree ensemble, or saved before flat arrays: unpickle it
+            model, features_list, meta = load_model(models_dir, model_name, version if isinstance(version, str) else None)
+            logger.info(f"Loaded {meta['backend']} model '{model_name}' and features list ({len(features_list)} features).")
+            return model, features_list, meta
+        except FileNotFoundError as e:
+            logger.error(str(e))
+        except Exception as e:
+            logger.error(f"Error loading model or features list: {e}")
+        return None
+
+    return _get_caches(config)['models'].get_or_set(model_key, load)
+
+
+def load_model_and_features(model_name=None, config=None):
+    """
+    Loads a trained model and its corresponding feature list (see src.modeling.registry.load_model).
+    `model_name` defaults to the configured backend's model, e.g. 'velocity_gbr'.
+    """
     if config is None:
         config = load_config()
     if not config:
         logger.error("Configuration not loaded, cannot find model path.")
         return None, None
 
-    models_dir = Path(config['paths']['models_dir'])
-    model_path = models_dir / f"{model_name}_model.joblib"
-    features_list_path = models_dir / f"{model_name}_features.joblib"
-
-    if not model_path.exists() or not features_list_path.exists():
-        logger.error(f"Model '{model_path}' or features list '{features_list_path}' not found.")
-        return None, None
-
-    try:
-        model = joblib.load(model_path)
-        features_list = joblib.load(features_list_path)
-        logger.info(f"Loaded model from {model_path} and features list ({len(features_list)} features).")
-        _model_cache[model_name] = model
-        _features_cache[model_name] = features_list
-        return model, features_list
-    except Exception as e:
-        logger.error(f"Error loading model or features list: {e}")
-        return None, None
-
-def load_historical_data(config=None):
-    """Loads historical data needed for feature calculation during inference."""
-    global _historical_data_cache
-    if _historical_data_cache is not None:
-        return _historical_data_cache
+    entry = _load_model_entry(_model_key(model_name or model_name_for(config), config), config)
+    return (entry[0], entry[1]) if entry is not None else (None, None)
 
+def load_historical_data(config=None, project_key=None):
+    """
+    Loads historical data needed for feature calculation during inference: the closed sprints
+    of `project_key` (of all projects if None, or if the data has no project column), by date.
+    """
     if config is None:
         config = load_config()
     if not config:
@@ -59,33 +140,130 @@ def load_historical_data(config=None):
          return None
 
     processed_dir = Path(config['paths']['processed_data_dir'])
-    closed_sprints_path = processed_dir / "closed_sprints_with_velocity.parquet" # Needs actual velocity
+    closed_sprints_path = processed_dir / CLOSED_SPRINTS_FILE # Needs actual velocity
 
     if not closed_sprints_path.exists():
          logger.error(f"Historical closed sprints data not found at {closed_sprints_path}.")
          return None
 
-    try:
-         # Only load columns needed for historical feature generation
-         hist_df = pd.read_parquet(closed_sprints_path, columns=['sprint_id', 'start_date', 'actual_velocity'])
-         hist_df = hist_df.sort_values(by='start_date')
-         _historical_data_cache = hist_df
-         logger.info(f"Loaded historical velocity data: {len(hist_df)} sprints.")
-         return hist_df
-    except Exception as e:
-         logger.error(f"Error loading historical data: {e}")
-         return None
+    cache = _get_caches(config)['data']
+    key = ('history', _file_version(closed_sprints_path), project_key)
+    if project_key is not None:
+        def project_history():
+            hist_df = load_historical_data(config)
+            if hist_df is None or 'project_key' not in hist_df.columns:
+                return hist_df
+            return hist_df[hist_df['project_key'] == project_key]
+        return cache.get_or_set(key, project_history)
+
+    def load():
+        try:
+             # Only load columns needed for historical feature generation
+             available = pq.read_schema(closed_sprints_path).names
+             hist_df = pd.read_parquet(closed_sprints_path, columns=[
+                 c for c in ['project_key', 'sprint_id', 'start_date', 'actual_velocity'] if c in available])
+             hist_df = hist_df.sort_values(by='start_date')
+             logger.info(f"Loaded historical velocity data: {len(hist_df)} sprints.")
+             return hist_df
+        except Exception as e:
+             logger.error(f"Error loading historical data: {e}")
+             return None
 
+    return cache.get_or_set(key, load)
 
-def prepare_inference_features(sprint_input_data, historical_data, features_list):
+
+def load_rolling_state(config=None):
+    """Loads the rolling velocity state saved by feature building (None if there is none)."""
+    if config is None:
+        config = load_config()
+    if not config:
+        logger.error("Configuration not loaded, cannot find rolling state path.")
+        return None
+
+    path = Path(config['paths']['features_dir']) / ROLLING_STATE_FILE
+    if not path.exists():
+        return None
+
+    def load():
+        state = RollingVelocityState.load(path)
+        logger.info(f"Loaded rolling velocity state for {len(state.teams)} team(s).")
+        return state
+
+    return _get_caches(config)['data'].get_or_set(('rolling_state', _file_version(path)), load)
+
+
+def load_feature_store(config=None):
+    """Opens the feature store materialized by feature building (None if there is none)."""
+    if config is None:
+        config = load_config()
+    if not config:
+        logger.error("Configuration not loaded, cannot find the feature store.")
+        return None
+
+    store = FeatureStore.from_config(config)
+    if not store.exists():
+        return None
+    key = ('feature_store', _file_version(store.index_path), _file_version(store.values_path))
+    return _get_caches(config)['data'].get_or_set(key, lambda: store)
+
+def _feature_store_features(sprint_input_data, feature_store, features_list):
+    """
+    The stored features of a known sprint ('project_key' and 'sprint_id' in the input), as of
+    the input's 'as_of' or now; None if the sprint is not in the store.
+    """
+    if feature_store is None or sprint_input_data.get('sprint_id') is None:
+        return None
+    vector = feature_store.get_online_features(
+        sprint_input_data.get('project_key', ''), sprint_input_data['sprint_id'],
+        features=[f for f in features_list if f in feature_store.feature_columns],
+        as_of=sprint_input_data.get('as_of'),
+    )
+    if vector.isna().all(axis=None):
+        return None
+    return vector.iloc[0].to_dict()
+
+
+def _rolling_state_features(sprint_input_data, target_start_date, rolling_state):
+    """
+    Historical features of the sprint's team from the rolling state, or None if the state
+    cannot answer (no state, unknown team, or a sprint that starts before the team's last
+    closed sprint).
+    """
+    if rolling_state is None:
+        return None
+    if 'project_key' in sprint_input_data or 'board_id' in sprint_input_data:
+        key = team_key(sprint_input_data.get('project_key'), sprint_input_data.get('board_id'))
+    elif len(rolling_state.teams) == 1:
+        key = next(iter(rolling_state.teams)) # Single-team installation: the team is implied
+    else:
+        return None
+    last_start_date = rolling_state.last_start_date(key)
+    if last_start_date is None or last_start_date >= target_start_date:
+        return None
+    return rolling_state.features(key)
+
+
+def prepare_inference_features(sprint_input_data, historical_data, features_list, rolling_state=None,
+                               feature_store=None, fill_missing=True):
     """
     Prepares the feature vector for a single sprint prediction.
 
+    For a sprint in the feature store the vector is the stored one, i.e. the values training
+    used; planned features given in the input override the stored ones. Otherwise historical
+    features are read from the rolling state when it covers the sprint's team, or recomputed
+    from `historical_data`.
+
     Args:
         sprint_input_data (dict): Dict containing planned features for the sprint
-                                   (e.g., 'planned_story_points', 'planned_issue_count', 'start_date').
+                                   (e.g., 'planned_story_points', 'planned_issue_count',
+                                   'carried_over_story_points', 'start_date',
+                                   optionally 'project_key' and 'board_id').
         historical_data (pd.DataFrame): DataFrame of historical sprints with actual velocity, sorted by date.
         features_list (list): The ordered list of feature names the model expects.
+        rolling_state (RollingVelocityState, optional): Per-team state saved by feature building.
+        feature_store (FeatureStore, optional): Materialized features, used for inputs with a 'sprint_id'.
+        fill_missing (bool): Fill missing features with 0; False leaves them NaN for models that
+                             handle missing values.
 
     Returns:
         pd.DataFrame: A single-row DataFrame with features ready for prediction, or None if error.
@@ -98,38 +276,48 @@ def prepare_inference_features(sprint_input_data, historical_data, features_list
          logger.error("Missing 'start_date' in sprint_input_data.")
          return None
 
+    stored_features = _feature_store_features(sprint_input_data, feature_store, features_list)
+    if stored_features is not None:
+        feature_values = {**stored_features,
+                          **{f: sprint_input_data[f] for f in PLANNED_FEATURES if f in sprint_input_data}}
+        inference_df = pd.DataFrame([feature_values], columns=features_list)
+        # fillna(0) as below, for features the store does not have
+        return inference_df.fillna(0) if fill_missing else inference_df
+
+    state_features = _rolling_state_features(sprint_input_data, target_start_date, rolling_state)
+
     # Simulate adding the new sprint to calculate rolling features correctly
     # We need the LATEST historical features available BEFORE this sprint starts
-    relevant_history = historical_data[historical_data['start_date'] < target_start_date]
-    if relevant_history.empty:
+    if state_features is not None:
+        relevant_history = historical_data.iloc[0:0] # Not needed: the state has the features
+    else:
+        relevant_history = historical_data[historical_data['start_date'] < target_start_date]
+    if relevant_history.empty and state_features is None:
         logger.warning("No historical data available before the target sprint start date. Historical features will be NaN.")
         # Create a placeholder row with NaN velocity to calculate rolling features if needed
         # This might result in NaN features if min_periods isn't met
         last_known_velocity = np.nan
-    else:
+    elif not relevant_history.empty:
         # Use the velocity of the most recent historical sprint
         last_known_velocity = relevant_history['actual_velocity'].iloc[-1]
 
 
-    # Construct the feature row - start with planned features
-    feature_values = {
-        'planned_story_points': sprint_input_data.get('planned_story_points', 0),
-        'planned_issue_count': sprint_input_data.get('planned_issue_count', 0),
-         # Initialize historical features potentially with NaN
-        'avg_velocity_last_1_sprints': np.nan,
-        'avg_velocity_last_3_sprints': np.nan,
-        'avg_velocity_last_5_sprints': np.nan,
-        # Add other features if the model uses them
-    }
+    # Construct the feature row - the model's features, historical ones initialized with NaN
+    feature_values = dict.fromkeys(features_list, np.nan)
+    for feature in PLANNED_FEATURES: # Planned scope comes from the input (0 if not given)
+        feature_values[feature] = sprint_input_data.get(feature, 0)
 
+    if state_features is not None:
+        # O(1): the state already holds the features of the team's next sprint
+        feature_values.update(state_features)
     # Calculate rolling averages using relevant history
     # This simplified approach takes the latest values. A more robust way might
     # involve temporarily adding a row for the prediction sprint and recalculating.
-    if not relevant_history.empty:
+    elif not relevant_history.empty:
          hist_vel = relevant_history['actual_velocity']
-         if len(hist_vel) >= 1: feature_values['avg_velocity_last_1_sprints'] = hist_vel.iloc[-1] # Last actual velocity
-         if len(hist_vel) >= 1: feature_values['avg_velocity_last_3_sprints'] = hist_vel.rolling(window=3, min_periods=1).mean().iloc[-1]
-         if len(hist_vel) >= 1: feature_values['avg_velocity_last_5_sprints'] = hist_vel.rolling(window=5, min_periods=1).mean().iloc[-1]
+         for w in (1, 3, 5):
+             if f'avg_velocity_last_{w}_sprints' in feature_values:
+                 feature_values[f'avg_velocity_last_{w}_sprints'] = hist_vel.rolling(window=w, min_periods=1).mean().iloc[-1]
 
 
     # Create DataFrame with the exact columns expected by the model
@@ -142,11 +330,11 @@ def prepare_inference_features(sprint_input_data, historical_data, features_list
              return None
         # Ensure correct order - already done by specifying columns in DataFrame constructor
 
-        # Handle potential NaNs - model might need imputation strategy learned during training
-        # For GBR, it can sometimes handle NaNs, but explicit handling is safer.
-        # Simple strategy: fill with 0 or median/mean *learned from training data*
-        # For now, let's assume the model or preprocessing handles it, or fill with 0
-        inference_df.fillna(0, inplace=True) # Caution: Use a more principled imputation if needed
+        # Handle potential NaNs - backends that handle them (hist_gbr natively, the linear ones
+        # with the imputation learned in training) get them as they are.
+        # Otherwise fill with 0
+        if fill_missing:
+            inference_df.fillna(0, inplace=True) # Caution: Use a more principled imputation if needed
 
         logger.debug(f"Prepared inference DataFrame:\n{inference_df}")
         return inference_df
@@ -156,19 +344,151 @@ def prepare_inference_features(sprint_input_data, historical_data, features_list
          return None
 
 
-def predict_velocity(sprint_input_data, model_name="velocity_gbr"):
-    """Makes a velocity prediction for a given sprint's planned data."""
+def _input_team_keys(sprints_df, rolling_state):
+    """team_key of every input row (as _rolling_state_features), or None if the inputs do not name teams."""
+    if 'project_key' in sprints_df.columns or 'board_id' in sprints_df.columns:
+        return team_keys(sprints_df)
+    if len(rolling_state.teams) == 1:
+        return pd.Series(next(iter(rolling_state.teams)), index=sprints_df.index)
+    return None
+
+
+def prepare_batch_inference_features(sprints_df, historical_data, features_list, rolling_state=None,
+                                     feature_store=None, fill_missing=True):
+    """
+    Prepares the feature vectors of many sprints at once.
+
+    Each row gets the vector prepare_inference_features builds for it, from the same sources
+    in the same order of precedence (feature store, rolling state, history), but every source
+    is read once for the whole batch: one point-in-time lookup in the store, the state's
+    features once per team, and the history's rolling means once, with each sprint's latest
+    prior sprint found by a binary search on the sorted start dates.
+
+    Args:
+        sprints_df (pd.DataFrame): One row per sprint with 'start_date' and the planned features,
+                                   optionally 'project_key', 'board_id', 'sprint_id' and 'as_of'.
+                                   Missing (NaN) planned values do not override stored ones.
+        historical_data (pd.DataFrame): Historical sprints with actual velocity, sorted by date.
+        features_list (list): The ordered list of feature names the model expects.
+        rolling_state (RollingVelocityState, optional): Per-team state saved by feature building.
+        feature_store (FeatureStore, optional): Materialized features, used for rows with a 'sprint_id'.
+        fill_missing (bool): Fill missing features with 0 (see prepare_inference_features).
+
+    Returns:
+        pd.DataFrame: The features of each row (index of `sprints_df`, columns `features_list`).
+                      Rows without a start date are all NaN.
+    """
+    sprints = sprints_df.reset_index(drop=True)
+    target_start = pd.to_datetime(sprints['start_date'] if 'start_date' in sprints.columns
+                                  else pd.Series(pd.NaT, index=sprints.index))
+    has_start = target_start.notna().to_numpy()
+    historical_cols = [f for f in features_list if f not in PLANNED_FEATURES]
+    features = pd.DataFrame(np.nan, index=sprints.index, columns=features_list)
+
+    for feature in PLANNED_FEATURES: # Planned scope comes from the input (0 if not given)
+        if feature in features.columns:
+            features[feature] = sprints[feature].to_numpy(dtype=float) if feature in sprints.columns else 0.0
+
+    # History: the rolling means as of each historical sprint, read at the last one before each target
+    if historical_data is not None and not historical_data.empty:
+        history = historical_data
+        if not history['start_date'].is_monotonic_increasing:
+            history = history.sort_values('start_date', kind='mergesort')
+        velocity = history['actual_velocity'].reset_index(drop=True)
+        positions = np.searchsorted(history['start_date'].to_numpy(dtype='datetime64[ns]'),
+                                    target_start.to_numpy(dtype='datetime64[ns]'), side='left') - 1
+        found = has_start & (positions >= 0)
+        for w in (1, 3, 5):
+            column = f'avg_velocity_last_{w}_sprints'
+            if column in features.columns:
+                means = velocity.rolling(window=w, min_periods=1).mean().to_numpy()
+                features.loc[found, column] = means[positions[found]]
+
+    # Rolling state: replaces the historical features of sprints after their team's last closed one
+    keys = _input_team_keys(sprints, rolling_state) if rolling_state is not None else None
+    if keys is not None:
+        teams = keys.unique()
+        state_features = pd.DataFrame([rolling_state.features(k) for k in teams], index=teams)
+        last_start = pd.to_datetime(keys.map({k: rolling_state.last_start_date(k) for k in teams}))
+        use_state = (has_start & (last_start < target_start)).to_numpy()
+        features.loc[use_state, historical_cols] = (
+            state_features.reindex(columns=historical_cols).loc[keys[use_state]].to_numpy())
+
+    # Feature store: the stored vectors of known sprints, with the planned values of the input on top
+    if feature_store is not None and 'sprint_id' in sprints.columns:
+        known = has_start & sprints['sprint_id'].notna().to_numpy()
+        store_features = [f for f in features_list if f in feature_store.feature_columns]
+        if known.any():
+            requests = pd.DataFrame({
+                'project_key': (sprints['project_key'].fillna('').astype(str) if 'project_key' in sprints.columns
+                                else ''),
+                'sprint_id': sprints['sprint_id'],
+            })[known]
+            now = pd.Timestamp.now()
+            requests['as_of'] = (pd.to_datetime(sprints.loc[known, 'as_of']).fillna(now)
+                                 if 'as_of' in sprints.columns else now)
+            stored = feature_store.lookup(requests, features=store_features)[store_features]
+            stored.index = requests.index
+            stored = stored[stored.notna().any(axis=1)]
+            planned = [f for f in PLANNED_FEATURES if f in features.columns and f in sprints.columns]
+            overrides = sprints.loc[stored.index, planned]
+            vectors = pd.DataFrame(np.nan, index=stored.index, columns=features_list)
+            vectors[store_features] = stored
+            vectors[planned] = overrides.where(overrides.notna(), vectors[planned])
+            features.loc[stored.index] = vectors
+
+    features.loc[~has_start] = np.nan
+    no_history = has_start & features[historical_cols].isna().all(axis=1).to_numpy()
+    if historical_cols and no_history.any():
+        logger.warning(f"No historical data available for {int(no_history.sum())} sprint(s). "
+                       f"Their historical features will be NaN.")
+    if not has_start.all():
+        logger.warning(f"{int((~has_start).sum())} sprint(s) without a 'start_date'; they are not predicted.")
+    if fill_missing:
+        features.loc[has_start] = features.loc[has_start].fillna(0)
+    features.index = sprints_df.index
+    return features
+
+
+def _input_key(sprint_input_data):
+    return tuple(sorted((k, str(v)) for k, v in sprint_input_data.items()))
+
+
+def predict_velocity(sprint_input_data, model_name=None, config=None):
+    """
+    Makes a velocity prediction for a given sprint's planned data (with the configured model by default).
+    Predictions are memoized per model version, input data version and sprint input.
+    """
     logger.info(f"Received prediction request for sprint starting: {sprint_input_data.get('start_date')}")
+    if config is None:
+        config = load_config()
+    if not config:
+        logger.error("Configuration not loaded, cannot predict.")
+        return None
+
+    model_key = _model_key(model_name or model_name_for(config), config)
+    project_key = sprint_input_data.get('project_key')
+    forecast_key = (model_key, _data_version(config), project_key, _input_key(sprint_input_data))
+    forecasts = _get_caches(config)['forecasts']
+    predicted_velocity = forecasts.get(forecast_key)
+    if predicted_velocity is not None:
+        logger.info(f"Predicted velocity: {predicted_velocity:.2f} (cached)")
+        return predicted_velocity
 
-    model, features_list = load_model_and_features(model_name=model_name)
-    if model is None or features_list is None:
+    entry = _load_model_entry(model_key, config)
+    if entry is None:
         return None # Error already logged
+    model, features_list, meta = entry
 
-    historical_data = load_historical_data()
+    historical_data = load_historical_data(config, project_key)
     if historical_data is None:
         return None # Error already logged
 
-    inference_features_df = prepare_inference_features(sprint_input_data, historical_data, features_list)
+    rolling_state = load_rolling_state(config)
+    feature_store = load_feature_store(config)
+    inference_features_df = prepare_inference_features(sprint_input_data, historical_data, features_list,
+                                                       rolling_state, feature_store,
+                                                       fill_missing=not meta.get('handles_nan', False))
     if inference_features_df is None:
         logger.error("Failed to prepare features for inference.")
         return None
@@ -177,11 +497,69 @@ def predict_velocity(sprint_input_data, model_name="velocity_gbr"):
         prediction = model.predict(inference_features_df)
         predicted_velocity = prediction[0] # Get the scalar value
         logger.info(f"Predicted velocity: {predicted_velocity:.2f}")
+        forecasts.set(forecast_key, predicted_velocity)
         return predicted_velocity
     except Exception as e:
         logger.error(f"Error during model prediction: {e}")
         return None
 
+
+def predict_velocity_batch(sprints_df, model_name=None, config=None):
+    """
+    Predicts the velocity of many sprints (e.g. every upcoming sprint of every project) with one
+    model call. Each row is predicted as predict_velocity would predict it; the features are
+    prepared once per project (with that project's history). Batch results are not memoized.
+
+    Args:
+        sprints_df (pd.DataFrame): One row per sprint (see prepare_batch_inference_features).
+        model_name (str, optional): Defaults to the configured backend's model.
+        config (dict, optional): Loaded configuration.
+
+    Returns:
+        pd.Series: 'predicted_velocity' of each row (index of `sprints_df`; NaN for rows without a
+                   start date), or None on error.
+    """
+    logger.info(f"Received batch prediction request for {len(sprints_df)} sprints")
+    if config is None:
+        config = load_config()
+    if not config:
+        logger.error("Configuration not loaded, cannot predict.")
+        return None
+
+    entry = _load_model_entry(_model_key(model_name or model_name_for(config), config), config)
+    if entry is None:
+        return None # Error already logged
+    model, features_list, meta = entry
+
+    sprints = sprints_df.reset_index(drop=True)
+    if 'project_key' in sprints.columns:
+        projects = sprints.groupby('project_key', dropna=False, sort=False)
+    else:
+        projects = [(None, sprints)]
+    rolling_state, feature_store = load_rolling_state(config), load_feature_store(config)
+    parts = []
+    for project_key, rows in projects:
+        historical_data = load_historical_data(config, None if pd.isna(project_key) else project_key)
+        if historical_data is None:
+            return None # Error already logged
+        parts.append(prepare_batch_inference_features(rows, historical_data, features_list, rolling_state,
+                                                      feature_store, fill_missing=not meta.get('handles_nan', False)))
+    features_df = pd.concat(parts).sort_index() if parts else pd.DataFrame(columns=features_list)
+
+    predictions = np.full(len(sprints), np.nan)
+    has_start = pd.to_datetime(sprints['start_date']).notna().to_numpy() if 'start_date' in sprints.columns \
+        else np.zeros(len(sprints), dtype=bool)
+    if not has_start.any():
+        return pd.Series(predictions, index=sprints_df.index, name='predicted_velocity')
+
+    try:
+        predictions[has_start] = model.predict(features_df[has_start]) # One call for the whole batch
+        logger.info(f"Predicted velocity for {int(has_start.sum())} sprints")
+        return pd.Series(predictions, index=sprints_df.index, name='predicted_velocity')
+    except Exception as e:
+        logger.error(f"Error during model prediction: {e}")
+        return None
+
 if __name__ == '__main__':
     from src.utils.logging_config import setup_logging
     setup_logging()
@@ -192,7 +570,7 @@ if __name__ == '__main__':
     hist_data = load_historical_data()
     if hist_data is not None and not hist_data.empty:
         last_sprint_start = hist_data['start_date'].max()
-        next_sprint_start = last_sprint_start + timedelta(days=14) # Assume next sprint starts right after
+        next_sprint_start = last_sprint_start + pd.Timedelta(days=14) # Assume next sprint starts right after
 
         sprint_to_predict = {
             "start_date": next_sprint_start.strftime("%Y-%m-%d"), # Crucial for historical feature calculation
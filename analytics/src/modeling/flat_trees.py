@@ -0,0 +1,208 @@
+import logging
+import numpy as np
+from pathlib import Path
+from sklearn.dummy import DummyRegressor
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor
+
+logger = logging.getLogger(__name__)
+
+FLAT_TREES_DIR = "trees"
+ARRAY_NAMES = ('feature', 'threshold', 'left', 'right', 'value', 'missing_left', 'roots', 'depths')
+LEAF = -1 # Children of leaves in the exported trees, before compile_children makes them point at the leaf
+PREDICT_CHUNK_CELLS = 1 << 15 # Rows x trees traversed at once: bounds the memory, and keeps it in cache
+# Losses whose raw prediction is the prediction (identity link)
+_IDENTITY_LINK_LOSSES = ('squared_error', 'absolute_error', 'huber', 'quantile')
+
+
+def _export_gbr(model):
+    if model.init_ == 'zero':
+        baseline = 0.0
+    elif isinstance(model.init_, DummyRegressor):
+        baseline = float(np.ravel(model.init_.constant_)[0])
+    else:
+        return None # Custom init estimator
+    trees = [estimator.tree_ for estimator in model.estimators_[:, 0]]
+    nodes = [(t.feature, t.threshold, t.children_left, t.children_right, t.value[:, 0, 0] * model.learning_rate,
+              np.zeros(t.node_count, dtype=bool)) for t in trees]
+    # sklearn's trees compare float32 features with the thresholds
+    return nodes, {'baseline': baseline, 'x_dtype': 'float32'}
+
+
+def _export_hist_gbr(model):
+    predictors = [iteration[0] for iteration in model._predictors]
+    if model.loss not in _IDENTITY_LINK_LOSSES or any(p.nodes['is_categorical'].any() for p in predictors):
+        return None
+    nodes = []
+    for predictor in predictors:
+        n = predictor.nodes
+        is_leaf = n['is_leaf'].astype(bool)
+        # Leaf values already include the learning rate
+        nodes.append((np.where(is_leaf, 0, n['feature_idx']), n['num_threshold'],
+                      np.where(is_leaf, LEAF, n['left'].astype(np.int64)),
+                      np.where(is_leaf, LEAF, n['right'].astype(np.int64)),
+                      np.where(is_leaf, n['value'], 0.0), n['missing_go_to_left'].astype(bool)))
+    return nodes, {'baseline': float(np.ravel(model._baseline_prediction)[0]), 'x_dtype': 'float64'}
+
+
+def compile_children(left, right, roots):
+    """
+    Points the children of every leaf at the leaf itself, so that enough steps of "go to the
+    left or right child" take every row of every tree to its leaf, with no leaf test, and
+    orders the trees by decreasing depth, so that the trees still being walked at a level are
+    a prefix of them.
+
+    Returns:
+        tuple: (left, right, roots, depths), roots and depths in that order.
+    """
+    left, right, roots = np.asarray(left), np.asarray(right), np.asarray(roots)
+    depths = np.zeros(len(roots), dtype=np.int32)
+    frontier, trees = roots, np.arange(len(roots))
+    while len(frontier): # One level of all trees per pass
+        children = np.concatenate([left[frontier], right[frontier]])
+        trees = np.concatenate([trees, trees])[children != LEAF]
+        frontier = children[children != LEAF]
+        depths[np.unique(trees)] += 1
+    order = np.argsort(-depths, kind='stable')
+    nodes = np.arange(len(left), dtype=left.dtype)
+    return (np.where(left == LEAF, nodes, left), np.where(right == LEAF, nodes, right),
+            roots[order], depths[order])
+
+
+def export_flat_trees(model):
+    """
+    Compiles a fitted gradient boosting regressor into contiguous node arrays.
+
+    The nodes of all trees are concatenated: 'feature', 'threshold', 'left' and 'right' (global
+    node indices; a leaf's children are the leaf itself), 'value' (leaf contributions, learning
+    rate included) and 'missing_left' (where NaN goes), plus the root node and depth of each
+    tree in 'roots' and 'depths' (deepest trees first). A row goes left when its feature value
+    is <= the threshold.
+
+    Returns:
+        tuple: (arrays dict, meta dict with 'baseline', 'x_dtype', 'n_features', 'n_trees',
+               'n_nodes' and 'max_depth'), or None for models that cannot be flattened (other
+               model types, custom init estimators, non-identity links, categorical splits).
+    """
+    if isinstance(model, GradientBoostingRegressor):
+        exported = _export_gbr(model)
+    elif isinstance(model, HistGradientBoostingRegressor):
+        exported = _export_hist_gbr(model)
+    else:
+        exported = None
+    if exported is None:
+        return None
+
+    nodes, meta = exported
+    sizes = np.array([len(tree[0]) for tree in nodes], dtype=np.int64)
+    roots = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+
+    def offset_children(children, root): # Local child indices -> global ones
+        children = np.asarray(children, dtype=np.int64)
+        return np.where(children == LEAF, LEAF, children + root)
+
+    arrays = {
+        'feature': np.concatenate([tree[0] for tree in nodes]).astype(np.int32),
+        'threshold': np.concatenate([tree[1] for tree in nodes]).astype(np.float64),
+        'left': np.concatenate([offset_children(tree[2], root) for tree, root in zip(nodes, roots)]).astype(np.int32),
+        'right': np.concatenate([offset_children(tree[3], root) for tree, root in zip(nodes, roots)]).astype(np.int32),
+        'value': np.concatenate([tree[4] for tree in nodes]).astype(np.float64),
+        'missing_left': np.concatenate([tree[5] for tree in nodes]).astype(bool),
+        'roots': roots,
+    }
+    # Leaves have feature -2 in sklearn's trees: any valid column index will do
+    arrays['feature'][arrays['left'] == LEAF] = 0
+    arrays['left'], arrays['right'], arrays['roots'], arrays['depths'] = compile_children(
+        arrays['left'], arrays['right'], roots)
+    meta.update(n_features=int(model.n_features_in_), n_trees=len(nodes), n_nodes=int(sizes.sum()),
+                max_depth=int(arrays['depths'].max(initial=0)))
+    return arrays, meta
+
+
+def save_flat_trees(arrays, directory):
+    """Writes the arrays as .npy files (which np.load can memory-map) into `directory`."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for name in ARRAY_NAMES:
+        np.save(directory / f"{name}.npy", np.ascontiguousarray(arrays[name]))
+
+
+class FlatTreeEnsemble:
+    """
+    Predicts with the flat arrays of a gradient boosting regressor (see export_flat_trees).
+
+    All trees are traversed at once: a (rows x trees) matrix of node indices moves one level
+    down per step (in the trees deeper than that level), then the leaf values are summed per
+    row. This skips
+    sklearn's per-call input validation, which dominates single-row and small-batch calls
+    (about 10x faster for a single row). Large batches are slower than sklearn's compiled
+    traversal: it visits one node per row and tree, this visits max_depth. Predictions match
+    sklearn's up to the order of the floating point sum.
+
+    Saved arrays are memory-mapped read-only on the first predict, so opening a model costs
+    nothing until it is used and processes serving the same model share its pages through the
+    OS page cache instead of each holding an unpickled copy.
+
+    Usage:
+        model = FlatTreeEnsemble(version_dir / FLAT_TREES_DIR, manifest['flat_trees'])
+        y_pred = model.predict(features_df[manifest['features']])
+    """
+
+    def __init__(self, directory=None, meta=None, arrays=None):
+        self.directory = Path(directory) if directory is not None else None
+        self.meta = meta
+        self._arrays = arrays
+
+    @classmethod
+    def from_model(cls, model):
+        """An in-memory ensemble of a fitted model, or None if it cannot be flattened."""
+        exported = export_flat_trees(model)
+        return cls(meta=exported[1], arrays=exported[0]) if exported is not None else None
+
+    @property
+    def arrays(self):
+        if self._arrays is None:
+            compiled = 'max_depth' in self.meta # Saved before compile_children otherwise
+            # Base-class views of the maps: no copy, and no memmap overhead on every indexing
+            arrays = {name: np.asarray(np.load(self.directory / f"{name}.npy", mmap_mode='r'))
+                      for name in ARRAY_NAMES if compiled or name != 'depths'}
+            if not compiled:
+                arrays['left'], arrays['right'], arrays['roots'], arrays['depths'] = compile_children(
+                    arrays['left'], arrays['right'], arrays['roots'])
+                self.meta['max_depth'] = int(arrays['depths'].max(initial=0))
+            self._arrays = arrays
+            logger.debug(f"Memory-mapped {self.meta['n_nodes']} tree nodes from {self.directory}")
+        return self._arrays
+
+    @property
+    def n_features_in_(self):
+        return self.meta['n_features']
+
+    def predict(self, X):
+        """Predictions for the rows of X (DataFrame or array with the model's features in order)."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.meta['n_features']:
+            raise ValueError(f"Expected {self.meta['n_features']} features, got input of shape {X.shape}")
+        # Compared as sklearn compares them (float32 inputs for GradientBoostingRegressor's trees)
+        X = X.astype(self.meta['x_dtype'], copy=False).astype(np.float64, copy=False)
+        a = self.arrays
+        roots = a['roots']
+        # Trees still walked at each level: a prefix, as the trees are ordered by decreasing depth
+        n_active = np.searchsorted(-a['depths'], -np.arange(self.meta['max_depth']), side='left')
+        has_nan = np.isnan(X).any()
+        predictions = np.empty(len(X))
+        chunk = max(1, PREDICT_CHUNK_CELLS // max(1, len(roots)))
+        for start in range(0, len(X), chunk):
+            X_chunk = X[start:start + chunk]
+            # Flat indices into X_chunk: row offset + feature of the row's current node in each tree
+            row_offsets = (np.arange(len(X_chunk)) * X.shape[1])[:, None]
+            x_values = X_chunk.ravel()
+            node = np.tile(roots.astype(np.intp), (len(X_chunk), 1))
+            for n in n_active:
+                current = node[:, :n]
+                x = x_values.take(row_offsets + a['feature'].take(current))
+                go_left = x <= a['threshold'].take(current)
+                if has_nan:
+                    go_left = np.where(np.isnan(x), a['missing_left'].take(current), go_left)
+                node[:, :n] = np.where(go_left, a['left'].take(current), a['right'].take(current))
+            predictions[start:start + chunk] = self.meta['baseline'] + a['value'].take(node).sum(axis=1)
+        return predictions
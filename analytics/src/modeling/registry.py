@@ -0,0 +1,253 @@
+import io
+import json
+import shutil
+import hashlib
+import logging
+import joblib
+import pandas as pd
+from pathlib import Path
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import Ridge, QuantileRegressor
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from src.modeling.flat_trees import FLAT_TREES_DIR, FlatTreeEnsemble, export_flat_trees, save_flat_trees
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = "gbr"
+CURRENT_FILE = "CURRENT" # Names the current version of a model
+MANIFEST_FILE = "manifest.json"
+VERSION_LENGTH = 16 # Hex digits of the content hash
+
+
+class ModelBackend:
+    """
+    A model type the velocity model can be trained with.
+
+    Args:
+        name (str): Name used in the config (velocity_model.backend) and in the model file names.
+        factory (callable): Builds an unfitted estimator from its parameters.
+        default_params (dict): Parameters the configured ones are applied over.
+        handles_nan (bool): Whether the estimator accepts missing feature values (natively or
+            by imputing what it learned in training); if not, they are filled with 0.
+        size_param (str, optional): For ensembles that can grow with warm_start, the parameter
+            with their number of stages ('n_estimators', 'max_iter').
+    """
+
+    def __init__(self, name, factory, default_params=None, handles_nan=False, size_param=None):
+        self.name = name
+        self.factory = factory
+        self.default_params = default_params or {}
+        self.handles_nan = handles_nan
+        self.size_param = size_param
+
+    @property
+    def supports_warm_start(self):
+        return self.size_param is not None
+
+    def create(self, params=None):
+        """An unfitted estimator with the default parameters updated by `params`."""
+        return self.factory(**{**self.default_params, **(params or {})})
+
+
+_BACKENDS = {}
+
+
+def register_backend(backend):
+    """Adds a backend to the registry (replacing one with the same name)."""
+    _BACKENDS[backend.name] = backend
+    return backend
+
+
+def get_backend(name):
+    """The registered backend called `name`; raises ValueError for an unknown one."""
+    try:
+        return _BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown model backend '{name}'. Available: {sorted(_BACKENDS)}") from None
+
+
+def available_backends():
+    return sorted(_BACKENDS)
+
+
+def _linear(**params):
+    return make_pipeline(SimpleImputer(strategy='median'), StandardScaler(), Ridge(**params))
+
+
+def _quantile(**params):
+    return make_pipeline(SimpleImputer(strategy='median'), StandardScaler(), QuantileRegressor(**params))
+
+
+register_backend(ModelBackend("gbr", GradientBoostingRegressor, {'random_state': 0}, size_param='n_estimators'))
+# Bins the features into histograms: much faster on large training sets, and splits on missing values
+register_backend(ModelBackend("hist_gbr", HistGradientBoostingRegressor, {'random_state': 0}, handles_nan=True,
+                              size_param='max_iter'))
+# Baselines; missing values are imputed with the training medians
+register_backend(ModelBackend("linear", _linear, handles_nan=True))
+register_backend(ModelBackend("quantile", _quantile, {'quantile': 0.5, 'alpha': 0.0, 'solver': 'highs'},
+                              handles_nan=True))
+
+
+def configured_backend(config):
+    """The backend selected by velocity_model.backend (default 'gbr')."""
+    return get_backend((config.get('velocity_model') or {}).get('backend') or DEFAULT_BACKEND)
+
+
+def model_name_for(config):
+    """Name of the configured velocity model's files, e.g. 'velocity_gbr'."""
+    return f"velocity_{configured_backend(config).name}"
+
+
+def model_paths(models_dir, model_name):
+    """
+    The files of a saved model: the directory of its versions and the pointer to the current
+    one. Models saved before versioning are flat files ('legacy_model', 'legacy_features', 'legacy_meta').
+    """
+    models_dir = Path(models_dir)
+    return {
+        'versions': models_dir / model_name,
+        'current': models_dir / model_name / CURRENT_FILE,
+        'legacy_model': models_dir / f"{model_name}_model.joblib",
+        'legacy_features': models_dir / f"{model_name}_features.joblib",
+        'legacy_meta': models_dir / f"{model_name}_meta.json",
+    }
+
+
+def _write_atomic(path, data):
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_bytes(data)
+    tmp_path.replace(path)
+
+
+def save_model(models_dir, model_name, model, features, backend, metadata=None):
+    """
+    Saves a trained model as a new immutable version and makes it the current one.
+
+    Every backend shares this contract: a version is a directory named after the content
+    hash of the serialized estimator and its ordered feature list, holding `model.joblib`,
+    `features.joblib` and `manifest.json` (backend, features and the training `metadata`,
+    e.g. training window, sprint ids, CV metrics and data hash). Saving identical content again reuses
+    the existing version. The `CURRENT` file next to the versions names the current one.
+    Tree ensembles are also saved as flat arrays under `trees/` (see load_flat_model).
+
+    Returns:
+        Path: The model file of the version.
+    """
+    features = list(features)
+    model_buffer, features_buffer = io.BytesIO(), io.BytesIO()
+    joblib.dump(model, model_buffer)
+    joblib.dump(features, features_buffer)
+    digest = hashlib.sha256(model_buffer.getvalue())
+    digest.update(features_buffer.getvalue())
+    version = digest.hexdigest()[:VERSION_LENGTH]
+
+    paths = model_paths(models_dir, model_name)
+    version_dir = paths['versions'] / version
+    if version_dir.exists():
+        logger.info(f"Model '{model_name}' version {version} already exists; not rewriting it.")
+    else:
+        flat_trees = export_flat_trees(model)
+        manifest = {
+            'version': version,
+            'model_name': model_name,
+            'backend': backend.name,
+            'handles_nan': backend.handles_nan,
+            'features': features,
+            'created_at': pd.Timestamp.now().isoformat(),
+            **(metadata or {}),
+        }
+        if flat_trees is not None:
+            manifest['flat_trees'] = flat_trees[1]
+        # Written in full under a temporary name first: a version directory is never partial
+        tmp_dir = paths['versions'] / f".{version}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+        (tmp_dir / "model.joblib").write_bytes(model_buffer.getvalue())
+        (tmp_dir / "features.joblib").write_bytes(features_buffer.getvalue())
+        if flat_trees is not None:
+            save_flat_trees(flat_trees[0], tmp_dir / FLAT_TREES_DIR)
+        (tmp_dir / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2, default=str))
+        tmp_dir.rename(version_dir)
+        logger.info(f"Saved model '{model_name}' version {version} to {version_dir}")
+    set_current_version(models_dir, model_name, version)
+    return version_dir / "model.joblib"
+
+
+def set_current_version(models_dir, model_name, version):
+    """Points the model's CURRENT file at an existing version (e.g. to roll back)."""
+    paths = model_paths(models_dir, model_name)
+    if not (paths['versions'] / version / MANIFEST_FILE).exists():
+        raise FileNotFoundError(f"Model '{model_name}' has no version {version} in {paths['versions']}")
+    _write_atomic(paths['current'], f"{version}\n".encode())
+
+
+def current_version(models_dir, model_name):
+    """The current version of the model, or None if it has no versions."""
+    current = model_paths(models_dir, model_name)['current']
+    return current.read_text().strip() if current.exists() else None
+
+
+def list_versions(models_dir, model_name):
+    """Manifests of the model's versions, oldest first."""
+    versions_dir = model_paths(models_dir, model_name)['versions']
+    manifests = [json.loads(p.read_text()) for p in versions_dir.glob(f"*/{MANIFEST_FILE}")
+                 if not p.parent.name.startswith('.')] # Not the temporary directory of an interrupted save
+    return sorted(manifests, key=lambda m: m.get('created_at', ''))
+
+
+def load_model(models_dir, model_name, version=None):
+    """
+    Loads a model saved by save_model: the given version, or the current one.
+
+    Without versions, falls back to the flat files saved before versioning; those without a
+    metadata file are GradientBoostingRegressors.
+
+    Returns:
+        tuple: (model, feature list, manifest dict). Raises FileNotFoundError if there is no such model.
+    """
+    paths = model_paths(models_dir, model_name)
+    version = version or current_version(models_dir, model_name)
+    if version is not None:
+        version_dir = paths['versions'] / version
+        if not (version_dir / MANIFEST_FILE).exists():
+            raise FileNotFoundError(f"Model '{model_name}' has no version {version} in {paths['versions']}")
+        manifest = json.loads((version_dir / MANIFEST_FILE).read_text())
+        return joblib.load(version_dir / "model.joblib"), joblib.load(version_dir / "features.joblib"), manifest
+
+    if not paths['legacy_model'].exists() or not paths['legacy_features'].exists():
+        raise FileNotFoundError(f"Model '{model_name}' not found in {Path(models_dir)} "
+                                f"(no {paths['current']} or {paths['legacy_model']}).")
+    model = joblib.load(paths['legacy_model'])
+    features = joblib.load(paths['legacy_features'])
+    if paths['legacy_meta'].exists():
+        with open(paths['legacy_meta'], 'r') as f:
+            meta = json.load(f)
+    else:
+        meta = {'backend': DEFAULT_BACKEND, 'handles_nan': get_backend(DEFAULT_BACKEND).handles_nan}
+    return model, features, meta
+
+
+def load_flat_model(models_dir, model_name, version=None):
+    """
+    Opens the flat tree arrays of a model version (the current one by default) without
+    unpickling the estimator: only the manifest is read, and the arrays are memory-mapped on
+    the first predict. Opening many models is cheap, and processes serving the same version
+    share its memory.
+
+    Returns:
+        tuple: (FlatTreeEnsemble, feature list, manifest dict). Raises FileNotFoundError if the
+               version has no flat arrays (not a tree ensemble, or saved before they existed).
+    """
+    paths = model_paths(models_dir, model_name)
+    version = version or current_version(models_dir, model_name)
+    manifest_path = paths['versions'] / str(version) / MANIFEST_FILE
+    if version is None or not manifest_path.exists():
+        raise FileNotFoundError(f"Model '{model_name}' has no version {version} in {paths['versions']}")
+    manifest = json.loads(manifest_path.read_text())
+    if 'flat_trees' not in manifest:
+        raise FileNotFoundError(f"Model '{model_name}' version {version} has no flat tree arrays.")
+    model = FlatTreeEnsemble(paths['versions'] / version / FLAT_TREES_DIR, manifest['flat_trees'])
+    return model, manifest['features'], manifest
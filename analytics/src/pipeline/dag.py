@@ -0,0 +1,247 @@
+import json
+import time
+import hashlib
+import logging
+import importlib
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1 << 20
+
+
+class Stage:
+    """
+    One step of the pipeline.
+
+    Args:
+        name (str): Unique stage name.
+        func (callable): Called as func(config); must write every path in `outputs`.
+        inputs (list): Files or directories the stage reads.
+        outputs (list): Files or directories the stage writes. Stages without outputs always run.
+        config_sections (list[str]): Config sections the stage depends on: top-level keys, or dotted
+            paths to nested values (e.g. 'velocity_model.feature_windows').
+        code (list[str]): Modules whose source is part of the stage's cache key (func's module is always included).
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=(), config_sections=(), code=()):
+        self.name = name
+        self.func = func
+        self.inputs = [Path(p) for p in inputs]
+        self.outputs = [Path(p) for p in outputs]
+        self.config_sections = list(config_sections)
+        self.code = [func.__module__, *code]
+
+    def __repr__(self):
+        return f"Stage({self.name!r})"
+
+
+def config_value(config, section):
+    """The value of a top-level config section or of a dotted path into it (None if missing)."""
+    value = config
+    for key in section.split('.'):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+class FileHasher:
+    """SHA-256 of files and directories, memoized by (path, size, mtime) across runs."""
+
+    def __init__(self, memo=None):
+        self.memo = memo if memo is not None else {}
+
+    def hash_file(self, path):
+        stat = path.stat()
+        key = str(path.resolve())
+        signature = [stat.st_size, stat.st_mtime_ns]
+        cached = self.memo.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        self.memo[key] = [signature, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def hash_path(self, path):
+        """Hash of a file, of a directory tree (relative names and contents), or None if missing."""
+        path = Path(path)
+        if path.is_file():
+            return self.hash_file(path)
+        if path.is_dir():
+            digest = hashlib.sha256()
+            for file in sorted(p for p in path.rglob('*') if p.is_file()):
+                digest.update(str(file.relative_to(path)).encode())
+                digest.update(self.hash_file(file).encode())
+            return digest.hexdigest()
+        return None
+
+
+class Pipeline:
+    """
+    Runs stages in dependency order and skips the ones whose outputs are current.
+
+    A stage depends on every stage that writes one of its inputs. Its cache key hashes the
+    contents of its inputs, its config sections and the source of its code modules; a stage
+    is skipped when the key matches the one recorded on its last successful run and its
+    outputs still have the recorded contents. Stages whose dependencies are done run
+    concurrently in a thread pool.
+
+    The state (cache keys, output hashes and the file hash memo) is kept in `state_path`.
+    """
+
+    def __init__(self, stages, config, state_path, max_workers=None):
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Stage names must be unique")
+        self.config = config
+        self.state_path = Path(state_path)
+        self.max_workers = max_workers
+        self.dependencies = self._resolve_dependencies()
+        self._state = self._load_state()
+        self._hasher = FileHasher(self._state.setdefault('file_hashes', {}))
+
+    def _resolve_dependencies(self):
+        producers = {}
+        for stage in self.stages.values():
+            for output in stage.outputs:
+                producers[output.resolve()] = stage.name
+        dependencies = {}
+        for stage in self.stages.values():
+            dependencies[stage.name] = {producers[p.resolve()] for p in stage.inputs if p.resolve() in producers}
+            dependencies[stage.name].discard(stage.name)
+        self._check_acyclic(dependencies)
+        return dependencies
+
+    @staticmethod
+    def _check_acyclic(dependencies):
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Pipeline has a dependency cycle through stage '{name}'")
+            visiting.add(name)
+            for dep in dependencies[name]:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in dependencies:
+            visit(name)
+
+    def _load_state(self):
+        if not self.state_path.exists():
+            return {'stages': {}, 'file_hashes': {}}
+        with open(self.state_path, 'r') as f:
+            state = json.load(f)
+        state.setdefault('stages', {})
+        return state
+
+    def _save_state(self):
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self._state, f, indent=2, sort_keys=True)
+        tmp_path.replace(self.state_path)
+
+    def cache_key(self, stage):
+        """Hash of the stage's inputs, config sections and code."""
+        parts = {
+            'inputs': {str(p): self._hasher.hash_path(p) for p in stage.inputs},
+            'config': {s: config_value(self.config, s) for s in stage.config_sections},
+            'code': {m: self._module_hash(m) for m in stage.code},
+        }
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _module_hash(self, module_name):
+        """Hash of a module's source file (None for modules without one, e.g. an interactive __main__)."""
+        source_file = getattr(importlib.import_module(module_name), '__file__', None)
+        if not source_file or not Path(source_file).is_file():
+            return None
+        return self._hasher.hash_file(Path(source_file))
+
+    def _output_hashes(self, stage):
+        return {str(p): self._hasher.hash_path(p) for p in stage.outputs}
+
+    def is_current(self, stage, key):
+        """True if the stage ran with this key and its outputs are unchanged since."""
+        recorded = self._state['stages'].get(stage.name)
+        if not stage.outputs or not recorded or recorded.get('key') != key:
+            return False
+        outputs = self._output_hashes(stage)
+        return None not in outputs.values() and outputs == recorded.get('outputs')
+
+    def _run_stage(self, stage, force):
+        key = self.cache_key(stage)
+        if not force and self.is_current(stage, key):
+            logger.info(f"Stage '{stage.name}' is up to date; skipping.")
+            return 'skipped'
+        logger.info(f"Running stage '{stage.name}'...")
+        started = time.perf_counter()
+        stage.func(self.config)
+        missing = [str(p) for p in stage.outputs if not p.exists()]
+        if missing:
+            raise RuntimeError(f"Stage '{stage.name}' did not write its outputs: {missing}")
+        self._state['stages'][stage.name] = {'key': key, 'outputs': self._output_hashes(stage)}
+        logger.info(f"Stage '{stage.name}' finished in {time.perf_counter() - started:.1f}s.")
+        return 'ran'
+
+    def _selected(self, targets):
+        """The target stages plus everything they depend on (all stages if no targets)."""
+        if not targets:
+            return set(self.stages)
+        unknown = set(targets) - set(self.stages)
+        if unknown:
+            raise ValueError(f"Unknown stages: {sorted(unknown)}")
+        selected, pending = set(), list(targets)
+        while pending:
+            name = pending.pop()
+            if name not in selected:
+                selected.add(name)
+                pending.extend(self.dependencies[name])
+        return selected
+
+    def run(self, targets=None, force=()):
+        """
+        Runs the selected stages (and their dependencies).
+
+        Args:
+            targets (list[str], optional): Stages to bring up to date; all stages if None.
+            force (iterable[str]): Stages to run even if they are current.
+
+        Returns:
+            dict: {stage name: 'ran' | 'skipped' | 'failed' | 'not run'}.
+        """
+        selected = self._selected(targets)
+        force = set(force)
+        results = {}
+        remaining = {name: self.dependencies[name] & selected for name in selected}
+        # A stage reruns when a dependency reran; the changed input hashes take care of that
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                running = {}
+                while remaining or running:
+                    ready = [n for n, deps in remaining.items() if all(results.get(d) in ('ran', 'skipped') for d in deps)]
+                    for name in sorted(ready):
+                        del remaining[name]
+                        running[pool.submit(self._run_stage, self.stages[name], name in force)] = name
+                    if not running:
+                        # Everything left waits on a failed stage
+                        results.update({name: 'not run' for name in remaining})
+                        break
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        name = running.pop(future)
+                        try:
+                            results[name] = future.result()
+                        except Exception as e:
+                            logger.exception(f"Stage '{name}' failed: {e}")
+                            results[name] = 'failed'
+        finally:
+            self._save_state()
+        logger.info(f"Pipeline finished: {results}")
+        return results
@@ -0,0 +1,193 @@
+import json
+import os
+import time
+import logging
+import traceback
+import pyarrow.dataset as ds
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from src.utils.config import load_config
+from src.utils.parquet import write_partitioned_dataset
+from src.data_processing.schema import ISSUE_PARTITION_COLS, PROCESSED_ISSUES_FILE
+from src.data_processing.streaming import read_raw_table
+from src.data_processing.preprocessing import (
+    preprocess_sprints,
+    preprocess_issues,
+    calculate_actual_velocity
+)
+from src.feature_engineering.features import build_model_features, feature_windows
+from src.feature_engineering.scope import calculate_sprint_scope, SCOPE_FILE
+from src.feature_engineering.burndown import calculate_daily_sprint_series, write_daily_sprint_series, DAILY_SERIES_FILE
+from src.training.train_velocity import train_and_save
+
+logger = logging.getLogger(__name__)
+
+
+def project_paths(config, project_key):
+    """Per-project output directories under the configured processed, features and models dirs."""
+    paths = config['paths']
+    return {
+        'processed_dir': Path(paths['processed_data_dir']) / project_key,
+        'features_dir': Path(paths['features_dir']) / project_key,
+        'models_dir': Path(paths['models_dir']) / project_key,
+    }
+
+
+def run_project_pipeline(project_key, config, raw_dir=None):
+    """
+    Runs preprocessing, feature building and training for one project of the raw dataset.
+
+    Outputs are written under `<dir>/<project_key>/` with the same file names as the
+    single-project scripts.
+
+    Returns:
+        dict: Summary with row counts, validation MAE and output locations.
+    """
+    raw_dir = Path(raw_dir or config['paths']['raw_data_dir'])
+    paths = project_paths(config, project_key)
+    for path in paths.values():
+        path.mkdir(parents=True, exist_ok=True)
+
+    # 1. Preprocess (partition pruning reads only this project's files)
+    in_project = ds.field('project_key') == project_key
+    sprints_df = read_raw_table(raw_dir, "sprints", filter=in_project)
+    issues_df = read_raw_table(raw_dir, "issues", filter=in_project)
+    transitions_df = read_raw_table(raw_dir, "status_transitions", filter=in_project)
+    if sprints_df.empty or issues_df.empty:
+        raise ValueError(f"No sprints or issues found for project {project_key} in {raw_dir}")
+
+    processed_sprints_df = preprocess_sprints(sprints_df)
+    processed_issues_df = preprocess_issues(issues_df, transitions_df, config)
+    closed_sprints_df = processed_sprints_df[processed_sprints_df['state'] == 'closed']
+    sprints_with_velocity_df = calculate_actual_velocity(processed_issues_df, closed_sprints_df, config)
+    scope_df = calculate_sprint_scope(processed_sprints_df, processed_issues_df, transitions_df,
+                                      config.get('status_mapping', {}))
+
+    processed_sprints_df.to_parquet(paths['processed_dir'] / "processed_sprints.parquet", index=False)
+    write_partitioned_dataset(processed_issues_df, paths['processed_dir'] / PROCESSED_ISSUES_FILE, ISSUE_PARTITION_COLS)
+    sprints_with_velocity_df.to_parquet(paths['processed_dir'] / "closed_sprints_with_velocity.parquet", index=False)
+    scope_df.to_parquet(paths['processed_dir'] / SCOPE_FILE, index=False)
+    write_daily_sprint_series(calculate_daily_sprint_series(processed_sprints_df, processed_issues_df, transitions_df,
+                                                            config.get('status_mapping', {})),
+                              paths['processed_dir'] / DAILY_SERIES_FILE)
+
+    # 2. Features
+    features_df = build_model_features(sprints_with_velocity_df, processed_sprints_df, processed_issues_df,
+                                       windows=feature_windows(config), scope_df=scope_df)
+    features_df.to_parquet(paths['features_dir'] / "model_input_features.parquet", index=False)
+
+    # 3. Train (in this worker: projects already run in parallel)
+    result = train_and_save(features_df, config, models_dir=paths['models_dir'], n_jobs=1)
+    if result is None:
+        raise ValueError(f"Model training failed for project {project_key}")
+
+    return {
+        'num_sprints': len(processed_sprints_df),
+        'num_closed_sprints': len(sprints_with_velocity_df),
+        'num_issues': len(processed_issues_df),
+        'validation_mae': float(result['cv_mae']),
+        'model_path': str(result['model_path']),
+        'model_version': result['version'],
+        'training_mode': result['mode'],
+    }
+
+
+def _run_project_isolated(project_key, config, raw_dir):
+    """Worker entry point: runs one project and turns any exception into a 'failed' summary."""
+    started = time.perf_counter()
+    summary = {'project_key': project_key, 'pid': os.getpid()}
+    try:
+        summary.update(run_project_pipeline(project_key, config, raw_dir))
+        summary['status'] = 'succeeded'
+    except Exception as e:
+        logger.exception(f"Pipeline failed for project {project_key}: {e}")
+        summary['status'] = 'failed'
+        summary['error'] = f"{type(e).__name__}: {e}"
+        summary['traceback'] = traceback.format_exc()
+    summary['duration_s'] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+def _init_worker():
+    """Sets up logging in worker processes that did not inherit it (spawn start method)."""
+    if not logging.getLogger().handlers:
+        from src.utils.logging_config import setup_logging
+        setup_logging()
+
+
+def _run_in_pool(project_keys, config, raw_dir, max_workers):
+    """
+    Runs projects in one process pool.
+
+    Returns:
+        tuple: (summaries by project, projects whose worker pool broke before they finished)
+    """
+    summaries, broken = {}, []
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as pool:
+        futures = {pool.submit(_run_project_isolated, key, config, raw_dir): key for key in project_keys}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                summaries[key] = future.result()
+            except BrokenProcessPool:
+                # A worker process died (e.g. out of memory): every project still in the pool fails with it
+                broken.append(key)
+                continue
+            except Exception as e:
+                summaries[key] = {'project_key': key, 'status': 'failed', 'error': f"{type(e).__name__}: {e}"}
+            logger.info(f"Project {key}: {summaries[key]['status']}")
+    return summaries, broken
+
+
+def run_all_projects(project_keys, config=None, raw_dir=None, max_workers=None):
+    """
+    Runs the pipeline for every project in a process pool.
+
+    A failure only marks its own project as failed; the other projects keep running. A
+    crashed worker process breaks the whole pool, so the projects that were still in it are
+    run again one at a time, each in a pool of its own: only a project that crashes its own
+    worker is reported as failed.
+
+    Args:
+        project_keys (list[str]): Projects to run.
+        config (dict, optional): Loaded configuration. Loaded from the default path if None.
+        raw_dir (str | Path, optional): Raw dataset directory (defaults to paths.raw_data_dir).
+        max_workers (int, optional): Pool size; defaults to projects.max_workers, then the CPU count.
+
+    Returns:
+        list[dict]: One summary per project, in the order of `project_keys`.
+    """
+    if config is None:
+        config = load_config()
+    max_workers = max_workers or (config.get('projects') or {}).get('max_workers') or os.cpu_count()
+    max_workers = max(1, min(max_workers, len(project_keys) or 1))
+    logger.info(f"Running pipeline for {len(project_keys)} projects with {max_workers} workers...")
+
+    summaries, broken = _run_in_pool(project_keys, config, raw_dir, max_workers)
+    if broken:
+        logger.warning(f"A worker process died; running the {len(broken)} projects it took down again one at a time...")
+    for key in broken:
+        retried, crashed = _run_in_pool([key], config, raw_dir, max_workers=1)
+        summaries.update(retried)
+        if crashed:
+            summaries[key] = {'project_key': key, 'status': 'failed',
+                              'error': "BrokenProcessPool: the worker process died (e.g. out of memory)"}
+            logger.error(f"Project {key}: the worker process died")
+
+    ordered = [summaries[key] for key in project_keys]
+    failed = [s['project_key'] for s in ordered if s['status'] != 'succeeded']
+    logger.info(f"Multi-project run finished: {len(ordered) - len(failed)} succeeded, {len(failed)} failed"
+                + (f" ({', '.join(failed)})." if failed else "."))
+    return ordered
+
+
+def save_summary(summaries, path):
+    """Writes the per-project summaries as JSON (without tracebacks, which are logged instead)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    records = [{k: v for k, v in s.items() if k != 'traceback'} for s in summaries]
+    with open(path, 'w') as f:
+        json.dump(records, f, indent=2, default=str)
+    logger.info(f"Saved per-project summary to {path}")
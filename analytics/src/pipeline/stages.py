@@ -0,0 +1,170 @@
+import logging
+import pandas as pd
+from pathlib import Path
+
+from src.pipeline.dag import Stage, Pipeline
+from src.data_processing.schema import ISSUE_SCHEMA, PROCESSED_ISSUES_FILE, read_compact_parquet
+from src.data_processing.mock_data_generator import write_mock_dataset
+from src.data_processing.streaming import preprocess_streaming, sprint_aggregates_streaming
+from src.feature_engineering.features import build_model_features, feature_windows
+from src.feature_engineering.scope import SCOPE_FILE
+from src.feature_engineering.burndown import DAILY_SERIES_FILE
+from src.feature_engineering.rolling_state import update_historical_features, fill_open_sprint_features, ROLLING_STATE_FILE
+from src.feature_engineering.feature_store import FeatureStore, STORE_DIR, VALUES_FILE, INDEX_FILE
+from src.training.train_velocity import train_and_save, tuned_params_path
+from src.modeling.registry import model_name_for, model_paths
+from src.inference.predict import predict_velocity, load_historical_data, invalidate_data, invalidate_model
+
+logger = logging.getLogger(__name__)
+
+PROCESSED_FILES = ("processed_sprints.parquet", PROCESSED_ISSUES_FILE, "closed_sprints_with_velocity.parquet")
+RAW_TABLES = ("sprints", "issues", "status_transitions")
+STATE_FILE = "pipeline_state.json"
+# The raw dataset the mock_data stage writes when there is none (a fixed seed, so reruns give the same data)
+MOCK_DATASET = {"num_sprints": 30, "issues_per_sprint": 15, "seed": 42}
+
+
+def _has_raw_dataset(raw_dir):
+    return all((raw_dir / name).exists() or (raw_dir / f"{name}.parquet").exists() for name in RAW_TABLES)
+
+
+def _raw_inputs(config):
+    """The raw tables: those of the existing raw dataset, or the directories the mock_data stage writes."""
+    raw_dir = Path(config['paths']['raw_data_dir'])
+    return [raw_dir / f"{name}.parquet" if (raw_dir / f"{name}.parquet").exists() else raw_dir / name
+            for name in RAW_TABLES]
+
+
+def _batch_size(config):
+    return config.get('preprocessing', {}).get('batch_size', 100000)
+
+
+def mock_data_stage(config):
+    """Writes a mock raw dataset where the raw dataset is expected (only part of the pipeline without one)."""
+    write_mock_dataset(Path(config['paths']['raw_data_dir']), **MOCK_DATASET)
+
+
+def preprocess_stage(config):
+    """Preprocesses the raw dataset in batches into the processed sprints, issues and closed sprint velocities."""
+    output_dir = Path(config['paths']['processed_data_dir'])
+    output_dir.mkdir(parents=True, exist_ok=True)
+    preprocess_streaming(Path(config['paths']['raw_data_dir']), output_dir, config, batch_size=_batch_size(config),
+                         sprint_aggregates=False)
+    invalidate_data() # New closed sprints: cached histories and forecasts are stale
+
+
+def scope_stage(config):
+    """Computes the point-in-time scope of every sprint from the processed issues and their raw transitions."""
+    sprint_aggregates_streaming(Path(config['paths']['raw_data_dir']), Path(config['paths']['processed_data_dir']),
+                                config, batch_size=_batch_size(config), daily_series=False)
+
+
+def burndown_stage(config):
+    """Computes the daily sprint series from the processed issues and their raw transitions."""
+    sprint_aggregates_streaming(Path(config['paths']['raw_data_dir']), Path(config['paths']['processed_data_dir']),
+                                config, batch_size=_batch_size(config), scope=False)
+
+
+def build_features_stage(config):
+    """Builds the model input features from the processed files."""
+    processed_dir = Path(config['paths']['processed_data_dir'])
+    features_dir = Path(config['paths']['features_dir'])
+    features_dir.mkdir(parents=True, exist_ok=True)
+    features_path = features_dir / "model_input_features.parquet"
+    closed_sprints_df = pd.read_parquet(processed_dir / "closed_sprints_with_velocity.parquet")
+    # Only the newly closed sprints go through the rolling state; the others keep their previous features
+    hist_feat_df, rolling_state = update_historical_features(
+        features_dir / ROLLING_STATE_FILE, closed_sprints_df,
+        pd.read_parquet(features_path) if features_path.exists() else None, windows=feature_windows(config))
+    features_df = build_model_features(
+        closed_sprints_df,
+        pd.read_parquet(processed_dir / "processed_sprints.parquet"),
+        read_compact_parquet(processed_dir / PROCESSED_ISSUES_FILE, ISSUE_SCHEMA),
+        scope_df=pd.read_parquet(processed_dir / SCOPE_FILE),
+        hist_feat_df=hist_feat_df,
+    )
+    features_df = fill_open_sprint_features(features_df, rolling_state)
+    features_df.to_parquet(features_path, index=False)
+    FeatureStore.from_config(config).materialize(features_df)
+    invalidate_data()
+
+
+def train_stage(config):
+    """Trains the velocity model with the configured backend and saves it as the current version."""
+    closed_sprints_df = pd.read_parquet(Path(config['paths']['processed_data_dir']) / "closed_sprints_with_velocity.parquet")
+    features_df = FeatureStore.from_config(config).training_set(closed_sprints_df)
+    result = train_and_save(features_df, config)
+    if result is None:
+        raise RuntimeError("Model training failed")
+    invalidate_model(model_name_for(config))
+    logger.info(f"Trained velocity model ({result['mode']}, version {result['version']}, "
+                f"avg validation MAE {result['cv_mae']:.4f}).")
+
+
+def inference_stage(config):
+    """Predicts the velocity of the sprint after the last historical one (as scripts/run_inference.py)."""
+    historical_data = load_historical_data(config)
+    if historical_data is None or historical_data.empty:
+        raise RuntimeError("No historical data for inference")
+    next_start = historical_data['start_date'].max() + pd.Timedelta(days=14)
+    sprint_input = {"start_date": next_start.strftime("%Y-%m-%d"), "planned_story_points": 55.0, "planned_issue_count": 18}
+    predicted = predict_velocity(sprint_input, config=config)
+    if predicted is None:
+        raise RuntimeError("Inference failed")
+    logger.info(f"Predicted velocity for the sprint starting {sprint_input['start_date']}: {predicted:.2f}")
+
+
+def default_stages(config):
+    """
+    The stages for the configured paths: preprocess, then the scope and the burndown series
+    (independent of each other), build_features (from the velocities and the scope), train and
+    inference. Without a raw dataset, a mock_data stage writes one first.
+    """
+    raw_dir = Path(config['paths']['raw_data_dir'])
+    processed_dir = Path(config['paths']['processed_data_dir'])
+    features_path = Path(config['paths']['features_dir']) / "model_input_features.parquet"
+    rolling_state_path = Path(config['paths']['features_dir']) / ROLLING_STATE_FILE
+    store_files = [Path(config['paths']['features_dir']) / STORE_DIR / name for name in (VALUES_FILE, INDEX_FILE)]
+    models_dir = Path(config['paths']['models_dir'])
+    raw_inputs = _raw_inputs(config)
+    processed = [processed_dir / name for name in PROCESSED_FILES]
+    # The scope and the series read the processed sprints and issues, and the raw transitions
+    aggregate_inputs = [processed_dir / "processed_sprints.parquet", processed_dir / PROCESSED_ISSUES_FILE,
+                        raw_inputs[RAW_TABLES.index("status_transitions")]]
+    scope_path = processed_dir / SCOPE_FILE
+    model_files = [model_paths(models_dir, model_name_for(config))['current']] # Changes with the version
+    mock_data = [] if _has_raw_dataset(raw_dir) else [
+        Stage("mock_data", mock_data_stage, outputs=raw_inputs, code=["src.data_processing.mock_data_generator"])
+    ]
+    return mock_data + [
+        Stage("preprocess", preprocess_stage, inputs=raw_inputs, outputs=processed,
+              config_sections=["status_mapping", "preprocessing"],
+              code=["src.data_processing.preprocessing", "src.data_processing.streaming", "src.data_processing.schema"]),
+        Stage("scope", scope_stage, inputs=aggregate_inputs, outputs=[scope_path],
+              config_sections=["status_mapping", "preprocessing"],
+              code=["src.data_processing.streaming", "src.data_processing.preprocessing", "src.feature_engineering.scope"]),
+        Stage("burndown", burndown_stage, inputs=aggregate_inputs, outputs=[processed_dir / DAILY_SERIES_FILE],
+              config_sections=["status_mapping", "preprocessing"],
+              code=["src.data_processing.streaming", "src.data_processing.preprocessing",
+                    "src.feature_engineering.burndown"]),
+        Stage("build_features", build_features_stage, inputs=[*processed, scope_path],
+              outputs=[features_path, rolling_state_path, *store_files],
+              config_sections=["velocity_model.feature_windows"],
+              code=["src.feature_engineering.features", "src.feature_engineering.rolling_state",
+                    "src.feature_engineering.feature_store"]),
+        Stage("train", train_stage,
+              inputs=[processed_dir / "closed_sprints_with_velocity.parquet", *store_files, tuned_params_path(config)],
+              outputs=model_files, config_sections=["velocity_model"], code=["src.training.train_velocity", "src.modeling.registry",
+                                                                                     "src.modeling.flat_trees"]),
+        # No outputs: inference always runs
+        Stage("inference", inference_stage,
+              inputs=[processed_dir / "closed_sprints_with_velocity.parquet", rolling_state_path, *store_files, *model_files],
+              code=["src.inference.predict", "src.inference.cache"]),
+    ]
+
+
+def build_pipeline(config, max_workers=None):
+    """The default pipeline, with its state file next to the processed data."""
+    state_path = Path(config['paths']['processed_data_dir']).parent / STATE_FILE
+    max_workers = max_workers or (config.get('pipeline') or {}).get('max_workers')
+    return Pipeline(default_stages(config), config, state_path, max_workers=max_workers)
@@ -1,17 +1,99 @@
 import pandas as pd
 import numpy as np
 import logging
+import copy
+import json
 import joblib
+import yaml
+import hashlib
+import tempfile
+from contextlib import contextmanager
 from pathlib import Path
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import GradientBoostingRegressor
-from sklearn.metrics import mean_absolute_error
+from joblib import Parallel, delayed
 
 from src.utils.config import load_config
 from src.evaluation.metrics import calculate_regression_metrics
+from src.modeling.registry import get_backend, configured_backend, model_name_for, save_model, load_model
 
 logger = logging.getLogger(__name__)
 
+TUNING_DIR = "tuning" # Under paths.models_dir
+# The current tuned parameters; each version is also kept as velocity_model_params_v0001.yaml, ...
+TUNED_PARAMS_FILE = "velocity_model_params.yaml"
+
+
+def tuned_params_path(config):
+    """Path of the current tuned parameters file."""
+    return Path(config['paths']['models_dir']) / TUNING_DIR / TUNED_PARAMS_FILE
+
+
+def load_tuned_params(config):
+    """The model parameters of the current tuned version, or None if tuning has not run."""
+    path = tuned_params_path(config)
+    if not path.exists():
+        return None
+    with open(path, 'r') as f:
+        return (yaml.safe_load(f) or {}).get('model_params')
+
+
+def save_tuned_params(config, model_params, metadata=None):
+    """
+    Writes tuned model parameters as a new numbered version and makes it the current one.
+
+    Returns:
+        Path: The versioned file.
+    """
+    current_path = tuned_params_path(config)
+    current_path.parent.mkdir(parents=True, exist_ok=True)
+    versions = [int(p.stem.rsplit('_v', 1)[1]) for p in current_path.parent.glob(f"{current_path.stem}_v*.yaml")]
+    version = max(versions, default=0) + 1
+    document = {'version': version, **(metadata or {}), 'model_params': model_params}
+    version_path = current_path.with_name(f"{current_path.stem}_v{version:04d}.yaml")
+    for path in (version_path, current_path):
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            yaml.safe_dump(document, f, sort_keys=False)
+        tmp_path.replace(path)
+    logger.info(f"Saved tuned parameters version {version} to {version_path}")
+    return version_path
+
+
+def resolve_model_params(config, backend=None):
+    """
+    The model parameters for training a backend (default: the configured one), over the
+    backend's defaults (random_state 0 for the boosting ones).
+
+    For 'gbr' they are velocity_model.model_params, overridden by the current tuned version
+    when velocity_model.use_tuned_params is set; other backends read velocity_model.backend_params.<name>.
+    """
+    model_cfg = config.get('velocity_model', {})
+    backend = backend or configured_backend(config)
+    if backend.name != "gbr":
+        return {**backend.default_params, **(model_cfg.get('backend_params') or {}).get(backend.name, {})}
+    model_params = {**backend.default_params, **model_cfg.get('model_params', {})}
+    tuned_params = load_tuned_params(config) if model_cfg.get('use_tuned_params') else None
+    if tuned_params:
+        logger.info(f"Using tuned model parameters from {tuned_params_path(config)}")
+        model_params.update(tuned_params)
+    return model_params
+
+
+@contextmanager
+def memmapped_training_matrix(X, y):
+    """
+    Dumps the feature matrix and target to a temporary file and yields them as read-only
+    memory maps, which joblib passes to worker processes by reference instead of pickling.
+    """
+    with tempfile.TemporaryDirectory(prefix="velocity_training_") as tmp_dir:
+        matrix_path = Path(tmp_dir) / "training_matrix.joblib"
+        joblib.dump((np.asarray(X, dtype=np.float64), np.asarray(y, dtype=np.float64)), matrix_path)
+        X_map, y_map = joblib.load(matrix_path, mmap_mode='r')
+        try:
+            yield X_map, y_map
+        finally:
+            del X_map, y_map # Release the memory maps before the directory is removed
+
+
 def time_series_split(df, date_column='start_date', n_splits=5):
     """Generates indices for time series cross-validation.
        Yields (train_indices, val_indices) for each split.
@@ -46,68 +128,275 @@ def time_series_split(df, date_column='start_date', n_splits=5):
              logger.info(f"Split {i+1}: Train size={len(train_indices)}, Val size={len(val_indices)}")
              yield train_indices, val_indices
 
-def train_velocity_model(features_df, config):
-    """Trains the velocity forecasting model."""
+def _fit_fold(X, y, feature_cols, backend_name, model_params, train_pos, val_pos=None):
+    """
+    Worker task: fits a model on the `train_pos` rows of the (memory-mapped) X / y and
+    returns it with its validation metrics on the `val_pos` rows (None for the final fit).
+    """
+    model = get_backend(backend_name).create(model_params)
+    # Fit on a DataFrame so the model keeps the feature names predict_velocity passes
+    model.fit(pd.DataFrame(X[train_pos], columns=feature_cols), y[train_pos])
+    if val_pos is None:
+        return model, None
+    y_pred = model.predict(pd.DataFrame(X[val_pos], columns=feature_cols))
+    return None, calculate_regression_metrics(y[val_pos], y_pred)
+
+
+def _training_data(features_df, config, backend, feature_cols=None):
+    """
+    The closed sprints to train on, with the features used and the target.
+
+    Returns:
+        tuple: (train_data with a default index, feature columns, target column).
+    """
     model_cfg = config.get('velocity_model', {})
     target_metric = model_cfg.get('target_metric', 'actual_velocity')
     # Use features defined in config OR define a default list
-    feature_cols = model_cfg.get('features', [
+    feature_cols = feature_cols or model_cfg.get('features', [
         'avg_velocity_last_1_sprints', 'avg_velocity_last_3_sprints',
         'planned_story_points', 'planned_issue_count'
     ])
+    missing_cols = [col for col in feature_cols if col not in features_df.columns]
+    if missing_cols:
+        # e.g. the sprint scope features of data preprocessed before they existed
+        logger.warning(f"Features not in the input, training without them: {missing_cols}")
+        feature_cols = [col for col in feature_cols if col not in missing_cols]
 
-    # Filter for relevant data: closed sprints with non-null target and features
+    # Filter for relevant data: closed sprints with non-null target (and features, unless the backend handles NaN)
     # Only train on sprints where we HAVE the actual velocity
     train_data = features_df[features_df['state'] == 'closed'].copy()
-    train_data = train_data.dropna(subset=[target_metric] + feature_cols)
+    required_cols = [target_metric] + ([] if backend.handles_nan else feature_cols)
+    train_data = train_data.dropna(subset=required_cols).reset_index(drop=True)
+    return train_data, feature_cols, target_metric
+
+
+def training_data_summary(train_data, feature_cols, target_metric):
+    """
+    Manifest entries describing a training set: the window of sprint start dates it covers,
+    the ids of its sprints and a hash of its feature matrix and target (equal data, equal hash).
+    """
+    digest = hashlib.sha256(json.dumps(list(feature_cols)).encode())
+    digest.update(np.ascontiguousarray(train_data[feature_cols].to_numpy(dtype=np.float64)).tobytes())
+    digest.update(np.ascontiguousarray(train_data[target_metric].to_numpy(dtype=np.float64)).tobytes())
+    start_dates = pd.to_datetime(train_data['start_date'])
+    return {
+        'training_window': {'start': start_dates.min().isoformat(), 'end': start_dates.max().isoformat(),
+                            'n_sprints': int(len(train_data))},
+        'sprint_ids': sorted(int(sprint_id) for sprint_id in train_data['sprint_id']),
+        'data_hash': digest.hexdigest(),
+    }
+
+
+def fit_velocity_model(features_df, config, n_jobs=None):
+    """
+    Trains the velocity forecasting model from scratch.
+
+    The time series cross-validation folds and the final fit run concurrently in a process
+    pool. The feature matrix and target are dumped once to a temporary file and memory-mapped
+    by the workers instead of being pickled to each of them. Results are collected in fold
+    order and the model's random_state defaults to 0, so a run is deterministic.
+
+    The estimator is the backend selected by velocity_model.backend (see src/modeling/registry.py)
+    with the parameters of resolve_model_params. Backends that handle missing values train on
+    sprints with missing features too.
+
+    Args:
+        features_df (pd.DataFrame): Model input features with the target and 'state', 'start_date'.
+        config (dict): Configuration ('velocity_model' section).
+        n_jobs (int, optional): Worker processes; defaults to velocity_model.n_jobs, then all CPUs.
+            1 fits everything in this process.
+
+    Returns:
+        dict: 'model', 'features', 'backend', 'cv_mae' and the manifest entries ('mode', 'params',
+              'cv_metrics', 'training_window', 'data_hash'), or None if there is no training data.
+    """
+    model_cfg = config.get('velocity_model', {})
+    backend = configured_backend(config)
+    model_params = resolve_model_params(config, backend)
+    n_jobs = n_jobs or model_cfg.get('n_jobs') or -1
+    train_data, feature_cols, target_metric = _training_data(features_df, config, backend)
 
     if train_data.empty:
         logger.error("No valid training data found after filtering NaNs. Cannot train model.")
-        return None, None, []
+        return None
 
     logger.info(f"Training data shape after filtering: {train_data.shape}")
+    logger.info(f"Using backend: {backend.name} {model_params}")
     logger.info(f"Using features: {feature_cols}")
     logger.info(f"Using target: {target_metric}")
 
+    # With the default index, the fold indices are row positions of the training matrix
+    folds = [(train_idx.to_numpy(), val_idx.to_numpy())
+             for train_idx, val_idx in time_series_split(train_data, date_column='start_date', n_splits=5)]
+    all_rows = np.arange(len(train_data))
 
-    X = train_data[feature_cols]
-    y = train_data[target_metric]
-
-    # --- Time Series Cross-Validation ---
-    logger.info("Performing Time Series Cross-Validation...")
-    val_scores = []
-    # Use the custom time series split
-    for split_num, (train_idx, val_idx) in enumerate(time_series_split(train_data, date_column='start_date', n_splits=5)): # Use 5 splits or configure
-        X_train, X_val = X.loc[train_idx], X.loc[val_idx]
-        y_train, y_val = y.loc[train_idx], y.loc[val_idx]
+    with memmapped_training_matrix(train_data[feature_cols], train_data[target_metric]) as (X, y):
+        # --- Time Series Cross-Validation, with the final model trained alongside ---
+        logger.info(f"Performing Time Series Cross-Validation ({len(folds)} folds + final fit, n_jobs={n_jobs})...")
+        tasks = [delayed(_fit_fold)(X, y, feature_cols, backend.name, model_params, train_pos, val_pos)
+                 for train_pos, val_pos in folds]
+        tasks.append(delayed(_fit_fold)(X, y, feature_cols, backend.name, model_params, all_rows))
+        results = Parallel(n_jobs=n_jobs, backend='loky')(tasks) # In task order
 
-        if X_train.empty or X_val.empty:
-            logger.warning(f"Skipping split {split_num+1} due to empty train/val set.")
-            continue
+    fold_metrics = []
+    for split_num, ((train_pos, val_pos), (_, metrics)) in enumerate(zip(folds, results), start=1):
+        logger.info(f"Split {split_num}: Trained on {len(train_pos)}, Validated on {len(val_pos)}")
+        fold_metrics.append({k: float(v) for k, v in metrics.items()})
+        logger.info(f"Split {split_num} Val Metrics: {metrics}")
 
-        # Initialize model (using params from config)
-        model_params = model_cfg.get('model_params', {})
-        model = GradientBoostingRegressor(**model_params)
+    avg_mae = np.mean([m['mae'] for m in fold_metrics]) if fold_metrics else np.nan
+    logger.info(f"Average Validation MAE across splits: {avg_mae:.4f}")
 
-        logger.info(f"Split {split_num+1}: Training on {len(X_train)}, Validating on {len(X_val)}")
-        model.fit(X_train, y_train)
-        y_pred = model.predict(X_val)
+    # --- Final Model, trained on all available closed sprint data ---
+    final_model = results[-1][0]
+    logger.info("Final model trained.")
 
-        metrics = calculate_regression_metrics(y_val, y_pred)
-        val_scores.append(metrics['mae']) # Store MAE for averaging
-        logger.info(f"Split {split_num+1} Val Metrics: {metrics}")
+    return {
+        'model': final_model,
+        'features': feature_cols,
+        'backend': backend,
+        'cv_mae': avg_mae,
+        'mode': 'full',
+        'params': model_params,
+        'cv_metrics': {'mae': float(avg_mae), 'folds': fold_metrics},
+        **training_data_summary(train_data, feature_cols, target_metric),
+    }
 
-    avg_mae = np.mean(val_scores) if val_scores else np.nan
-    logger.info(f"Average Validation MAE across splits: {avg_mae:.4f}")
 
-    # --- Final Model Training ---
-    logger.info("Training final model on all available closed sprint data...")
-    final_model = GradientBoostingRegressor(**model_params)
-    final_model.fit(X, y) # Train on the whole filtered dataset
-    logger.info("Final model trained.")
+def train_velocity_model(features_df, config, n_jobs=None):
+    """
+    Trains the velocity forecasting model (see fit_velocity_model).
 
+    Returns:
+        tuple: (final model, list of features used, average validation MAE), or (None, None, []) on failure.
+    """
+    result = fit_velocity_model(features_df, config, n_jobs=n_jobs)
+    if result is None:
+        return None, None, []
     # Return the trained model and the list of features used
-    return final_model, feature_cols, avg_mae
+    return result['model'], result['features'], result['cv_mae']
+
+
+def retrain_velocity_model(features_df, config, base_model, base_manifest):
+    """
+    Grows a trained ensemble on the sprints closed since it was trained, with warm_start.
+
+    The new sprints are the closed ones the base model was not trained on (by the sprint ids
+    in its manifest), wherever they start: sprints of other teams or closed late are not
+    skipped for starting before the newest one the base model saw.
+    velocity_model.incremental.n_estimators_added stages are fitted on them (to the residuals
+    of the existing ensemble), instead of refitting on the whole history. The features are
+    the base model's. There is no cross-validation: the manifest keeps the base model's CV
+    metrics and records the base model's error on the new sprints, measured before it saw them.
+
+    Args:
+        features_df (pd.DataFrame): Model input features, as for fit_velocity_model.
+        config (dict): Configuration ('velocity_model' section).
+        base_model: The current model.
+        base_manifest (dict): Its manifest (backend, features, sprint ids, training window, CV metrics).
+
+    Returns:
+        dict: As fit_velocity_model, with 'mode' 'incremental' and 'parent'; the base model
+              unchanged ('mode' 'unchanged') if there are too few new sprints; or None if
+              the base model cannot be grown (the caller then trains from scratch).
+    """
+    incremental_cfg = config.get('velocity_model', {}).get('incremental') or {}
+    backend = get_backend(base_manifest.get('backend', 'gbr'))
+    if not backend.supports_warm_start or 'sprint_ids' not in base_manifest:
+        logger.warning(f"The current '{backend.name}' model cannot be grown incrementally.")
+        return None
+    feature_cols = list(base_manifest['features'])
+    if any(col not in features_df.columns for col in feature_cols):
+        logger.warning("The input lacks features of the current model; it cannot be grown incrementally.")
+        return None
+
+    train_data, _, target_metric = _training_data(features_df, config, backend, feature_cols)
+    trained_sprint_ids = set(base_manifest['sprint_ids'])
+    new_data = train_data[~train_data['sprint_id'].isin(trained_sprint_ids)].reset_index(drop=True)
+    min_new_sprints = incremental_cfg.get('min_new_sprints', 1)
+    if backend.name == "hist_gbr":
+        # Its trees cannot split fewer than 2 x min_samples_leaf samples, and a tree with only a root adds 0
+        min_new_sprints = max(min_new_sprints, 2 * base_model.get_params()['min_samples_leaf'])
+    if len(new_data) < min_new_sprints:
+        logger.info(f"{len(new_data)} sprint(s) closed since version {base_manifest.get('version')} "
+                    f"(minimum {min_new_sprints}): keeping the current model.")
+        return {'model': base_model, 'features': feature_cols, 'backend': backend,
+                'cv_mae': base_manifest.get('cv_metrics', {}).get('mae', np.nan), 'mode': 'unchanged'}
+
+    X_new = new_data[feature_cols]
+    y_new = new_data[target_metric].to_numpy(dtype=np.float64)
+    before = calculate_regression_metrics(y_new, base_model.predict(X_new))
+
+    model = copy.deepcopy(base_model)
+    stages = getattr(model, 'n_estimators_', None) or getattr(model, 'n_iter_', None)
+    added = incremental_cfg.get('n_estimators_added', 10)
+    model.set_params(warm_start=True, **{backend.size_param: int(stages) + added})
+    model.fit(X_new, y_new) # Keeps the existing stages and fits `added` new ones
+    model.set_params(warm_start=False)
+    after = calculate_regression_metrics(y_new, model.predict(X_new))
+    logger.info(f"Grew the model by {added} stages on {len(new_data)} new sprint(s): "
+                f"MAE on them {before['mae']:.4f} before, {after['mae']:.4f} after (in-sample).")
+
+    summary = training_data_summary(new_data, feature_cols, target_metric)
+    window, new_window = base_manifest.get('training_window', {}), summary['training_window']
+    return {
+        'model': model,
+        'features': feature_cols,
+        'backend': backend,
+        'cv_mae': base_manifest.get('cv_metrics', {}).get('mae', np.nan),
+        'mode': 'incremental',
+        'parent': base_manifest.get('version'),
+        'params': {**base_manifest.get('params', {}), backend.size_param: int(stages) + added},
+        'cv_metrics': base_manifest.get('cv_metrics', {}),
+        'incremental_metrics': {'new_sprints': int(len(new_data)),
+                                'mae_before': float(before['mae']), 'mae_after_in_sample': float(after['mae'])},
+        'training_window': {'start': min(window.get('start', new_window['start']), new_window['start']),
+                            'end': max(window.get('end', new_window['end']), new_window['end']),
+                            'n_sprints': len(trained_sprint_ids) + int(len(new_data))},
+        'sprint_ids': sorted(trained_sprint_ids | set(summary['sprint_ids'])),
+        'data_hash': summary['data_hash'], # Of the new sprints; the parent's manifest has the rest
+    }
+
+
+def train_and_save(features_df, config, models_dir=None, incremental=None, n_jobs=None):
+    """
+    Trains the velocity model and saves it as a new version (see src.modeling.registry.save_model).
+
+    Args:
+        features_df (pd.DataFrame): Model input features.
+        config (dict): Configuration.
+        models_dir (str | Path, optional): Defaults to paths.models_dir.
+        incremental (bool, optional): Grow the current version on the newly closed sprints
+            instead of training from scratch; defaults to velocity_model.incremental.enabled.
+            Falls back to a full training when there is no current version that can grow.
+        n_jobs (int, optional): Worker processes for a full training.
+
+    Returns:
+        dict: The training result (see fit_velocity_model) with 'model_path' and 'version', or None on failure.
+    """
+    models_dir = Path(models_dir or config['paths']['models_dir'])
+    model_name = model_name_for(config)
+    if incremental is None:
+        incremental = bool((config.get('velocity_model', {}).get('incremental') or {}).get('enabled'))
+
+    result = None
+    if incremental:
+        try:
+            base_model, _, base_manifest = load_model(models_dir, model_name)
+        except FileNotFoundError:
+            logger.info(f"No current '{model_name}' model to grow: training from scratch.")
+        else:
+            result = retrain_velocity_model(features_df, config, base_model, base_manifest)
+            if result is not None and result['mode'] == 'unchanged':
+                return {**result, 'model_path': None, 'version': base_manifest.get('version')}
+    if result is None:
+        result = fit_velocity_model(features_df, config, n_jobs=n_jobs)
+    if result is None:
+        return None
+
+    metadata = {k: v for k, v in result.items() if k not in ('model', 'features', 'backend', 'cv_mae')}
+    model_path = save_model(models_dir, model_name, result['model'], result['features'], result['backend'], metadata)
+    return {**result, 'model_path': model_path, 'version': model_path.parent.name}
 
 
 if __name__ == '__main__':
@@ -117,21 +406,15 @@ if __name__ == '__main__':
     cfg = load_config()
     if cfg:
         features_path = Path(cfg['paths']['features_dir']) / "model_input_features.parquet"
-        models_dir = Path(cfg['paths']['models_dir'])
-        models_dir.mkdir(parents=True, exist_ok=True)
-        model_path = models_dir / "velocity_model.joblib"
-        features_list_path = models_dir / "velocity_model_features.joblib"
 
         if features_path.exists():
             features_data = pd.read_parquet(features_path)
-            trained_model, features_used, validation_mae = train_velocity_model(features_data, cfg)
-
-            if trained_model:
-                logger.info(f"Saving trained model to {model_path}")
-                joblib.dump(trained_model, model_path)
-                logger.info(f"Saving feature list to {features_list_path}")
-                joblib.dump(features_used, features_list_path)
-                logger.info(f"Training complete. Average Validation MAE: {validation_mae:.4f}")
+            # Saved where predict.py loads it from (velocity_<backend>/ with its CURRENT version)
+            result = train_and_save(features_data, cfg)
+
+            if result:
+                logger.info(f"Training complete ({result['mode']}): version {result['version']}. "
+                            f"Average Validation MAE: {result['cv_mae']:.4f}")
             else:
                 logger.error("Model training failed.")
         else:
@@ -0,0 +1,145 @@
+import math
+import logging
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.model_selection import ParameterSampler
+
+from src.evaluation.metrics import calculate_regression_metrics
+from src.modeling.registry import get_backend
+from src.training.train_velocity import (
+    time_series_split,
+    memmapped_training_matrix,
+    resolve_model_params,
+    save_tuned_params
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARAM_SPACE = {
+    'learning_rate': [0.03, 0.05, 0.1, 0.2],
+    'max_depth': [2, 3, 4],
+    'min_samples_leaf': [1, 5, 10],
+    'subsample': [0.8, 1.0],
+}
+# Only used while searching: the tuned n_estimators is where the ensembles stopped improving
+SEARCH_ONLY_PARAMS = ('warm_start', 'n_iter_no_change', 'validation_fraction')
+
+
+def halving_budgets(min_estimators, max_estimators, factor):
+    """Ensemble sizes of the successive halving rungs: min_estimators * factor**k, ending at max_estimators."""
+    budgets = [min_estimators]
+    while budgets[-1] < max_estimators:
+        budgets.append(min(budgets[-1] * factor, max_estimators))
+    return budgets
+
+
+def _grow_fold(X, y, feature_cols, params, model, n_estimators, train_pos, val_pos):
+    """
+    Worker task: grows the fold's warm-started ensemble to `n_estimators` trees (fitting a
+    new one on the first rung) and returns it with its validation MAE.
+    """
+    if model is None:
+        model = GradientBoostingRegressor(**params, warm_start=True)
+    model.set_params(n_estimators=n_estimators)
+    model.fit(pd.DataFrame(X[train_pos], columns=feature_cols), y[train_pos]) # Only adds the new trees
+    y_pred = model.predict(pd.DataFrame(X[val_pos], columns=feature_cols))
+    return model, calculate_regression_metrics(y[val_pos], y_pred)['mae']
+
+
+def tune_velocity_model(features_df, config, n_jobs=None):
+    """
+    Searches velocity_model.tuning.param_space with successive halving over the time series folds.
+    Tunes the 'gbr' backend (the one that grows ensembles with warm_start).
+
+    Candidates are sampled from the space and evaluated on every fold with a small ensemble.
+    Each rung keeps the best 1/factor of them (by mean validation MAE) and grows their
+    ensembles `factor` times larger. The ensembles are warm-started, so a rung only fits the
+    new trees. With n_iter_no_change an ensemble stops growing when its (internal) validation
+    loss does; it keeps that score and is not refitted on later rungs. The fold fits of a
+    rung run in a process pool over the memory-mapped training matrix.
+
+    Args:
+        features_df (pd.DataFrame): Model input features, as for train_velocity_model.
+        config (dict): Configuration ('velocity_model' section with its 'tuning' settings).
+        n_jobs (int, optional): Worker processes; defaults to velocity_model.n_jobs, then all CPUs.
+
+    Returns:
+        dict: {'model_params', 'cv_mae', 'n_candidates', 'budgets'}, or None if there is no training data.
+              'model_params' holds the winner's parameters with the number of trees it settled on.
+    """
+    model_cfg = config.get('velocity_model', {})
+    tuning_cfg = model_cfg.get('tuning') or {}
+    target_metric = model_cfg.get('target_metric', 'actual_velocity')
+    feature_cols = [col for col in model_cfg.get('features', []) if col in features_df.columns]
+    param_space = tuning_cfg.get('param_space') or DEFAULT_PARAM_SPACE
+    factor = tuning_cfg.get('factor', 3)
+    budgets = halving_budgets(tuning_cfg.get('min_estimators', 25), tuning_cfg.get('max_estimators', 400), factor)
+    n_jobs = n_jobs or model_cfg.get('n_jobs') or -1
+    random_state = tuning_cfg.get('random_state', 0)
+
+    train_data = features_df[features_df['state'] == 'closed']
+    train_data = train_data.dropna(subset=[target_metric] + feature_cols).reset_index(drop=True)
+    folds = [(train_idx.to_numpy(), val_idx.to_numpy())
+             for train_idx, val_idx in time_series_split(train_data, date_column='start_date', n_splits=5)]
+    if not folds:
+        logger.error("Not enough training data for the time series folds. Cannot tune.")
+        return None
+
+    # The configured parameters, minus n_estimators (the halving budget), under each candidate
+    base_params = {k: v for k, v in resolve_model_params(config, get_backend("gbr")).items() if k != 'n_estimators'}
+    if tuning_cfg.get('n_iter_no_change'):
+        base_params['n_iter_no_change'] = tuning_cfg['n_iter_no_change']
+    candidates = [{**base_params, **c} for c in ParameterSampler(
+        param_space, n_iter=tuning_cfg.get('n_candidates', 27), random_state=random_state)]
+    logger.info(f"Tuning {len(candidates)} candidates on {len(folds)} folds, ensemble sizes {budgets}, n_jobs={n_jobs}...")
+
+    models = {c: [None] * len(folds) for c in range(len(candidates))}
+    scores = {c: [np.nan] * len(folds) for c in range(len(candidates))}
+    alive = list(range(len(candidates)))
+    with memmapped_training_matrix(train_data[feature_cols], train_data[target_metric]) as (X, y), \
+            Parallel(n_jobs=n_jobs, backend='loky') as parallel: # One pool for all rungs
+        for rung, n_estimators in enumerate(budgets):
+            # Ensembles that stopped early (fewer trees than asked) keep their score
+            jobs = [(c, f) for c in alive for f in range(len(folds))
+                    if models[c][f] is None or models[c][f].n_estimators_ == models[c][f].n_estimators]
+            results = parallel(delayed(_grow_fold)(X, y, feature_cols, candidates[c], models[c][f], n_estimators,
+                                                   *folds[f]) for c, f in jobs)
+            for (c, f), (model, mae) in zip(jobs, results):
+                models[c][f], scores[c][f] = model, mae
+
+            # Stable sort on the mean MAE: ties go to the earlier candidate, so the result is deterministic
+            alive.sort(key=lambda c: np.mean(scores[c]))
+            logger.info(f"Rung {rung + 1}: {len(alive)} candidates at {n_estimators} trees, "
+                        f"best MAE {np.mean(scores[alive[0]]):.4f} ({len(jobs)} fold fits)")
+            if rung < len(budgets) - 1:
+                alive = alive[:max(1, math.ceil(len(alive) / factor))]
+
+    best = alive[0]
+    model_params = {k: v for k, v in candidates[best].items() if k not in SEARCH_ONLY_PARAMS}
+    model_params['n_estimators'] = int(np.median([m.n_estimators_ for m in models[best]]))
+    cv_mae = float(np.mean(scores[best]))
+    logger.info(f"Best parameters (CV MAE {cv_mae:.4f}): {model_params}")
+    return {'model_params': model_params, 'cv_mae': cv_mae, 'n_candidates': len(candidates), 'budgets': budgets}
+
+
+def tune_and_save(features_df, config, n_jobs=None):
+    """
+    Tunes the velocity model and writes the best parameters as a new tuned version, which
+    training uses when velocity_model.use_tuned_params is set.
+
+    Returns:
+        Path: The versioned parameters file, or None if tuning failed.
+    """
+    result = tune_velocity_model(features_df, config, n_jobs=n_jobs)
+    if result is None:
+        return None
+    metadata = {
+        'created_at': pd.Timestamp.now().isoformat(timespec='seconds'),
+        'cv_mae': round(result['cv_mae'], 6),
+        'n_candidates': result['n_candidates'],
+        'budgets': result['budgets'],
+    }
+    model_params = {k: v.item() if isinstance(v, np.generic) else v for k, v in result['model_params'].items()}
+    return save_tuned_params(config, model_params, metadata)
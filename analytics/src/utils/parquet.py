@@ -0,0 +1,59 @@
+import shutil
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pathlib import Path
+
+
+def arrow_schema(df):
+    """Arrow schema for a DataFrame, typing all-null object columns as strings.
+
+    Batches written one after another must share a schema; a batch where e.g. every
+    'resolution' is None would otherwise be inferred as the null type. Categorical columns
+    get 32-bit dictionary indices so later batches with more categories still fit.
+    """
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(schema):
+        if pa.types.is_null(field.type):
+            schema = schema.set(i, pa.field(field.name, pa.string()))
+        elif pa.types.is_dictionary(field.type):
+            value_type = pa.string() if pa.types.is_null(field.type.value_type) else field.type.value_type
+            schema = schema.set(i, pa.field(field.name, pa.dictionary(pa.int32(), value_type)))
+    return schema
+
+
+def remove_path(path):
+    """Deletes the file or directory at `path`, if any."""
+    path = Path(path)
+    if path.is_dir():
+        shutil.rmtree(path)
+    elif path.exists():
+        path.unlink()
+
+
+def write_partitions(df, path, partition_cols, schema=None, replace=False):
+    """
+    Writes `df` to the hive-partitioned Parquet dataset at `path`.
+
+    With replace=True the partitions `df` has rows for are replaced (the others are left
+    alone), otherwise a new file is added to each of them. `schema` defaults to the schema of
+    the existing dataset, so the files of all partitions stay readable as one dataset.
+    """
+    path = Path(path)
+    if schema is None:
+        schema = ds.dataset(path, format="parquet", partitioning="hive").schema if path.is_dir() else arrow_schema(df)
+    # The partition columns are read back from the directory names
+    df = df.astype({col: 'category' for col in partition_cols})
+    columns = [name for name in schema.names if name not in partition_cols]
+    table = pa.Table.from_pandas(df[columns + list(partition_cols)], preserve_index=False,
+                                 schema=pa.schema([schema.field(name) for name in columns]
+                                                  + [pa.field(col, pa.dictionary(pa.int32(), pa.string()))
+                                                     for col in partition_cols]))
+    pq.write_to_dataset(table, path, partition_cols=list(partition_cols),
+                        existing_data_behavior='delete_matching' if replace else 'overwrite_or_ignore')
+
+
+def write_partitioned_dataset(df, path, partition_cols):
+    """Replaces whatever is at `path` (a file or a dataset) with a hive-partitioned dataset of `df`."""
+    remove_path(path)
+    write_partitions(df, path, partition_cols, schema=arrow_schema(df))
@@ -0,0 +1,55 @@
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def load_projects_from_database(database_url):
+    """
+    Reads the configured projects from the backend database.
+
+    Returns:
+        list[dict]: One {'project_key', 'api_token'} dict per row of `projects_configurations`.
+    """
+    try:
+        import psycopg2 # Optional dependency, only needed when reading projects from the backend DB
+    except ImportError:
+        logger.error("psycopg2 is required to read projects from the database (pip install psycopg2-binary).")
+        return []
+
+    with psycopg2.connect(database_url) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT project_key, api_token FROM projects_configurations ORDER BY project_key")
+            rows = cur.fetchall()
+    return [{'project_key': key, 'api_token': token} for key, token in rows]
+
+
+def discover_projects_in_raw_data(raw_dir):
+    """Lists the project keys of a raw dataset partitioned by project_key (issues/project_key=XXX)."""
+    issues_dir = Path(raw_dir) / "issues"
+    if not issues_dir.is_dir():
+        return []
+    return sorted(p.name.split("=", 1)[1] for p in issues_dir.glob("project_key=*") if p.is_dir())
+
+
+def load_projects(config):
+    """
+    Lists the projects the pipeline should run for.
+
+    Uses, in order: the backend database (`projects.database_url`), the explicit
+    `projects.keys` list, or the project partitions found in `paths.raw_data_dir`.
+
+    Returns:
+        list[dict]: One dict per project with at least 'project_key' (and 'api_token' when known).
+    """
+    projects_cfg = config.get('projects') or {}
+    if projects_cfg.get('database_url'):
+        projects = load_projects_from_database(projects_cfg['database_url'])
+        logger.info(f"Loaded {len(projects)} projects from the database.")
+        return projects
+    if projects_cfg.get('keys'):
+        return [{'project_key': key} for key in projects_cfg['keys']]
+    raw_dir = config.get('paths', {}).get('raw_data_dir', 'data/raw')
+    keys = discover_projects_in_raw_data(raw_dir)
+    logger.info(f"Discovered {len(keys)} projects in {raw_dir}.")
+    return [{'project_key': key} for key in keys]
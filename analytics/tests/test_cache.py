@@ -0,0 +1,60 @@
+import pytest
+
+from src.inference import cache as cache_module
+from src.inference.cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = TTLCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1 # 'b' is now the least recently used
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.stats() == {'hits': 3, 'misses': 1, 'hit_rate': 0.75, 'evictions': 1, 'expirations': 0,
+                             'size': 2, 'maxsize': 2}
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = TTLCache(maxsize=4, ttl=60)
+    cache.set('a', 1)
+    clock[0] += 30
+    cache.set('b', 2)
+    clock[0] += 30 # 'a' is 60s old
+    assert cache.get('a') is None
+    assert cache.get('b') == 2 # Reads do not extend the TTL
+    clock[0] += 30
+    assert cache.get('b') is None
+    assert cache.stats()['expirations'] == 2 and len(cache) == 0
+
+
+def test_get_or_set_computes_once_and_skips_none(clock):
+    cache = TTLCache(maxsize=4)
+    calls = []
+    assert cache.get_or_set('a', lambda: calls.append('a') or 1) == 1
+    assert cache.get_or_set('a', lambda: calls.append('a') or 2) == 1
+    assert cache.get_or_set('none', lambda: calls.append('none')) is None
+    assert cache.get_or_set('none', lambda: calls.append('none')) is None
+    assert calls == ['a', 'none', 'none'] # A failed load (None) is retried
+
+
+def test_invalidate_drops_matching_keys(clock):
+    cache = TTLCache(maxsize=8)
+    for version in ('v1', 'v2'):
+        cache.set(('velocity_gbr', version), version)
+        cache.set(('velocity_hgb', version), version)
+
+    assert cache.invalidate(lambda key: key[0] == 'velocity_gbr') == 2
+    assert cache.get(('velocity_gbr', 'v1')) is None
+    assert cache.get(('velocity_hgb', 'v2')) == 'v2'
+    cache.clear()
+    assert len(cache) == 0
@@ -0,0 +1,83 @@
+import pytest
+
+from src.pipeline.dag import Pipeline, Stage
+from src.pipeline.stages import default_stages
+
+CALLS = []
+
+
+def _copy_upper(config):
+    """Stage 'upper': data/input.txt -> out/upper.txt, upper-cased (and config 'suffix' appended)."""
+    root = config['root']
+    CALLS.append('upper')
+    (root / "upper.txt").write_text((root / "input.txt").read_text().upper() + config['text']['suffix'])
+
+
+def _count(config):
+    """Stage 'count': out/upper.txt -> out/count.txt, its length."""
+    root = config['root']
+    CALLS.append('count')
+    (root / "count.txt").write_text(str(len((root / "upper.txt").read_text())))
+
+
+def _pipeline(root, suffix="!"):
+    config = {'root': root, 'text': {'suffix': suffix, 'unused': 1}}
+    stages = [
+        Stage("count", _count, inputs=[root / "upper.txt"], outputs=[root / "count.txt"]),
+        Stage("upper", _copy_upper, inputs=[root / "input.txt"], outputs=[root / "upper.txt"],
+              config_sections=["text.suffix"]),
+    ]
+    return Pipeline(stages, config, root / "state.json")
+
+
+@pytest.fixture
+def root(tmp_path):
+    CALLS.clear()
+    (tmp_path / "input.txt").write_text("abc")
+    return tmp_path
+
+
+def test_unchanged_stages_are_skipped(root):
+    assert _pipeline(root).run() == {'upper': 'ran', 'count': 'ran'}
+    assert CALLS == ['upper', 'count'] # In dependency order
+    assert _pipeline(root).run() == {'upper': 'skipped', 'count': 'skipped'}
+    assert (root / "count.txt").read_text() == "4"
+
+
+def test_changed_inputs_rerun_the_stage_and_its_dependents(root):
+    _pipeline(root).run()
+    (root / "input.txt").write_text("abcd")
+    assert _pipeline(root).run() == {'upper': 'ran', 'count': 'ran'}
+    assert (root / "count.txt").read_text() == "5"
+    # Same contents again (e.g. a file rewritten as it was): the dependent stage is still current
+    (root / "input.txt").write_text("ABCD")
+    assert _pipeline(root).run() == {'upper': 'ran', 'count': 'skipped'}
+
+
+def test_config_sections_and_outputs_invalidate(root):
+    _pipeline(root).run()
+    # Only the declared (dotted) config path is part of the key
+    pipeline = _pipeline(root)
+    pipeline.config['text']['unused'] = 2
+    assert pipeline.run() == {'upper': 'skipped', 'count': 'skipped'}
+    assert _pipeline(root, suffix="?").run() == {'upper': 'ran', 'count': 'ran'}
+    # An output changed or deleted behind the pipeline's back is rebuilt
+    (root / "count.txt").write_text("tampered")
+    assert _pipeline(root, suffix="?").run() == {'upper': 'skipped', 'count': 'ran'}
+    (root / "upper.txt").unlink()
+    assert _pipeline(root, suffix="?").run() == {'upper': 'ran', 'count': 'skipped'}
+    assert _pipeline(root, suffix="?").run(force=['count']) == {'upper': 'skipped', 'count': 'ran'}
+
+
+def test_default_stages_branch_after_preprocessing(tmp_path):
+    paths = {'raw_data_dir': tmp_path / "raw", 'processed_data_dir': tmp_path / "processed",
+             'features_dir': tmp_path / "features", 'models_dir': tmp_path / "models"}
+    config = {'paths': paths, 'velocity_model': {'backend': 'gbr', 'use_tuned_params': False}}
+    dependencies = Pipeline(default_stages(config), config, tmp_path / "state.json").dependencies
+
+    assert dependencies['preprocess'] == {'mock_data'} # No raw dataset yet
+    # Both aggregates read the processed tables and the raw transitions, not each other
+    assert dependencies['scope'] == dependencies['burndown'] == {'mock_data', 'preprocess'}
+    assert dependencies['build_features'] == {'preprocess', 'scope'}
+    # Nothing waits on the burndown series
+    assert all('burndown' not in deps for deps in dependencies.values())
@@ -0,0 +1,33 @@
+import pandas as pd
+
+from src.feature_engineering.feature_store import FeatureStore
+
+
+def _features(velocity_last_1):
+    return pd.DataFrame({
+        'project_key': ['PROJ', 'PROJ'],
+        'board_id': [1, 1],
+        'sprint_id': [1, 2],
+        'start_date': pd.to_datetime(['2024-01-01', '2024-01-15']),
+        'avg_velocity_last_1_sprints': [float('nan'), velocity_last_1],
+        'planned_story_points': [30.0, 35.0],
+    })
+
+
+def test_training_set_sees_corrected_values(tmp_path):
+    store = FeatureStore(tmp_path / "feature_store")
+    closed = _features(20.0).drop(columns=['avg_velocity_last_1_sprints', 'planned_story_points'])
+    closed['actual_velocity'] = [20.0, 25.0]
+
+    assert store.materialize(_features(20.0), as_of="2024-02-01") == 2
+    # Regenerated data corrects the velocity of sprint 1, and so the features of sprint 2
+    assert store.materialize(_features(22.0), as_of="2024-03-01") == 1
+    assert store.materialize(_features(22.0), as_of="2024-03-02") == 0 # Unchanged values add no rows
+
+    latest = store.training_set(closed)
+    assert latest['avg_velocity_last_1_sprints'].tolist()[1] == 22.0
+    assert latest['actual_velocity'].tolist() == [20.0, 25.0]
+    assert store.training_set(closed, as_of="2024-02-15")['avg_velocity_last_1_sprints'].tolist()[1] == 20.0
+    assert store.training_set(closed, as_of='start_date')['avg_velocity_last_1_sprints'].tolist()[1] == 20.0
+    # Nothing was known about sprint 2 before its values were first materialized
+    assert store.training_set(closed, as_of="2024-01-10")['planned_story_points'].isna().tolist() == [False, True]
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+
+from src.feature_engineering.features import generate_historical_velocity_features, historical_feature_columns
+
+WINDOWS = [1, 3, 5]
+
+
+def _team_loop(sprints_df, windows):
+    """Reference: the features of each team computed on its own, one series at a time."""
+    teams = []
+    for _, team in sprints_df.groupby(['project_key', 'board_id']):
+        team = team.sort_values('start_date').copy()
+        shifted = team['actual_velocity'].shift(1)
+        for w in windows:
+            team[f"avg_velocity_last_{w}_sprints"] = shifted.rolling(window=w, min_periods=1).mean()
+            if w > 1:
+                team[f"median_velocity_last_{w}_sprints"] = shifted.rolling(window=w, min_periods=1).median()
+                team[f"std_velocity_last_{w}_sprints"] = shifted.rolling(window=w, min_periods=1).std()
+                team[f"ewm_velocity_span_{w}_sprints"] = shifted.ewm(span=w, min_periods=1).mean()
+        teams.append(team)
+    return pd.concat(teams)
+
+
+def _sprints(seed=0):
+    """Three teams of different lengths with interleaved (partly equal) start dates, in shuffled order."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i, (project_key, board_id, n) in enumerate([('ALPHA', 1, 12), ('ALPHA', 2, 7), ('BETA', 1, 9)]):
+        frames.append(pd.DataFrame({
+            'project_key': project_key,
+            'board_id': board_id,
+            'sprint_id': np.arange(n) + 100 * i,
+            'start_date': pd.Timestamp("2024-01-01") + pd.to_timedelta(14 * np.arange(n) + 7 * (i % 2), unit='D'),
+            'actual_velocity': rng.integers(10, 60, n).astype(float),
+        }))
+    sprints_df = pd.concat(frames, ignore_index=True)
+    return sprints_df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def test_grouped_rolling_matches_the_per_team_loop():
+    sprints_df = _sprints()
+    result = generate_historical_velocity_features(sprints_df, windows=WINDOWS)
+    expected = _team_loop(sprints_df, WINDOWS)
+
+    assert result['start_date'].is_monotonic_increasing
+    columns = ['sprint_id', *historical_feature_columns(WINDOWS)]
+    pdt.assert_frame_equal(result[columns].sort_values('sprint_id').reset_index(drop=True),
+                           expected[columns].sort_values('sprint_id').reset_index(drop=True))
+    # A team's first sprint has no history, whatever the other teams did before it
+    first_sprints = result.sort_values('start_date').groupby(['project_key', 'board_id']).head(1)
+    assert first_sprints['avg_velocity_last_1_sprints'].isna().all()
+
+
+def test_frames_without_team_columns_are_one_series():
+    sprints_df = _sprints().drop(columns=['project_key', 'board_id'])
+    result = generate_historical_velocity_features(sprints_df, windows=[3])
+
+    shifted = sprints_df.sort_values('start_date', kind='mergesort')['actual_velocity'].shift(1)
+    expected = shifted.rolling(window=3, min_periods=1).mean()
+    pdt.assert_series_equal(result['avg_velocity_last_3_sprints'], expected, check_names=False)
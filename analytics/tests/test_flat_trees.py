@@ -0,0 +1,113 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor
+from sklearn.linear_model import Ridge
+
+from src.modeling.flat_trees import (
+    ARRAY_NAMES, LEAF, PREDICT_CHUNK_CELLS, FlatTreeEnsemble, export_flat_trees, save_flat_trees
+)
+from src.modeling.registry import get_backend, load_flat_model, save_model
+
+
+def _data(n=400, nan=False, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.uniform(0, 50, (n, 4)), columns=['a', 'b', 'c', 'd'])
+    y = X['a'] * 0.6 - X['b'] * 0.2 + rng.normal(0, 3, n)
+    if nan:
+        X.loc[rng.random(n) < 0.15, 'b'] = np.nan
+        X.loc[rng.random(n) < 0.05, 'c'] = np.nan
+    return X, y
+
+
+MODELS = {
+    'gbr_squared_error': lambda: GradientBoostingRegressor(n_estimators=60, max_depth=4, random_state=0),
+    'gbr_huber': lambda: GradientBoostingRegressor(loss='huber', n_estimators=40, max_depth=3, random_state=0),
+    'gbr_absolute_error': lambda: GradientBoostingRegressor(loss='absolute_error', n_estimators=40, random_state=0),
+    'gbr_zero_init': lambda: GradientBoostingRegressor(init='zero', n_estimators=30, random_state=0),
+    'hist_gbr': lambda: HistGradientBoostingRegressor(max_iter=60, max_leaf_nodes=15, random_state=0),
+}
+# scikit-learn's GradientBoostingRegressor does not accept NaN
+CASES = [(name, False) for name in MODELS] + [('hist_gbr', True)]
+
+
+@pytest.mark.parametrize('name, nan', CASES)
+def test_predictions_match_sklearn(name, nan):
+    X, y = _data(nan=nan)
+    model = MODELS[name]().fit(X, y)
+    X_test, _ = _data(n=300, nan=nan, seed=1)
+    flat = FlatTreeEnsemble.from_model(model)
+    np.testing.assert_allclose(flat.predict(X_test), model.predict(X_test), rtol=1e-10, atol=1e-9)
+    # Single rows, and more rows than one chunk of the traversal
+    np.testing.assert_allclose(flat.predict(X_test.iloc[:1]), model.predict(X_test.iloc[:1]), rtol=1e-10, atol=1e-9)
+    X_large = pd.concat([X_test] * (PREDICT_CHUNK_CELLS // (300 * flat.meta['n_trees']) + 2), ignore_index=True)
+    np.testing.assert_allclose(flat.predict(X_large), model.predict(X_large), rtol=1e-10, atol=1e-9)
+
+
+def test_models_that_cannot_be_flattened():
+    X, y = _data()
+    assert export_flat_trees(Ridge().fit(X, y)) is None
+    assert export_flat_trees(GradientBoostingRegressor(init=Ridge(), n_estimators=5).fit(X, y)) is None
+    assert export_flat_trees(HistGradientBoostingRegressor(loss='poisson', max_iter=5).fit(X, y.clip(0))) is None
+
+
+def test_wrong_number_of_features():
+    X, y = _data()
+    flat = FlatTreeEnsemble.from_model(MODELS['gbr_squared_error']().fit(X, y))
+    with pytest.raises(ValueError):
+        flat.predict(X[['a', 'b']])
+
+
+@pytest.mark.parametrize('name, backend, nan', [('gbr_squared_error', 'gbr', False), ('hist_gbr', 'hist_gbr', True)])
+def test_saved_version_is_memory_mapped(tmp_path, name, backend, nan):
+    X, y = _data(nan=nan)
+    model = MODELS[name]().fit(X, y)
+    save_model(tmp_path, 'velocity', model, list(X.columns), get_backend(backend))
+
+    flat, features, manifest = load_flat_model(tmp_path, 'velocity')
+    assert features == list(X.columns)
+    np.testing.assert_allclose(flat.predict(X), model.predict(X), rtol=1e-10, atol=1e-9)
+    assert all(isinstance(flat.arrays[array_name].base, np.memmap) for array_name in ARRAY_NAMES)
+
+
+def _legacy_layout(arrays):
+    """The arrays as saved before compile_children: leaves' children LEAF, trees in node order, no depths."""
+    nodes = np.arange(len(arrays['left']))
+    return {
+        'feature': arrays['feature'], 'threshold': arrays['threshold'], 'value': arrays['value'],
+        'missing_left': arrays['missing_left'],
+        'left': np.where(arrays['left'] == nodes, LEAF, arrays['left']).astype(np.int32),
+        'right': np.where(arrays['right'] == nodes, LEAF, arrays['right']).astype(np.int32),
+        'roots': np.sort(arrays['roots']),
+    }
+
+
+@pytest.mark.parametrize('name, nan', [('gbr_squared_error', False), ('hist_gbr', True)])
+def test_legacy_uncompiled_arrays_are_compiled_on_load(tmp_path, name, nan):
+    X, y = _data(nan=nan)
+    model = MODELS[name]().fit(X, y)
+    arrays, meta = export_flat_trees(model)
+    legacy = _legacy_layout(arrays)
+    # Every array but 'depths', as the first saved versions have them
+    directory = tmp_path / "trees"
+    directory.mkdir()
+    for array_name, array in legacy.items():
+        np.save(directory / f"{array_name}.npy", array)
+    # As read back from the manifest
+    legacy_meta = json.loads(json.dumps({k: v for k, v in meta.items() if k != 'max_depth'}))
+
+    flat = FlatTreeEnsemble(directory, legacy_meta)
+    np.testing.assert_allclose(flat.predict(X), model.predict(X), rtol=1e-10, atol=1e-9)
+    assert flat.meta['max_depth'] == meta['max_depth']
+    np.testing.assert_array_equal(flat.arrays['depths'], arrays['depths'])
+
+
+def test_compiled_arrays_round_trip(tmp_path):
+    X, y = _data()
+    model = MODELS['gbr_huber']().fit(X, y)
+    arrays, meta = export_flat_trees(model)
+    save_flat_trees(arrays, tmp_path / "trees")
+    flat = FlatTreeEnsemble(tmp_path / "trees", meta)
+    np.testing.assert_allclose(flat.predict(X), model.predict(X), rtol=1e-10, atol=1e-9)
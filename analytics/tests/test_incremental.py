@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils.config import load_config
+from src.utils.parquet import write_partitions, write_partitioned_dataset
+from src.data_processing.mock_data_generator import write_mock_dataset
+from src.data_processing.schema import ISSUE_SCHEMA, PROCESSED_ISSUES_FILE, read_compact_parquet
+from src.data_processing.streaming import preprocess_streaming, read_raw_table
+from src.data_processing.incremental import issue_content_hashes, preprocess_incremental
+from src.feature_engineering.scope import SCOPE_FILE, parse_sprint_lists
+from src.feature_engineering.burndown import DAILY_SERIES_FILE, read_daily_sprint_series
+
+
+@pytest.fixture
+def raw_dir(tmp_path):
+    raw_dir = tmp_path / "raw"
+    write_mock_dataset(raw_dir, num_sprints=8, issues_per_sprint=10, seed=7)
+    return raw_dir
+
+
+def _read_scope(output_dir):
+    return pd.read_parquet(output_dir / SCOPE_FILE).sort_values('sprint_id', ignore_index=True)
+
+
+def test_incremental_scope_matches_a_full_run(raw_dir, tmp_path):
+    config = load_config()
+    incremental_dir = tmp_path / "incremental"
+    preprocess_incremental(raw_dir, incremental_dir, config) # Initial full run
+    scope = _read_scope(incremental_dir)
+    sprint_id = int(scope.loc[scope['carried_over_story_points'] > 0, 'sprint_id'].iloc[-1])
+
+    # A new status transition of an issue that was in no other sprint: the sprints the carried
+    # over issues came from are not affected by it
+    transitions = read_raw_table(raw_dir, "status_transitions")
+    events = transitions[transitions['field'] == 'sprint']
+    rows, ids = parse_sprint_lists(pd.concat([events['from_status'], events['to_status']], ignore_index=True))
+    memberships = pd.DataFrame({'issue_id': np.tile(events['issue_id'].to_numpy(), 2)[rows], 'sprint_id': ids})
+    sprints_per_issue = memberships.groupby('issue_id')['sprint_id'].nunique()
+    in_sprint = memberships.loc[memberships['sprint_id'] == sprint_id, 'issue_id']
+    issue_id = int(in_sprint[in_sprint.map(sprints_per_issue) == 1].iloc[0])
+    last = transitions[(transitions['issue_id'] == issue_id) & (transitions['field'] == 'status')].iloc[-1]
+    new_transition = pd.DataFrame({
+        'issue_id': [issue_id], 'field': ['status'], 'from_status': [last['to_status']],
+        'to_status': [last['to_status']], 'timestamp': [transitions['timestamp'].max() + pd.Timedelta(hours=1)],
+        'project_key': [str(last['project_key'])],
+    })
+    write_partitions(new_transition, raw_dir / "status_transitions", ['project_key'])
+
+    counts = preprocess_incremental(raw_dir, incremental_dir, config)
+    full_dir = tmp_path / "full"
+    preprocess_streaming(raw_dir, full_dir, config)
+
+    assert counts['changed_issues'] == 1
+    pd.testing.assert_frame_equal(_read_scope(incremental_dir), _read_scope(full_dir), check_dtype=False)
+    assert _read_scope(incremental_dir).set_index('sprint_id').loc[sprint_id, 'carried_over_story_points'] > 0
+
+
+def test_active_sprint_series_grow_without_changes_of_their_own(tmp_path):
+    config = load_config()
+    raw_dir = tmp_path / "raw"
+    write_mock_dataset(raw_dir, num_projects=2, num_sprints=8, issues_per_sprint=10, seed=7, now="2023-04-10")
+    # The data as of the middle of the active sprints
+    transitions = read_raw_table(raw_dir, "status_transitions")
+    transitions['project_key'] = transitions['project_key'].astype(str)
+    write_partitioned_dataset(transitions[transitions['timestamp'] < "2023-04-07"], raw_dir / "status_transitions",
+                              ['project_key'])
+    incremental_dir = tmp_path / "incremental"
+    preprocess_incremental(raw_dir, incremental_dir, config)
+
+    # Three days later, one transition of an issue of a closed sprint of the second project only
+    sprints = read_raw_table(raw_dir, "sprints")
+    active = sprints.loc[(sprints['state'] == 'active') & (sprints['project_key'].astype(str) == 'PROJ1'), 'sprint_id']
+    closed_issue = transitions[(transitions['project_key'] == 'PROJ2') & (transitions['field'] == 'status')].iloc[0]
+    write_partitions(closed_issue.to_frame().T.assign(timestamp=pd.Timestamp("2023-04-09 12:00")).astype(
+        {'issue_id': transitions['issue_id'].dtype}), raw_dir / "status_transitions", ['project_key'])
+    preprocess_incremental(raw_dir, incremental_dir, config)
+    full_dir = tmp_path / "full"
+    preprocess_streaming(raw_dir, full_dir, config)
+
+    series = read_daily_sprint_series(incremental_dir / DAILY_SERIES_FILE, sprint_ids=active)
+    assert series['date'].max() == pd.Timestamp("2023-04-09")
+    pd.testing.assert_frame_equal(
+        series.sort_values(['sprint_id', 'date'], ignore_index=True),
+        read_daily_sprint_series(full_dir / DAILY_SERIES_FILE, sprint_ids=active).sort_values(['sprint_id', 'date'],
+                                                                                             ignore_index=True),
+        check_dtype=False, check_categorical=False
+    )
+
+
+def test_deleted_raw_issues_are_removed(raw_dir, tmp_path):
+    config = load_config()
+    incremental_dir = tmp_path / "incremental"
+    preprocess_incremental(raw_dir, incremental_dir, config)
+
+    issues = read_raw_table(raw_dir, "issues")
+    issues['project_key'] = issues['project_key'].astype(str)
+    # An issue without story points: the mean imputed for the others stays the same
+    deleted_id = int(issues.loc[(issues['status'] == 'Done') & issues['story_points'].isna(), 'issue_id'].iloc[0])
+    write_partitions(issues[issues['issue_id'] != deleted_id], raw_dir / "issues", ['project_key'], replace=True)
+
+    counts = preprocess_incremental(raw_dir, incremental_dir, config)
+    full_dir = tmp_path / "full"
+    preprocess_streaming(raw_dir, full_dir, config)
+
+    assert counts['deleted_issues'] == 1 and counts['edited_issues'] == 0
+    processed_ids = read_compact_parquet(incremental_dir / PROCESSED_ISSUES_FILE, ISSUE_SCHEMA,
+                                         columns=['issue_id'])['issue_id']
+    assert deleted_id not in set(processed_ids) and len(processed_ids) == len(issues) - 1
+    pd.testing.assert_frame_equal(_read_scope(incremental_dir), _read_scope(full_dir), check_dtype=False)
+    velocity = [pd.read_parquet(d / "closed_sprints_with_velocity.parquet").sort_values('sprint_id', ignore_index=True)
+                for d in (incremental_dir, full_dir)]
+    pd.testing.assert_frame_equal(velocity[0], velocity[1][velocity[0].columns], check_dtype=False)
+
+
+def test_only_changed_raw_files_are_hashed_again(tmp_path):
+    raw_dir = tmp_path / "raw"
+    write_mock_dataset(raw_dir, num_projects=2, num_sprints=4, issues_per_sprint=10, seed=7)
+    hashes = issue_content_hashes(raw_dir)
+    assert set(hashes['file'].str.split('/').str[0]) == {'project_key=PROJ1', 'project_key=PROJ2'}
+    # Stored hashes of the unchanged files are reused as they are, without reading the files
+    previous = hashes.assign(row_hash=np.uint64(0))
+
+    issues = read_raw_table(raw_dir, "issues")
+    issues['project_key'] = issues['project_key'].astype(str)
+    edited = issues[issues['project_key'] == 'PROJ2'].assign(summary="Edited")
+    write_partitions(edited, raw_dir / "issues", ['project_key'], replace=True)
+    rehashed = issue_content_hashes(raw_dir, previous_hashes_df=previous)
+
+    in_proj1 = rehashed['file'].str.startswith('project_key=PROJ1/')
+    assert (rehashed.loc[in_proj1, 'row_hash'] == 0).all() and in_proj1.sum() == (issues['project_key'] == 'PROJ1').sum()
+    assert (rehashed.loc[~in_proj1, 'row_hash'] != 0).all()
+    assert not rehashed.loc[~in_proj1, 'row_hash'].isin(hashes['row_hash']).any()
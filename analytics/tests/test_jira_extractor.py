@@ -0,0 +1,143 @@
+import httpx
+import pytest
+
+from src.data_processing import jira_extractor
+from src.data_processing.jira_extractor import JiraExtractor, SEARCH_PATH, BOARDS_PATH, MYSELF_PATH
+from src.data_processing.raw_cache import RawCache
+
+CONFIG = {
+    'jira': {'base_url': "https://jira.test", 'page_size': 2, 'max_retries': 3, 'backoff_s': 0.01},
+    'jira_field_names': {'story_points': "customfield_10016", 'sprint': "customfield_10020"},
+}
+
+
+def _issue(issue_id):
+    return {
+        "id": str(issue_id), "key": f"PROJ-{issue_id}",
+        "fields": {"status": {"name": "Done"}, "summary": f"Issue {issue_id}", "created": "2024-01-01T09:00:00.000+0000",
+                   "updated": "2024-01-05T09:00:00.000+0000", "customfield_10016": 3,
+                   "customfield_10020": [{"id": 11}]},
+        "changelog": {"total": 1, "histories": [{"created": "2024-01-03T09:00:00.000+0000", "items": [
+            {"field": "status", "fromString": "To Do", "toString": "Done"}]}]},
+    }
+
+
+class StubJira:
+    """Stub Jira server: 5 issues in pages of 2, sprints in pages without a total."""
+
+    def __init__(self, timezone="America/Los_Angeles"):
+        self.requests = []
+        self.throttled = False
+        self.timed_out = False
+        self.timezone = timezone
+
+    def __call__(self, request):
+        self.requests.append(request)
+        path, params = request.url.path, request.url.params
+        start = int(params.get("startAt", 0))
+        if path == MYSELF_PATH:
+            return httpx.Response(200, json={"timeZone": self.timezone})
+        if path == BOARDS_PATH:
+            return httpx.Response(200, json={"values": [{"id": 1, "type": "scrum"}], "isLast": True})
+        if path == f"{BOARDS_PATH}/1/sprint":
+            if not self.throttled:
+                self.throttled = True
+                return httpx.Response(429, headers={"Retry-After": "2"})
+            sprints = [{"id": i, "originBoardId": 1, "state": "closed", "startDate": "2024-01-01T09:00:00.000Z"}
+                       for i in (10, 11, 12)]
+            page = sprints[start:start + 2]
+            return httpx.Response(200, json={"values": page, "isLast": start + 2 >= len(sprints)})
+        if path == SEARCH_PATH:
+            if start == 2 and not self.timed_out:
+                self.timed_out = True
+                raise httpx.ReadTimeout("timed out", request=request)
+            issues = [_issue(i) for i in range(1, 6)]
+            return httpx.Response(200, json={"issues": issues[start:start + 2], "total": len(issues), "maxResults": 2})
+        return httpx.Response(404)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Records the backoff delays instead of sleeping."""
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(jira_extractor.asyncio, "sleep", fake_sleep)
+    return delays
+
+
+def test_extract_paginates_and_retries(sleeps):
+    stub = StubJira()
+    extractor = JiraExtractor(CONFIG, "PROJ", api_token="token", transport=httpx.MockTransport(stub))
+
+    sprints_df, issues_df, transitions_df = extractor.extract()
+
+    assert sprints_df['sprint_id'].tolist() == [10, 11, 12]
+    assert issues_df['issue_id'].tolist() == [1, 2, 3, 4, 5]
+    assert issues_df['sprint_id'].tolist() == [11] * 5
+    assert len(transitions_df) == 10 # A creation row and one status change per issue
+    assert stub.throttled and stub.timed_out
+    # Retry-After wins over the exponential backoff (plus at most backoff_s of jitter)
+    assert any(2 <= delay <= 2 + CONFIG['jira']['backoff_s'] for delay in sleeps)
+    assert len(sleeps) == 2
+    search_starts = sorted(int(r.url.params["startAt"]) for r in stub.requests if r.url.path == SEARCH_PATH)
+    assert search_starts == [0, 2, 2, 4] # The timed out page was requested again
+    assert all(r.headers["Authorization"] == "Bearer token" for r in stub.requests)
+
+
+def test_get_raises_once_retries_are_exhausted(sleeps):
+    paths = []
+
+    def always_timeout(request):
+        paths.append(request.url.path)
+        raise httpx.ConnectTimeout("timed out", request=request)
+
+    extractor = JiraExtractor(CONFIG, "PROJ", api_token="token", transport=httpx.MockTransport(always_timeout))
+
+    with pytest.raises(httpx.ConnectTimeout):
+        extractor.extract()
+    # The first attempt and max_retries retries
+    assert paths.count(BOARDS_PATH) == CONFIG['jira']['max_retries'] + 1
+
+
+def test_revalidation_jql_uses_the_profile_time_zone(sleeps, tmp_path):
+    stub = StubJira()
+    cache = RawCache(tmp_path / "jira_cache")
+    JiraExtractor(CONFIG, "PROJ", api_token="token", transport=httpx.MockTransport(stub), cache=cache).extract()
+    stub.requests.clear()
+
+    _, issues_df, _ = JiraExtractor(CONFIG, "PROJ", api_token="token", transport=httpx.MockTransport(stub),
+                                    cache=cache).extract()
+
+    searches = [r.url.params["jql"] for r in stub.requests if r.url.path == SEARCH_PATH]
+    # The latest cached update, 2024-01-05 09:00 UTC, is 01:00 in Los Angeles
+    assert searches and all('updated >= "2024/01/05 01:00"' in jql for jql in searches)
+    assert issues_df['issue_id'].tolist() == [1, 2, 3, 4, 5] # Refetched issues replace the cached ones
+    # The appended pages are compacted: as many pages as after the first sync
+    assert len(cache.load_index("PROJ")['endpoints']['issues']) == 3
+
+
+def test_jql_datetime_without_a_known_time_zone_moves_back():
+    extractor = JiraExtractor(CONFIG, "PROJ", api_token="token")
+
+    assert extractor.jql_datetime("2024-01-05T09:00:00.000+0100", "Asia/Tokyo") == "2024/01/05 17:00"
+    assert extractor.jql_datetime("2024-01-05T09:00:00.000+0000", None) == "2024/01/04 21:00"
+    assert extractor.jql_datetime("2024-01-05 09:00", "Not/AZone") == "2024/01/04 21:00"
+
+
+def test_changelog_field_names_are_case_insensitive():
+    issue = _issue(1)
+    issue["changelog"]["histories"] = [
+        {"created": "2024-01-02T09:00:00.000+0000", "items": [
+            {"field": "Status", "fromString": "Open", "toString": "In Progress"}]},
+        {"created": "2024-01-03T09:00:00.000+0000", "items": [
+            {"field": "Sprint", "from": "", "to": "11"},
+            {"field": "status", "fromString": "In Progress", "toString": "Done"}]},
+    ]
+    transitions_df = JiraExtractor(CONFIG, "PROJ", api_token="token").build_transitions_df([issue])
+
+    assert transitions_df['field'].astype(str).tolist() == ['status', 'status', 'sprint', 'status']
+    # The initial status comes from the first status change, whatever the case of its field name
+    assert transitions_df['to_status'].astype(str).tolist()[:2] == ['Open', 'In Progress']
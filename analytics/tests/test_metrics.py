@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics import mean_absolute_error, mean_squared_error
+
+from src.evaluation.metrics import RegressionMetricsAccumulator, calculate_regression_metrics
+
+
+def _reference_metrics(y_true, y_pred):
+    """calculate_regression_metrics as it was before the accumulator."""
+    y_true = np.array(y_true, dtype=np.float64).flatten()
+    y_pred = np.array(y_pred, dtype=np.float64).flatten()
+    valid = np.isfinite(y_true) & np.isfinite(y_pred)
+    y_true, y_pred = y_true[valid], y_pred[valid]
+    if len(y_true) == 0:
+        return {'mae': np.nan, 'rmse': np.nan, 'mape': np.nan}
+    mask = y_true != 0
+    mape = np.mean(np.abs((y_true[mask] - y_pred[mask]) / y_true[mask])) * 100 if np.any(mask) else np.nan
+    return {'mae': mean_absolute_error(y_true, y_pred), 'rmse': np.sqrt(mean_squared_error(y_true, y_pred)),
+            'mape': mape}
+
+
+@pytest.mark.parametrize('y_true, y_pred', [
+    ([10, 20, 30, 40, 50], [12, 18, 33, 38, 55]),
+    ([0, 10, 20], [1, 11, 19]),
+    ([0, 0], [1, -2]), # MAPE without non-zero targets
+    ([10, np.nan, 30, np.inf, 0], [12, 18, np.nan, 38, 5]),
+    ([np.nan, 1.0], [2.0, np.nan]), # No valid pairs
+    ([], []),
+])
+def test_calculate_regression_metrics_matches_previous_values(y_true, y_pred):
+    metrics = calculate_regression_metrics(y_true, y_pred)
+    expected = _reference_metrics(y_true, y_pred)
+    assert list(metrics) == ['mae', 'rmse', 'mape']
+    for name, value in expected.items():
+        np.testing.assert_allclose(metrics[name], value, rtol=1e-12, equal_nan=True)
+
+
+def _sample(n, seed=0):
+    rng = np.random.default_rng(seed)
+    y_true = rng.integers(0, 40, n).astype(np.float64) # Some zero targets
+    y_pred = y_true + rng.normal(0, 5, n)
+    y_true[rng.random(n) < 0.05] = np.nan
+    groups = pd.DataFrame({
+        'project_key': pd.Series(rng.choice(['A', 'B', 'C', None], n), dtype=object),
+        'board_id': rng.choice([1.0, 2.0, np.nan], n),
+    })
+    quantile_preds = {0.9: y_pred + 6}
+    return y_true, y_pred, groups, quantile_preds
+
+
+def test_merged_batches_equal_a_single_pass():
+    breakdowns = {'project': ['project_key'], 'team': ['project_key', 'board_id']}
+    y_true, y_pred, groups, quantile_preds = _sample(500)
+    single = RegressionMetricsAccumulator(breakdowns, quantiles=(0.9,)).update(y_true, y_pred, groups, quantile_preds)
+
+    # Three batches over two workers; the first batch misses some groups
+    bounds = [0, 40, 300, 500]
+    workers = [RegressionMetricsAccumulator(breakdowns, quantiles=(0.9,)) for _ in range(2)]
+    for i, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+        workers[min(i, 1)].update(y_true[start:end], y_pred[start:end], groups.iloc[start:end],
+                                  {0.9: quantile_preds[0.9][start:end]})
+    merged = RegressionMetricsAccumulator.merged(workers)
+
+    assert merged.n_invalid == single.n_invalid
+    expected = single.result()
+    for name, value in merged.result().items():
+        np.testing.assert_allclose(value, expected[name], rtol=1e-12, equal_nan=True)
+    for name, cols in breakdowns.items():
+        expected = single.breakdown(name).sort_values(cols, ignore_index=True)
+        result = merged.breakdown(name).sort_values(cols, ignore_index=True)
+        pd.testing.assert_frame_equal(result, expected, rtol=1e-12)
+
+
+def test_merge_rejects_different_breakdowns():
+    with pytest.raises(ValueError):
+        RegressionMetricsAccumulator({'project': ['project_key']}).merge(RegressionMetricsAccumulator())
@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+from src.data_processing.mock_data_generator import generate_mock_data, iter_mock_data_chunks
+
+KWARGS = {'num_sprints': 7, 'issues_per_sprint': 12, 'num_projects': 2, 'boards_per_project': 2,
+          'seed': 11, 'now': '2023-03-20'}
+
+
+def _concatenated(chunks):
+    frames = list(zip(*chunks))
+    return [pd.concat(parts, ignore_index=True) for parts in frames]
+
+
+def test_same_seed_gives_the_same_frames():
+    first = generate_mock_data(**KWARGS)
+    second = generate_mock_data(**KWARGS)
+    for a, b in zip(first, second):
+        pd.testing.assert_frame_equal(a, b)
+    other = generate_mock_data(**{**KWARGS, 'seed': 12})
+    assert not other[1]['story_points'].equals(first[1]['story_points'])
+
+
+@pytest.mark.parametrize('sprints_per_chunk', [1, 3, 5])
+def test_frames_do_not_depend_on_the_chunk_size(sprints_per_chunk):
+    expected = generate_mock_data(**KWARGS)
+    chunked = _concatenated(iter_mock_data_chunks(sprints_per_chunk=sprints_per_chunk, **KWARGS))
+    for result, frame in zip(chunked, expected):
+        pd.testing.assert_frame_equal(result, frame)
+
+
+def test_unfinished_issues_are_carried_over_across_chunks():
+    # Every sprint closed, the boards' last ones included
+    kwargs = {**KWARGS, 'now': '2024-01-01'}
+    sprints_df, _, transitions_df = _concatenated(iter_mock_data_chunks(sprints_per_chunk=1, **kwargs))
+    moves = transitions_df[(transitions_df['field'] == 'sprint') & transitions_df['from_status'].notna()
+                           & transitions_df['to_status'].notna()]
+    # The sprint field lists every sprint of the issue ("2, 3"): the last one is the current one
+    from_sprint, to_sprint = [moves[col].str.split(', ').str[-1].astype(int) for col in ('from_status', 'to_status')]
+    assert len(moves) > 0 and (to_sprint == from_sprint + 1).all()
+    # Never out of a board's last sprint
+    assert not from_sprint.isin(sprints_df.groupby(['project_key', 'board_id'])['sprint_id'].max()).any()
@@ -0,0 +1,28 @@
+import os
+
+from src.pipeline import multi_project
+
+
+def _pipeline(project_key, config, raw_dir=None):
+    """Stands in for the project pipeline: 'CRASH' kills its worker process, 'FAIL' raises."""
+    if project_key == 'CRASH':
+        os._exit(1)
+    if project_key == 'FAIL':
+        raise ValueError("no closed sprints")
+    return {'num_sprints': len(project_key)}
+
+
+def test_a_crashed_worker_only_fails_its_own_project(monkeypatch):
+    # Worker processes are forked, so they see the patched pipeline
+    monkeypatch.setattr(multi_project, 'run_project_pipeline', _pipeline)
+    keys = ['A', 'CRASH', 'BB', 'FAIL', 'CCC', 'DDDD']
+    summaries = multi_project.run_all_projects(keys, config={'projects': {}}, max_workers=2)
+
+    assert [s['project_key'] for s in summaries] == keys
+    status = {s['project_key']: s['status'] for s in summaries}
+    assert status == {'A': 'succeeded', 'CRASH': 'failed', 'BB': 'succeeded', 'FAIL': 'failed',
+                      'CCC': 'succeeded', 'DDDD': 'succeeded'}
+    by_key = {s['project_key']: s for s in summaries}
+    assert by_key['CRASH']['error'].startswith('BrokenProcessPool')
+    assert by_key['FAIL']['error'] == 'ValueError: no closed sprints'
+    assert by_key['DDDD']['num_sprints'] == 4
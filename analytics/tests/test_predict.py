@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.feature_engineering.features import generate_historical_velocity_features
+from src.feature_engineering.rolling_state import ROLLING_STATE_FILE, update_rolling_state
+from src.inference import predict
+from src.training.train_velocity import train_and_save
+
+FEATURES = ['avg_velocity_last_1_sprints', 'avg_velocity_last_3_sprints', 'planned_story_points',
+            'planned_issue_count']
+
+
+def _history(seed=0):
+    """Closed sprints of two projects (one board each), every two weeks."""
+    rng = np.random.default_rng(seed)
+    return pd.concat([pd.DataFrame({
+        'project_key': project_key,
+        'board_id': 1,
+        'sprint_id': np.arange(20) + offset,
+        'state': 'closed',
+        'start_date': pd.date_range(start, periods=20, freq='14D'),
+        'actual_velocity': rng.uniform(20, 50, 20),
+    }) for project_key, offset, start in [('ALPHA', 0, '2023-01-02'), ('BETA', 100, '2023-01-09')]],
+        ignore_index=True)
+
+
+def _config(tmp_path, history_df, with_state):
+    config = {
+        'paths': {'models_dir': str(tmp_path / "models"), 'processed_data_dir': str(tmp_path / "processed"),
+                  'features_dir': str(tmp_path / "features")},
+        'velocity_model': {'backend': 'gbr', 'features': FEATURES, 'use_tuned_params': False,
+                           'model_params': {'n_estimators': 20, 'max_depth': 2}},
+    }
+    features_df = generate_historical_velocity_features(history_df, windows=[1, 3]).assign(
+        planned_story_points=lambda df: df['actual_velocity'] * 1.1, planned_issue_count=10.0)
+    train_and_save(features_df, config, incremental=False, n_jobs=1)
+    (tmp_path / "processed").mkdir()
+    history_df.to_parquet(tmp_path / "processed" / predict.CLOSED_SPRINTS_FILE, index=False)
+    if with_state:
+        update_rolling_state(tmp_path / "features" / ROLLING_STATE_FILE, history_df, windows=[1, 3])
+    return config
+
+
+@pytest.mark.parametrize("with_state", [False, True])
+def test_batch_matches_single_predictions(tmp_path, with_state):
+    predict.clear_caches()
+    history_df = _history()
+    config = _config(tmp_path, history_df, with_state)
+    sprints_df = pd.DataFrame({
+        'project_key': ['ALPHA', 'BETA', 'ALPHA', 'BETA', None, 'ALPHA'],
+        'board_id': [1, 1, 1, 1, None, 1],
+        # Next sprints, sprints within the history, and one without a start date
+        'start_date': ['2023-10-02', '2023-10-09', '2023-03-13', '2023-01-09', '2023-10-16', None],
+        'planned_story_points': [40.0, 35.0, 30.0, 25.0, 45.0, 20.0],
+        'planned_issue_count': [12, 9, 8, 7, 14, 5],
+    }, index=[10, 11, 12, 13, 14, 15])
+
+    batch = predict.predict_velocity_batch(sprints_df, config=config)
+    assert batch.index.tolist() == sprints_df.index.tolist()
+    assert np.isnan(batch[15])
+    for index, row in sprints_df.iloc[:-1].iterrows():
+        single = predict.predict_velocity({k: v for k, v in row.items() if pd.notna(v)}, config=config)
+        assert np.isclose(batch[index], single), index
+    predict.clear_caches()
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+from src.data_processing.mock_data_generator import generate_mock_data
+from src.data_processing.preprocessing import calculate_issue_timings, map_statuses, preprocess_issues
+
+STATUS_MAPPING = {
+    'todo': ["To Do", "Open", "Backlog"],
+    'inprogress': ["In Progress", "In Development", "In Review"],
+    'done': ["Done", "Closed", "Resolved"],
+}
+
+
+def _cycle_time_loop(issue_id, transitions_df):
+    """The per-issue cycle time of the original implementation."""
+    issue_transitions = transitions_df[transitions_df['issue_id'] == issue_id].sort_values('timestamp', kind='mergesort')
+    statuses = issue_transitions['to_status'].str.lower()
+    inprogress = issue_transitions[statuses.isin(['in progress', 'in development', 'in review'])]
+    if inprogress.empty:
+        return np.nan
+    start = inprogress['timestamp'].iloc[0]
+    done = issue_transitions[(issue_transitions['timestamp'] >= start) & statuses.isin(['done', 'resolved', 'closed'])]
+    if done.empty:
+        return np.nan
+    return (done['timestamp'].iloc[0] - start).total_seconds() / (60 * 60 * 24)
+
+
+def _lead_time_loop(issue, transitions_df):
+    """Creation to the first done entry after the first in progress one (the first done one if never in progress)."""
+    issue_transitions = transitions_df[transitions_df['issue_id'] == issue['issue_id']].sort_values('timestamp', kind='mergesort')
+    statuses = issue_transitions['to_status'].str.lower()
+    inprogress = issue_transitions[statuses.isin(['in progress', 'in development', 'in review'])]
+    done = issue_transitions[statuses.isin(['done', 'resolved', 'closed'])]
+    if not inprogress.empty:
+        done = done[done['timestamp'] >= inprogress['timestamp'].iloc[0]]
+    if done.empty:
+        return np.nan
+    created = issue['created_date'] if pd.notna(issue['created_date']) else issue_transitions['timestamp'].iloc[0]
+    return (done['timestamp'].iloc[0] - created).total_seconds() / (60 * 60 * 24)
+
+
+def _data():
+    _, issues_df, transitions_df = generate_mock_data(num_sprints=6, issues_per_sprint=10, seed=3, now="2023-03-20")
+    transitions_df = transitions_df[transitions_df['field'] == 'status'].reset_index(drop=True)
+    issue_ids = issues_df['issue_id'].to_numpy()
+    # Edge cases: done without being in progress, done before in progress, and no creation date
+    extra = pd.DataFrame({
+        'issue_id': [issue_ids[0], issue_ids[1], issue_ids[1]],
+        'field': 'status', 'from_status': None,
+        'to_status': ['Closed', 'Done', 'In Development'],
+        'timestamp': pd.to_datetime(['2022-12-01', '2022-12-02', '2022-12-03']),
+    })
+    transitions_df = pd.concat([transitions_df[transitions_df['issue_id'] != issue_ids[0]], extra], ignore_index=True)
+    issues_df = issues_df.copy()
+    issues_df.loc[issues_df['issue_id'] == issue_ids[2], 'created_date'] = pd.NaT
+    return issues_df, transitions_df
+
+
+def test_timings_match_the_per_issue_loops():
+    issues_df, transitions_df = _data()
+    processed = preprocess_issues(issues_df, transitions_df, {'status_mapping': STATUS_MAPPING})
+    transitions_df = transitions_df.astype({'to_status': str})
+
+    expected_cycle = [_cycle_time_loop(issue_id, transitions_df) for issue_id in processed['issue_id']]
+    expected_lead = [_lead_time_loop(issue, transitions_df) for _, issue in issues_df.iterrows()]
+    np.testing.assert_allclose(processed['cycle_time_days'].to_numpy(dtype=float), expected_cycle)
+    np.testing.assert_allclose(processed['lead_time_days'].to_numpy(dtype=float), expected_lead)
+    assert processed['lead_time_days'].notna().sum() > 10
+
+
+def test_lead_time_falls_back_to_the_first_transition():
+    transitions_df = pd.DataFrame({'issue_id': [1, 1, 1], 'to_status': ['To Do', 'In Progress', 'Done'],
+                                   'timestamp': pd.to_datetime(['2024-01-02', '2024-01-03', '2024-01-05'])})
+    created = pd.Series(pd.to_datetime(['2024-01-01']), index=[1])
+    assert calculate_issue_timings(transitions_df, STATUS_MAPPING, created_dates=created)['lead_time_days'][0] == 4.0
+    assert calculate_issue_timings(transitions_df, STATUS_MAPPING)['lead_time_days'][0] == 3.0
+
+
+def test_map_statuses_with_an_other_category():
+    mapping = {'todo': ['To Do'], 'other': ['Blocked'], 'done': ['Done']}
+    mapped = map_statuses(pd.Series(['to do', 'Blocked', 'Unknown', None, 'DONE']), mapping)
+    assert list(mapped.cat.categories) == ['todo', 'other', 'done']
+    assert mapped.tolist() == ['todo', 'other', 'other', 'other', 'done']
@@ -0,0 +1,97 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from src.feature_engineering.features import generate_historical_velocity_features, historical_feature_columns
+from src.feature_engineering.rolling_state import (
+    RollingVelocityState, team_key, update_historical_features, update_rolling_state
+)
+
+WINDOWS = [1, 3, 5]
+COLUMNS = historical_feature_columns(WINDOWS)
+
+
+def _history(seed=0):
+    """Closed sprints of two teams, every two weeks, with distinct sprint ids."""
+    rng = np.random.default_rng(seed)
+    frames = [pd.DataFrame({
+        'project_key': 'PROJ',
+        'board_id': board_id,
+        'sprint_id': np.arange(n) + 100 * board_id,
+        'start_date': pd.Timestamp("2024-01-01") + pd.to_timedelta(14 * np.arange(n) + board_id, unit='D'),
+        'actual_velocity': rng.integers(10, 60, n).astype(float),
+    }) for board_id, n in [(1, 14), (2, 10)]]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _assert_matches_batch(features_df, history_df):
+    expected = generate_historical_velocity_features(history_df, windows=WINDOWS)
+    pdt.assert_frame_equal(features_df.set_index('sprint_id').sort_index()[COLUMNS],
+                           expected.set_index('sprint_id').sort_index()[COLUMNS])
+
+
+def _build(path, history_df, previous_df=None):
+    features_df, state = update_historical_features(path, history_df, previous_df, windows=WINDOWS)
+    _assert_matches_batch(features_df, history_df)
+    return features_df, state
+
+
+def test_new_sprints_go_through_the_state(tmp_path):
+    path = tmp_path / "rolling_state.json"
+    history_df = _history()
+    cutoff = pd.Timestamp("2024-04-01")
+    previous_df, _ = _build(path, history_df[history_df['start_date'] < cutoff])
+
+    features_df, state = _build(path, history_df, previous_df)
+    # Sprints applied earlier keep their previous rows, even if these were edited
+    edited_df = features_df.copy()
+    edited_df.loc[edited_df['sprint_id'] == 101, 'avg_velocity_last_1_sprints'] = -1.0
+    rerun_df, _ = update_historical_features(path, history_df, edited_df, windows=WINDOWS)
+    assert rerun_df.loc[rerun_df['sprint_id'] == 101, 'avg_velocity_last_1_sprints'].item() == -1.0
+    # Applied sprints missing from the previous table get their team recomputed
+    _build(path, history_df, previous_df)
+
+    last = history_df[history_df['board_id'] == 1].iloc[-1]
+    assert state.teams[team_key('PROJ', 1)]['last_sprint_id'] == last['sprint_id']
+    assert state.features(team_key('PROJ', 1))['avg_velocity_last_1_sprints'] == last['actual_velocity']
+
+
+def test_a_late_closing_sprint_rebuilds_its_team(tmp_path):
+    path = tmp_path / "rolling_state.json"
+    history_df = _history()
+    late = history_df['sprint_id'] == 105 # Closes after the later sprints of its team were applied
+    previous_df, state = _build(path, history_df[~late])
+
+    assert state.stale_teams(history_df) == {team_key('PROJ', 1)}
+    features_df, state = _build(path, history_df, previous_df)
+    assert state.teams[team_key('PROJ', 1)]['count'] == 14
+
+
+@pytest.mark.parametrize("sprint_id", [111, 102]) # In the buffer, and older than it (only in the total)
+def test_corrected_velocities_rebuild_their_team(tmp_path, sprint_id):
+    path = tmp_path / "rolling_state.json"
+    history_df = _history()
+    previous_df, _ = _build(path, history_df)
+
+    corrected_df = history_df.copy()
+    corrected_df.loc[corrected_df['sprint_id'] == sprint_id, 'actual_velocity'] += 5.0
+    assert RollingVelocityState.load(path).stale_teams(corrected_df) == {team_key('PROJ', 1)}
+    _build(path, corrected_df, previous_df)
+
+
+def test_states_saved_without_sprint_ids_are_rebuilt(tmp_path):
+    path = tmp_path / "rolling_state.json"
+    history_df = _history()
+    update_rolling_state(path, history_df, windows=WINDOWS)
+    saved = json.loads(path.read_text())
+    for team in saved['teams'].values():
+        del team['buffer_ids'], team['total']
+    path.write_text(json.dumps(saved))
+
+    state = RollingVelocityState.load(path)
+    assert state.stale_teams(history_df) == set(state.teams)
+    assert state.apply_closed_sprints(history_df) == len(history_df)
+    assert state.stale_teams(history_df) == set()
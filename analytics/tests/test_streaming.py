@@ -0,0 +1,76 @@
+import pandas as pd
+import pytest
+
+from src.utils.config import load_config
+from src.data_processing.schema import ISSUE_SCHEMA, PROCESSED_ISSUES_FILE, read_compact_parquet
+from src.data_processing.mock_data_generator import generate_mock_data, write_mock_dataset
+from src.data_processing.preprocessing import preprocess_sprints, preprocess_issues, calculate_actual_velocity
+from src.data_processing.streaming import preprocess_streaming, sprint_aggregates_streaming
+from src.feature_engineering.scope import calculate_sprint_scope, SCOPE_FILE
+from src.feature_engineering.burndown import calculate_daily_sprint_series, read_daily_sprint_series, DAILY_SERIES_FILE
+
+MOCK_KWARGS = {'num_sprints': 9, 'issues_per_sprint': 12, 'num_projects': 2, 'seed': 5, 'now': '2023-04-03'}
+
+
+def _sorted(df, keys):
+    return df.sort_values(keys, ignore_index=True)
+
+
+def _in_memory(config):
+    """The outputs of the in-memory path (scripts/preprocess_data.py) on the same mock data."""
+    sprints_df, issues_df, transitions_df = generate_mock_data(**MOCK_KWARGS)
+    status_mapping = config.get('status_mapping', {})
+    # Streaming runs the scope and daily series to the latest status transition rather than to now
+    as_of = transitions_df.loc[transitions_df['field'] == 'status', 'timestamp'].max()
+    processed_sprints_df = preprocess_sprints(sprints_df)
+    processed_issues_df = preprocess_issues(issues_df, transitions_df, config)
+    closed_sprints_df = processed_sprints_df[processed_sprints_df['state'] == 'closed']
+    return {
+        'issues': processed_issues_df,
+        'velocity': calculate_actual_velocity(processed_issues_df, closed_sprints_df, config),
+        'scope': calculate_sprint_scope(processed_sprints_df, processed_issues_df, transitions_df, status_mapping,
+                                        as_of=as_of),
+        'series': calculate_daily_sprint_series(processed_sprints_df, processed_issues_df, transitions_df,
+                                                status_mapping, as_of=as_of),
+    }
+
+
+@pytest.mark.parametrize('batch_size', [17, 100_000])
+def test_streaming_matches_in_memory_preprocessing(tmp_path, batch_size):
+    config = load_config()
+    write_mock_dataset(tmp_path / "raw", **MOCK_KWARGS)
+    preprocess_streaming(tmp_path / "raw", tmp_path / "processed", config, batch_size=batch_size)
+    expected = _in_memory(config)
+    processed_dir = tmp_path / "processed"
+
+    issues = read_compact_parquet(processed_dir / PROCESSED_ISSUES_FILE, ISSUE_SCHEMA)
+    expected_issues = expected['issues'][issues.columns]
+    pd.testing.assert_frame_equal(_sorted(issues, 'issue_id'), _sorted(expected_issues, 'issue_id'),
+                                  check_dtype=False, check_categorical=False)
+    velocity = pd.read_parquet(processed_dir / "closed_sprints_with_velocity.parquet")
+    pd.testing.assert_frame_equal(_sorted(velocity, 'sprint_id'),
+                                  _sorted(expected['velocity'][velocity.columns], 'sprint_id'),
+                                  check_dtype=False)
+    scope = pd.read_parquet(processed_dir / SCOPE_FILE)
+    pd.testing.assert_frame_equal(_sorted(scope, 'sprint_id'), _sorted(expected['scope'][scope.columns], 'sprint_id'),
+                                  check_dtype=False)
+    series = read_daily_sprint_series(processed_dir / DAILY_SERIES_FILE)
+    pd.testing.assert_frame_equal(_sorted(series, ['sprint_id', 'date']),
+                                  _sorted(expected['series'][series.columns], ['sprint_id', 'date']),
+                                  check_dtype=False, check_categorical=False)
+
+
+def test_sprint_aggregates_computed_apart_match_the_single_pass(tmp_path):
+    config = load_config()
+    write_mock_dataset(tmp_path / "raw", **MOCK_KWARGS)
+    preprocess_streaming(tmp_path / "raw", tmp_path / "single", config, batch_size=17)
+    preprocess_streaming(tmp_path / "raw", tmp_path / "apart", config, batch_size=17, sprint_aggregates=False)
+    assert not (tmp_path / "apart" / SCOPE_FILE).exists()
+    sprint_aggregates_streaming(tmp_path / "raw", tmp_path / "apart", config, batch_size=23, daily_series=False)
+    sprint_aggregates_streaming(tmp_path / "raw", tmp_path / "apart", config, batch_size=23, scope=False)
+
+    pd.testing.assert_frame_equal(_sorted(pd.read_parquet(tmp_path / "apart" / SCOPE_FILE), 'sprint_id'),
+                                  _sorted(pd.read_parquet(tmp_path / "single" / SCOPE_FILE), 'sprint_id'))
+    series = [_sorted(read_daily_sprint_series(tmp_path / d / DAILY_SERIES_FILE), ['sprint_id', 'date'])
+              for d in ("apart", "single")]
+    pd.testing.assert_frame_equal(series[0], series[1])
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from src.training.train_velocity import fit_velocity_model, train_and_save
+from src.modeling.registry import load_model, model_name_for
+
+
+def _features(n_sprints, seed=0):
+    rng = np.random.default_rng(seed)
+    planned = rng.uniform(10, 50, n_sprints)
+    return pd.DataFrame({
+        'sprint_id': np.arange(1, n_sprints + 1),
+        'state': 'closed',
+        'start_date': pd.date_range('2023-01-02', periods=n_sprints, freq='14D'),
+        'avg_velocity_last_1_sprints': rng.uniform(10, 50, n_sprints),
+        'avg_velocity_last_3_sprints': rng.uniform(10, 50, n_sprints),
+        'planned_story_points': planned,
+        'planned_issue_count': rng.integers(3, 15, n_sprints).astype(float),
+        'carried_over_story_points': rng.uniform(0, 10, n_sprints),
+        'actual_velocity': planned * rng.uniform(0.6, 1.1, n_sprints),
+    })
+
+
+def _config(models_dir):
+    return {
+        'paths': {'models_dir': str(models_dir)},
+        'velocity_model': {'backend': 'gbr', 'model_params': {'n_estimators': 20, 'max_depth': 2},
+                           'incremental': {'n_estimators_added': 5, 'min_new_sprints': 1}},
+    }
+
+
+def test_retrain_picks_new_sprints_by_id(tmp_path):
+    config = _config(tmp_path / "models")
+    features_df = _features(30)
+    # Sprint 12 closes late: it is not in the first training set, though later sprints are
+    first = train_and_save(features_df[features_df['sprint_id'] != 12], config, incremental=False, n_jobs=1)
+    assert 12 not in first['sprint_ids']
+    assert first['training_window']['end'] == features_df['start_date'].max().isoformat()
+
+    grown = train_and_save(features_df, config, incremental=True)
+    assert grown['mode'] == 'incremental'
+    assert grown['incremental_metrics']['new_sprints'] == 1
+    _, _, manifest = load_model(tmp_path / "models", model_name_for(config))
+    assert manifest['parent'] == first['version']
+    assert manifest['sprint_ids'] == list(range(1, 31))
+    assert manifest['training_window']['n_sprints'] == 30
+
+    # Nothing new since: the current version is kept
+    assert train_and_save(features_df, config, incremental=True)['mode'] == 'unchanged'
+
+
+def test_parallel_folds_match_a_serial_run(tmp_path):
+    config = _config(tmp_path / "models")
+    features_df = _features(40)
+    serial = fit_velocity_model(features_df, config, n_jobs=1)
+    parallel = fit_velocity_model(features_df, config, n_jobs=2)
+
+    assert parallel['cv_metrics'] == serial['cv_metrics']
+    assert len(serial['cv_metrics']['folds']) == 5
+    X = features_df[serial['features']]
+    np.testing.assert_array_equal(parallel['model'].predict(X), serial['model'].predict(X))
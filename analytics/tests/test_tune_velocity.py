@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingRegressor
+
+from src.evaluation.metrics import calculate_regression_metrics
+from src.training.train_velocity import load_tuned_params, time_series_split
+from src.training.tune_velocity import halving_budgets, tune_and_save, tune_velocity_model
+
+FEATURES = ['avg_velocity_last_1_sprints', 'planned_story_points', 'planned_issue_count']
+
+
+def _features(n_sprints=40, seed=0):
+    rng = np.random.default_rng(seed)
+    planned = rng.uniform(10, 50, n_sprints)
+    return pd.DataFrame({
+        'sprint_id': np.arange(1, n_sprints + 1),
+        'state': 'closed',
+        'start_date': pd.date_range('2023-01-02', periods=n_sprints, freq='14D'),
+        'avg_velocity_last_1_sprints': rng.uniform(10, 50, n_sprints),
+        'planned_story_points': planned,
+        'planned_issue_count': rng.integers(3, 15, n_sprints).astype(float),
+        'actual_velocity': planned * rng.uniform(0.6, 1.1, n_sprints),
+    })
+
+
+def _config(models_dir):
+    return {
+        'paths': {'models_dir': str(models_dir)},
+        'velocity_model': {
+            'backend': 'gbr', 'features': FEATURES, 'model_params': {'random_state': 0},
+            # subsample=1.0: growing a warm-started ensemble then gives the same trees as a fresh fit
+            'tuning': {'param_space': {'learning_rate': [0.05, 0.1, 0.2], 'max_depth': [1, 2, 3], 'subsample': [1.0]},
+                       'n_candidates': 4, 'min_estimators': 5, 'max_estimators': 20, 'factor': 2, 'random_state': 0},
+        },
+    }
+
+
+def test_halving_budgets_end_at_the_maximum():
+    assert halving_budgets(25, 400, 3) == [25, 75, 225, 400]
+    assert halving_budgets(5, 20, 2) == [5, 10, 20]
+
+
+def test_small_halving_run(tmp_path):
+    config = _config(tmp_path / "models")
+    features_df = _features()
+    result = tune_velocity_model(features_df, config, n_jobs=1)
+
+    assert result['budgets'] == [5, 10, 20] and result['n_candidates'] == 4
+    params = result['model_params']
+    assert params['n_estimators'] == 20 and params['subsample'] == 1.0
+    # The winner's score is the mean validation MAE of a fresh fit of its parameters on each fold
+    maes = []
+    for train_idx, val_idx in time_series_split(features_df, date_column='start_date', n_splits=5):
+        model = GradientBoostingRegressor(**params).fit(features_df.loc[train_idx, FEATURES],
+                                                        features_df.loc[train_idx, 'actual_velocity'])
+        y_pred = model.predict(features_df.loc[val_idx, FEATURES])
+        maes.append(calculate_regression_metrics(features_df.loc[val_idx, 'actual_velocity'], y_pred)['mae'])
+    assert np.isclose(result['cv_mae'], np.mean(maes))
+
+    # Deterministic whatever the number of workers
+    assert tune_velocity_model(features_df, config, n_jobs=2) == result
+
+    tune_and_save(features_df, config, n_jobs=1)
+    assert load_tuned_params(config) == params
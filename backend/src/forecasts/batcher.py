@@ -0,0 +1,88 @@
+import asyncio
+from contextlib import suppress
+from typing import Any, Callable
+
+
+class BatcherStopped(RuntimeError):
+    """Raised to the callers whose requests were queued or in flight when the batcher stopped."""
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests into batches handled by one call.
+
+    A batch closes `max_wait_ms` after its first request or at `max_batch_size` requests.
+    `handle_batch` runs in a thread (the event loop keeps accepting requests meanwhile) and
+    returns one result per item, in order; an Exception result is raised to its caller.
+    After `stop`, pending and new requests fail with BatcherStopped.
+    """
+
+    def __init__(self, handle_batch: Callable[[list], list], max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        self.handle_batch = handle_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._batch: list = []  # The batch being collected or handled
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._worker
+            self._worker = None
+        pending, self._batch = self._batch, []
+        if self._queue is not None:
+            while not self._queue.empty():
+                pending.append(self._queue.get_nowait())
+            self._queue = None
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(BatcherStopped("The forecast batcher was stopped"))
+
+    async def submit(self, item: Any) -> Any:
+        if self._queue is None:
+            raise BatcherStopped("The forecast batcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self, batch: list) -> None:
+        loop = asyncio.get_running_loop()
+        batch.append(await self._queue.get())
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            # Kept on the instance so that stop() can fail the batch's requests
+            self._batch = batch = []
+            await self._collect(batch)
+            try:
+                results = await loop.run_in_executor(None, self.handle_batch, [item for item, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"handle_batch returned {len(results)} results for {len(batch)} requests")
+            except Exception as e:
+                results = [e] * len(batch)
+            for (_, future), result in zip(batch, results):
+                if future.done():  # The caller went away
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
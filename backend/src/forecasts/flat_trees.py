@@ -0,0 +1,75 @@
+from pathlib import Path
+
+import numpy as np
+
+# The flat arrays the analytics registry saves next to a tree ensemble model (analytics/src/modeling/flat_trees.py):
+# the nodes of all trees concatenated, a row going to 'left' when its 'feature' value is <= 'threshold'
+# (or when it is NaN and 'missing_left'), with the learning rate included in the leaf 'value's
+FLAT_TREES_DIR = "trees"
+ARRAY_NAMES = ("feature", "threshold", "left", "right", "value", "missing_left", "roots", "depths")
+LEAF = -1  # Children of leaves in arrays saved before the children were compiled
+PREDICT_CHUNK_CELLS = 1 << 15  # Rows x trees traversed at once
+
+
+def compile_children(left: np.ndarray, right: np.ndarray, roots: np.ndarray):
+    """Points the children of every leaf at the leaf itself and orders the trees by decreasing depth."""
+    depths = np.zeros(len(roots), dtype=np.int32)
+    frontier, trees = roots, np.arange(len(roots))
+    while len(frontier):  # One level of all trees per pass
+        children = np.concatenate([left[frontier], right[frontier]])
+        trees = np.concatenate([trees, trees])[children != LEAF]
+        frontier = children[children != LEAF]
+        depths[np.unique(trees)] += 1
+    order = np.argsort(-depths, kind="stable")
+    nodes = np.arange(len(left), dtype=left.dtype)
+    return np.where(left == LEAF, nodes, left), np.where(right == LEAF, nodes, right), roots[order], depths[order]
+
+
+class FlatTreeEnsemble:
+    """
+    A gradient boosting model read from its flat arrays, memory-mapped read-only: workers serving the same
+    version share its pages through the OS page cache, and no pickle (nor scikit-learn version) is involved.
+    """
+
+    def __init__(self, directory: Path, meta: dict):
+        self.meta = dict(meta)
+        compiled = "max_depth" in self.meta  # Saved before the children were compiled otherwise
+        missing = [name for name in ARRAY_NAMES if (compiled or name != "depths")
+                   and not (Path(directory) / f"{name}.npy").exists()]
+        if missing:
+            raise FileNotFoundError(f"No flat tree arrays {missing} in {directory}")
+        self.arrays = {name: np.asarray(np.load(Path(directory) / f"{name}.npy", mmap_mode="r"))
+                       for name in ARRAY_NAMES if compiled or name != "depths"}
+        if not compiled:
+            a = self.arrays
+            a["left"], a["right"], a["roots"], a["depths"] = compile_children(a["left"], a["right"], a["roots"])
+            self.meta["max_depth"] = int(a["depths"].max(initial=0))
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Predictions for the rows of X (the model's features in order)."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.meta["n_features"]:
+            raise ValueError(f"Expected {self.meta['n_features']} features, got input of shape {X.shape}")
+        # Compared as scikit-learn compares them (float32 inputs for GradientBoostingRegressor's trees)
+        X = X.astype(self.meta["x_dtype"], copy=False).astype(np.float64, copy=False)
+        a = self.arrays
+        roots = a["roots"]
+        # Trees still walked at each level: a prefix, as the trees are ordered by decreasing depth
+        n_active = np.searchsorted(-a["depths"], -np.arange(self.meta["max_depth"]), side="left")
+        has_nan = np.isnan(X).any()
+        predictions = np.empty(len(X))
+        chunk = max(1, PREDICT_CHUNK_CELLS // max(1, len(roots)))
+        for start in range(0, len(X), chunk):
+            X_chunk = X[start:start + chunk]
+            row_offsets = (np.arange(len(X_chunk)) * X.shape[1])[:, None]
+            x_values = X_chunk.ravel()
+            node = np.tile(roots.astype(np.intp), (len(X_chunk), 1))
+            for n in n_active:
+                current = node[:, :n]
+                x = x_values.take(row_offsets + a["feature"].take(current))
+                go_left = x <= a["threshold"].take(current)
+                if has_nan:
+                    go_left = np.where(np.isnan(x), a["missing_left"].take(current), go_left)
+                node[:, :n] = np.where(go_left, a["left"].take(current), a["right"].take(current))
+            predictions[start:start + chunk] = self.meta["baseline"] + a["value"].take(node).sum(axis=1)
+        return predictions
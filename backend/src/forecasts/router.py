@@ -0,0 +1,59 @@
+from contextlib import asynccontextmanager
+
+from fastapi import APIRouter, FastAPI, HTTPException
+
+from src.settings import settings
+from src.forecasts.batcher import BatcherStopped, MicroBatcher
+from src.forecasts.utils import Forecaster
+
+from src.forecasts.schemas.forecast import ForecastModelInfo, ForecastRequest, ForecastResponse
+
+router = APIRouter(prefix="/forecasts", tags=["forecasts"])
+
+forecaster: Forecaster | None = None
+batcher: MicroBatcher | None = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global forecaster, batcher
+    try:
+        forecaster = Forecaster(settings.analytics_models_dir, settings.analytics_features_dir, settings.forecast_model_name)
+    except FileNotFoundError:
+        forecaster = None  # No trained model yet: the endpoints answer 503
+    if forecaster is not None:
+        batcher = MicroBatcher(forecaster.predict, settings.forecast_max_batch_size, settings.forecast_max_wait_ms)
+        batcher.start()
+    yield
+    if batcher is not None:
+        await batcher.stop()
+        batcher = None
+
+
+@router.get("/model", response_model=ForecastModelInfo)
+def get_model():
+    if forecaster is None:
+        raise HTTPException(status_code=503, detail="No forecast model loaded")
+
+    return ForecastModelInfo(
+        model_name=forecaster.model_name,
+        model_version=forecaster.version,
+        backend=forecaster.manifest["backend"],
+        features=forecaster.features,
+        created_at=forecaster.manifest.get("created_at"),
+    )
+
+
+@router.post("/", response_model=ForecastResponse)
+async def forecast(request: ForecastRequest):
+    if batcher is None:
+        raise HTTPException(status_code=503, detail="No forecast model loaded")
+
+    try:
+        return await batcher.submit(request)
+    except BatcherStopped as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
@@ -0,0 +1,33 @@
+from datetime import date
+
+from pydantic import BaseModel, ConfigDict
+
+
+class ForecastRequest(BaseModel):
+    project_key: str
+    board_id: int | None = None
+    start_date: date
+    planned_story_points: float = 0.0
+    planned_issue_count: float = 0.0
+    carried_over_story_points: float = 0.0
+
+
+class ForecastResponse(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())  # Allows the model_* fields
+
+    project_key: str
+    board_id: int | None
+    start_date: date
+    predicted_velocity: float
+    model_name: str
+    model_version: str
+
+
+class ForecastModelInfo(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+
+    model_name: str
+    model_version: str
+    backend: str
+    features: list[str]
+    created_at: str | None = None
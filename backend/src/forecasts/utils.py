@@ -0,0 +1,85 @@
+import json
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+
+from src.forecasts.flat_trees import FLAT_TREES_DIR, FlatTreeEnsemble
+from src.forecasts.schemas.forecast import ForecastRequest, ForecastResponse
+
+# Written by the analytics pipeline: models/<model_name>/CURRENT names the current version directory
+# (manifest.json and the flat tree arrays under trees/), features/rolling_state.json holds each team's
+# historical features for its next sprint
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+ROLLING_STATE_FILE = "rolling_state.json"
+PLANNED_FEATURES = ["planned_story_points", "planned_issue_count", "carried_over_story_points"]
+
+
+def team_key(project_key: str, board_id: int | None) -> str:
+    return f"{project_key}/{'' if board_id is None else board_id}"
+
+
+def load_current_model(models_dir: Path, model_name: str):
+    model_dir = Path(models_dir) / model_name
+    version = (model_dir / CURRENT_FILE).read_text().strip()
+    version_dir = model_dir / version
+    manifest = json.loads((version_dir / MANIFEST_FILE).read_text())
+    if "flat_trees" not in manifest:
+        # e.g. the linear backends, which are only saved pickled
+        raise FileNotFoundError(f"Model '{model_name}' version {version} has no flat tree arrays")
+    return FlatTreeEnsemble(version_dir / FLAT_TREES_DIR, manifest["flat_trees"]), manifest["features"], manifest
+
+
+def load_team_features(features_dir: Path) -> dict:
+    path = Path(features_dir) / ROLLING_STATE_FILE
+    if not path.exists():
+        return {}
+    state = json.loads(path.read_text())
+    return {
+        key: {
+            "last_start_date": date.fromisoformat(team["last_start_date"][:10]) if team["last_start_date"] else None,
+            "features": team.get("next_features") or {},
+        }
+        for key, team in state["teams"].items()
+    }
+
+
+class Forecaster:
+    """The current velocity model and the teams' historical features, loaded once per worker."""
+
+    def __init__(self, models_dir: Path, features_dir: Path, model_name: str):
+        self.model_name = model_name
+        self.model, self.features, self.manifest = load_current_model(models_dir, model_name)
+        self.version = self.manifest["version"]
+        self.teams = load_team_features(features_dir)
+
+    def predict(self, requests: list[ForecastRequest]) -> list[ForecastResponse | Exception]:
+        """Forecasts a batch with one model call; requests that cannot be served get their exception instead."""
+        rows, positions, results = [], [], [None] * len(requests)
+        for i, request in enumerate(requests):
+            key = team_key(request.project_key, request.board_id)
+            team = self.teams.get(key)
+            if team is None:
+                results[i] = LookupError(f"No closed sprints of team '{key}'")
+            elif team["last_start_date"] is not None and request.start_date <= team["last_start_date"]:
+                results[i] = ValueError(f"Team '{key}' already has a closed sprint starting on or after {request.start_date}")
+            else:
+                rows.append({**team["features"], **{f: getattr(request, f) for f in PLANNED_FEATURES}})
+                positions.append(i)
+
+        if rows:
+            X = np.array([[row.get(f, np.nan) for f in self.features] for row in rows], dtype=float)
+            if not self.manifest.get("handles_nan"):
+                X = np.where(np.isnan(X), 0.0, X)
+            for i, prediction in zip(positions, self.model.predict(X)):
+                request = requests[i]
+                results[i] = ForecastResponse(
+                    project_key=request.project_key,
+                    board_id=request.board_id,
+                    start_date=request.start_date,
+                    predicted_velocity=float(prediction),
+                    model_name=self.model_name,
+                    model_version=self.version,
+                )
+        return results
@@ -1,7 +1,9 @@
 from fastapi import FastAPI
 
 from src.projects.router import router as project_router
+from src.forecasts.router import router as forecast_router, lifespan as forecast_lifespan
 
-app = FastAPI()
+app = FastAPI(lifespan=forecast_lifespan)
 
 app.include_router(project_router)
+app.include_router(forecast_router)
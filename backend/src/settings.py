@@ -4,5 +4,12 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", extra="ignore")
 
+    # Artifacts of the analytics pipeline served by /forecasts
+    analytics_models_dir: str = "../analytics/models"
+    analytics_features_dir: str = "../analytics/data/features"
+    forecast_model_name: str = "velocity_gbr"
+    forecast_max_batch_size: int = 64
+    forecast_max_wait_ms: float = 5.0
+
 
 settings = Settings()
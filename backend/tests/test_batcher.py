@@ -0,0 +1,46 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.forecasts.batcher import BatcherStopped, MicroBatcher
+
+
+def test_stop_fails_queued_and_in_flight_requests():
+    entered, release = threading.Event(), threading.Event()
+
+    def blocking_handle(items):
+        entered.set()
+        release.wait(5)
+        return items
+
+    async def scenario():
+        batcher = MicroBatcher(blocking_handle, max_batch_size=1, max_wait_ms=0)
+        batcher.start()
+        requests = [asyncio.create_task(batcher.submit(i)) for i in range(3)]
+        await asyncio.get_running_loop().run_in_executor(None, entered.wait, 5)  # One in flight, two queued
+        await batcher.stop()
+        release.set()  # The handler's thread finishes, its results are dropped
+        results = await asyncio.wait_for(asyncio.gather(*requests, return_exceptions=True), 1)
+        with pytest.raises(BatcherStopped):
+            await batcher.submit(3)
+        return results
+
+    try:
+        results = asyncio.run(scenario())
+    finally:
+        release.set()
+    assert [type(r) for r in results] == [BatcherStopped] * 3
+
+
+def test_wrong_number_of_results_fails_the_batch():
+    async def scenario():
+        batcher = MicroBatcher(lambda items: items[1:], max_batch_size=2, max_wait_ms=50)
+        batcher.start()
+        try:
+            return await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) and "1 results for 2 requests" in str(r) for r in results)
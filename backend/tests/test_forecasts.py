@@ -0,0 +1,169 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.settings import settings
+from src.forecasts import router as forecasts
+from src.forecasts.flat_trees import FLAT_TREES_DIR, LEAF, FlatTreeEnsemble, compile_children
+from src.forecasts.utils import Forecaster
+
+MODEL_NAME = "velocity_gbr"
+FEATURES = ["avg_velocity_last_1_sprints", "planned_story_points", "planned_issue_count"]
+TEAM_FEATURES = {"avg_velocity_last_1_sprints": 30.0}
+BASELINE = 20.0
+
+# Two trees as the analytics registry flattens them:
+#   planned_story_points <= 15 ? -2 : 3
+#   avg_velocity_last_1_sprints <= 25 (NaN: left) ? 1 : (planned_issue_count <= 5 ? 0.5 : -0.5)
+TREE_ARRAYS = {
+    "feature": np.array([1, 0, 0, 0, 0, 2, 0, 0], dtype=np.int32),
+    "threshold": np.array([15, 0, 0, 25, 0, 5, 0, 0], dtype=np.float64),
+    "left": np.array([1, LEAF, LEAF, 4, LEAF, 6, LEAF, LEAF], dtype=np.int32),
+    "right": np.array([2, LEAF, LEAF, 5, LEAF, 7, LEAF, LEAF], dtype=np.int32),
+    "value": np.array([0, -2, 3, 0, 1, 0, 0.5, -0.5], dtype=np.float64),
+    "missing_left": np.array([0, 0, 0, 1, 0, 0, 0, 0], dtype=bool),
+    "roots": np.array([0, 3], dtype=np.int64),
+}
+
+
+# Exported by the analytics registry (export_flat_trees and save_flat_trees of a fitted GradientBoostingRegressor,
+# and of a HistGradientBoostingRegressor with missing values), with test rows X and scikit-learn's predictions for them
+ANALYTICS_FIXTURES = Path(__file__).parent / "fixtures" / "analytics_flat_trees"
+
+
+def expected_velocity(velocity_last_1, points, issue_count):
+    first = -2 if points <= 15 else 3
+    second = 1 if np.isnan(velocity_last_1) or velocity_last_1 <= 25 else (0.5 if issue_count <= 5 else -0.5)
+    return BASELINE + first + second
+
+
+def write_model(models_dir, compiled=True):
+    """A model version laid out as the analytics registry saves it (`compiled=False`: before the children were compiled)."""
+    version_dir = models_dir / MODEL_NAME / "0123456789ab"
+    (version_dir / "trees").mkdir(parents=True)
+    arrays = dict(TREE_ARRAYS)
+    meta = {"baseline": BASELINE, "x_dtype": "float32", "n_features": len(FEATURES), "n_trees": 2, "n_nodes": 8}
+    if compiled:
+        arrays["left"], arrays["right"], arrays["roots"], arrays["depths"] = compile_children(
+            arrays["left"], arrays["right"], arrays["roots"])
+        meta["max_depth"] = int(arrays["depths"].max())
+    for name, array in arrays.items():
+        np.save(version_dir / "trees" / f"{name}.npy", array)
+    manifest = {"version": version_dir.name, "model_name": MODEL_NAME, "backend": "gbr", "handles_nan": False,
+                "features": FEATURES, "created_at": "2024-03-01T00:00:00", "flat_trees": meta}
+    (version_dir / "manifest.json").write_text(json.dumps(manifest))
+    (models_dir / MODEL_NAME / "CURRENT").write_text(version_dir.name)
+
+
+def write_team_features(features_dir):
+    features_dir.mkdir(parents=True)
+    state = {"teams": {"PROJ/1": {"last_start_date": "2024-02-12T00:00:00", "next_features": TEAM_FEATURES}}}
+    (features_dir / "rolling_state.json").write_text(json.dumps(state))
+
+
+@pytest.fixture
+def artifacts(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "analytics_models_dir", str(tmp_path / "models"))
+    monkeypatch.setattr(settings, "analytics_features_dir", str(tmp_path / "features"))
+    monkeypatch.setattr(settings, "forecast_model_name", MODEL_NAME)
+    write_team_features(tmp_path / "features")
+    return tmp_path
+
+
+def make_client():
+    app = FastAPI(lifespan=forecasts.lifespan)
+    app.include_router(forecasts.router)
+    return TestClient(app)
+
+
+def forecast_request(start_date="2024-02-26", points=20.0):
+    return {"project_key": "PROJ", "board_id": 1, "start_date": start_date,
+            "planned_story_points": points, "planned_issue_count": 6}
+
+
+def test_concurrent_requests_are_answered_in_batches(artifacts, monkeypatch):
+    write_model(artifacts / "models")
+    monkeypatch.setattr(settings, "forecast_max_batch_size", 8)
+    monkeypatch.setattr(settings, "forecast_max_wait_ms", 200.0)
+    batch_sizes = []
+    predict = Forecaster.predict
+
+    def recording_predict(self, requests):
+        batch_sizes.append(len(requests))
+        return predict(self, requests)
+
+    monkeypatch.setattr(Forecaster, "predict", recording_predict)
+    points = [float(p) for p in range(10, 18)]
+    with make_client() as client, ThreadPoolExecutor(len(points)) as pool:
+        responses = list(pool.map(lambda p: client.post("/forecasts/", json=forecast_request(points=p)), points))
+
+    assert [r.status_code for r in responses] == [200] * len(points)
+    assert max(batch_sizes) > 1 and sum(batch_sizes) == len(points)
+    expected = [expected_velocity(TEAM_FEATURES["avg_velocity_last_1_sprints"], p, 6) for p in points]
+    np.testing.assert_allclose([r.json()["predicted_velocity"] for r in responses], expected)
+    assert {r.json()["model_version"] for r in responses} == {"0123456789ab"}
+
+
+@pytest.mark.parametrize("compiled", [True, False])
+def test_forecaster_reads_the_flat_arrays(artifacts, compiled):
+    write_model(artifacts / "models", compiled=compiled)
+    forecaster = Forecaster(artifacts / "models", artifacts / "features", MODEL_NAME)
+    X = np.array([[30, 10, 6], [30, 20, 4], [10, 20, 6], [np.nan, 16, 9], [25, 15, 5]], dtype=float)
+    np.testing.assert_allclose(forecaster.model.predict(X), [expected_velocity(*row) for row in X])
+    assert isinstance(forecaster.model.arrays["threshold"], np.ndarray)
+
+
+@pytest.mark.parametrize("model", ["gbr", "hist_gbr"])
+def test_traversal_matches_analytics_exports(model):
+    fixture = ANALYTICS_FIXTURES / model
+    ensemble = FlatTreeEnsemble(fixture / FLAT_TREES_DIR, json.loads((fixture / "meta.json").read_text()))
+    X = np.load(fixture / "X.npy")
+    np.testing.assert_allclose(ensemble.predict(X), np.load(fixture / "expected.npy"), rtol=1e-10, atol=1e-9)
+    np.testing.assert_allclose(ensemble.predict(X[:1]), np.load(fixture / "expected.npy")[:1], rtol=1e-10, atol=1e-9)
+
+
+def test_model_without_flat_arrays_is_not_served(artifacts):
+    write_model(artifacts / "models")
+    manifest_path = artifacts / "models" / MODEL_NAME / "0123456789ab" / "manifest.json"
+    manifest = json.loads(manifest_path.read_text())
+    del manifest["flat_trees"]
+    manifest_path.write_text(json.dumps(manifest))
+    with make_client() as client:
+        assert client.get("/forecasts/model").status_code == 503
+
+
+def test_model_info(artifacts):
+    write_model(artifacts / "models")
+    with make_client() as client:
+        response = client.get("/forecasts/model")
+    assert response.status_code == 200
+    assert response.json()["features"] == FEATURES
+    assert response.json()["backend"] == "gbr"
+
+
+def test_unknown_team_is_not_found(artifacts):
+    write_model(artifacts / "models")
+    with make_client() as client:
+        response = client.post("/forecasts/", json={**forecast_request(), "project_key": "OTHER"})
+    assert response.status_code == 404
+
+
+def test_sprint_before_the_last_closed_one_is_unprocessable(artifacts):
+    write_model(artifacts / "models")
+    with make_client() as client:
+        response = client.post("/forecasts/", json=forecast_request(start_date="2024-02-12"))
+        invalid = client.post("/forecasts/", json={**forecast_request(), "start_date": "not a date"})
+    assert response.status_code == 422
+    assert "2024-02-12" in response.json()["detail"]
+    assert invalid.status_code == 422
+
+
+def test_no_model_is_unavailable(artifacts):
+    with make_client() as client:
+        assert client.post("/forecasts/", json=forecast_request()).status_code == 503
+        assert client.get("/forecasts/model").status_code == 503